@@ -0,0 +1,4 @@
+# Application Celery chargée avec Django, pour que @shared_task l'utilise
+from .celery import app as celery_app
+
+__all__ = ('celery_app',)
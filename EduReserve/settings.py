@@ -10,8 +10,10 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 from datetime import timedelta
+from celery.schedules import crontab
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -42,12 +44,14 @@ INSTALLED_APPS = [
     'rest_framework',
     'rest_framework_simplejwt',
     'rest_framework_simplejwt.token_blacklist',
+    'django_celery_beat',
     'corsheaders',
     'core'
 ]
 
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
+    'core.middleware.CompressionMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -81,13 +85,27 @@ WSGI_APPLICATION = 'EduReserve.wsgi.application'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        # JWTAuthentication avec l'utilisateur en cache (core/authentication.py)
+        'core.authentication.CachedJWTAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    # JSON sérialisé et décodé par orjson (core/renderers.py)
+    'DEFAULT_RENDERER_CLASSES': [
+        'core.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'core.renderers.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
 }
 
+# Taille minimale, en octets, des réponses compressées en gzip (core/middleware.py)
+COMPRESSION_MIN_LENGTH = 1024
+
 #CORS_ALLOWED_ORIGINS = []
 CORS_ORIGIN_ALLOW_ALL = True
 CORS_ALLOW_CREDENTIALS = True
@@ -104,6 +122,54 @@ DATABASES = {
 }
 
 
+# Cache
+# Redis (django-redis) si REDIS_URL est défini, sinon cache mémoire local au processus
+
+REDIS_URL = os.environ.get('REDIS_URL')
+
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django_redis.cache.RedisCache',
+            'LOCATION': REDIS_URL,
+            'OPTIONS': {
+                'CLIENT_CLASS': 'django_redis.client.DefaultClient',
+            },
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'edureserve',
+        }
+    }
+
+
+# Celery
+# Sans broker (CELERY_BROKER_URL ou REDIS_URL), les tâches s'exécutent immédiatement
+# dans le processus appelant (développement et tests)
+
+CELERY_BROKER_URL = os.environ.get('CELERY_BROKER_URL', REDIS_URL)
+CELERY_TASK_ALWAYS_EAGER = not CELERY_BROKER_URL
+CELERY_TASK_IGNORE_RESULT = True
+CELERY_TIMEZONE = 'Africa/Douala'
+
+# Tâches planifiées (celery -A EduReserve beat), recopiées dans la base par le
+# planificateur de django-celery-beat puis modifiables depuis l'admin
+CELERY_BEAT_SCHEDULER = 'django_celery_beat.schedulers:DatabaseScheduler'
+CELERY_BEAT_SCHEDULE = {
+    'purger-jetons-expires': {
+        'task': 'core.tasks.purger_jetons',
+        'schedule': crontab(hour=3, minute=0),
+    },
+    'purger-emplois-du-temps': {
+        'task': 'core.tasks.purger_emplois_du_temps_pdf',
+        'schedule': crontab(hour=3, minute=30),
+    },
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -139,12 +205,18 @@ USE_I18N = True
 
 STATIC_URL = 'static/'
 
+# Fichiers générés (emplois du temps PDF)
+MEDIA_URL = 'media/'
+MEDIA_ROOT = BASE_DIR / 'media'
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 SIMPLE_JWT = {
+    # Rafraîchissement avec contrôle de liste noire en cache (core/jetons.py)
+    'TOKEN_REFRESH_SERIALIZER': 'core.jetons.TokenRefreshSerializer',
     'TOKEN_OBTAIN_SERIALIZER': 'authentication.serializers.auth_serializers.CustomTokenObtainPairSerializer',
     'ACCESS_TOKEN_LIFETIME': timedelta(days=1),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=1),
@@ -156,3 +228,42 @@ SIMPLE_JWT = {
     'SLIDING_TOKEN_LIFETIME_LATE_USER': timedelta(days=30),
     'TOKEN_BLACKLIST_ENABLED': True
 }
+
+# Index d'occupation en mémoire (core/occupancy.py)
+OCCUPANCY_INDEX_WINDOW_DAYS = 14
+OCCUPANCY_INDEX_TTL = 60
+
+# Instantanés du planning général mis en cache (core/planning.py), en secondes
+PLANNING_CACHE_TIMEOUT = 60 * 60
+
+# Référentiels sérialisés (core/referentiels.py), en secondes : une version remplacée
+# par les signaux reste en cache au plus cette durée
+REFERENTIELS_CACHE_TIMEOUT = 60 * 60
+
+# Statistiques par semaine/mois (core/tendances.py) : durée de cache, en secondes, des
+# périodes en cours ou à venir et des périodes révolues (invalidées par les signaux)
+TENDANCES_CACHE_TIMEOUT = 60
+TENDANCES_REVOLUES_CACHE_TIMEOUT = 7 * 24 * 60 * 60
+
+# Emplois du temps PDF (core/emplois_du_temps.py) : répertoire des fichiers générés,
+# durée de validité, en secondes, de l'état d'une génération en cours, et nombre de
+# jours pendant lesquels les PDF d'une semaine terminée sont conservés
+EMPLOIS_DU_TEMPS_ROOT = MEDIA_ROOT / 'emplois_du_temps'
+EMPLOIS_DU_TEMPS_ETAT_TIMEOUT = 10 * 60
+EMPLOIS_DU_TEMPS_CONSERVATION_JOURS = 30
+
+# Utilisateurs authentifiés par JWT gardés en cache (core/authentication.py), en
+# secondes : borne la durée de vie d'une ligne modifiée sans signal (update() en masse)
+UTILISATEURS_CACHE_TIMEOUT = 15 * 60
+
+# Connexion (core/authentication.py) : au-delà de CONNEXION_ECHECS_MAX échecs pour un même
+# identifiant depuis une même adresse, les tentatives sont refusées (429) sans lecture ni hachage jusqu'à la fin
+# de la fenêtre de CONNEXION_ECHECS_FENETRE secondes ouverte par le premier échec
+CONNEXION_ECHECS_MAX = 5
+CONNEXION_ECHECS_FENETRE = 15 * 60
+
+# Purge des jetons JWT expirés (core/jetons.py) : nombre de jetons supprimés par requête
+JETONS_PURGE_TAILLE_LOT = 1000
+
+# Import d'utilisateurs depuis un roster CSV (core/importation.py) : comptes insérés par requête
+IMPORT_UTILISATEURS_TAILLE_LOT = 1000
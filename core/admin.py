@@ -6,6 +6,7 @@ from .models import (
     Formation, Salle, TypeMateriel, Materiel, CreneauHoraire,
     ReservationSalle, ReservationMateriel, RecapitulatifHoraire
 )
+from .utils import annoter_comptes_materiels
 
 User = get_user_model()
 
@@ -49,10 +50,14 @@ class TypeMaterielAdmin(admin.ModelAdmin):
     list_display = ('nom', 'get_materiels_count')
     search_fields = ('nom', 'description')
 
+    def get_queryset(self, request):
+        return annoter_comptes_materiels(super().get_queryset(request))
+
     def get_materiels_count(self, obj):
-        return obj.materiels.filter(active=True).count()
+        return obj.materiels_actifs
 
     get_materiels_count.short_description = 'Nombre de matériels'
+    get_materiels_count.admin_order_field = 'materiels_actifs'
 
 
 @admin.register(Materiel)
@@ -61,6 +66,7 @@ class MaterielAdmin(admin.ModelAdmin):
     list_filter = ('type_materiel', 'active')
     search_fields = ('nom', 'numero_serie')
     list_editable = ('active',)
+    list_select_related = ('type_materiel',)
     autocomplete_fields = ('type_materiel',)
 
 
@@ -136,13 +142,13 @@ class RecapitulatifHoraireAdmin(admin.ModelAdmin):
     def has_change_permission(self, request, obj=None):
         # Seuls les responsables de formation peuvent modifier
         if obj and not request.user.is_superuser:
-            return obj.formation.responsable == request.user
+            return obj.formation.responsable_id == request.user.pk
         return super().has_change_permission(request, obj)
 
     def has_delete_permission(self, request, obj=None):
         # Seuls les responsables de formation peuvent supprimer
         if obj and not request.user.is_superuser:
-            return obj.formation.responsable == request.user
+            return obj.formation.responsable_id == request.user.pk
         return super().has_delete_permission(request, obj)
 
 
@@ -1,11 +1,17 @@
-from rest_framework import viewsets
+from rest_framework import viewsets, status
+from rest_framework.decorators import action
+from rest_framework.parsers import MultiPartParser
 from rest_framework.views import APIView
 from rest_framework import permissions
 from rest_framework.response import Response
 from django.contrib.auth import get_user_model
 from django.contrib.auth import update_session_auth_hash
-from rest_framework_simplejwt.tokens import RefreshToken
-from core.serializers import UserSerializer, RegisterSerializer, PasswordResetSerializer, LoginSerializer
+from rest_framework_simplejwt.views import TokenRefreshView
+from core.jetons import RefreshToken
+from core.importation import lire_roster, importer_utilisateurs
+from core.serializers import (
+    UserSerializer, RegisterSerializer, PasswordResetSerializer, LoginSerializer, ImportUtilisateursSerializer
+)
 from core.paginations import StandardResultsSetPagination
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
@@ -62,6 +68,45 @@ class UserViewSet(viewsets.ReadOnlyModelViewSet):
             queryset = queryset.filter(user_type=user_type)
         return queryset
 
+    @swagger_auto_schema(
+        operation_summary="Importer des utilisateurs",
+        operation_description="Crée en une fois les comptes d'un roster CSV (colonnes nom, prenom et facultativement "
+                              "email, username, type, mot_de_passe ; séparateur , ou ;). Les matricules sont attribués "
+                              "automatiquement ; les mots de passe absents sont générés et renvoyés une seule fois. "
+                              "Aucun compte n'est créé si une ligne est invalide (réservé aux administrateurs)",
+        request_body=ImportUtilisateursSerializer,
+        responses={
+            201: openapi.Response(
+                description="Comptes créés",
+                schema=openapi.Schema(
+                    type=openapi.TYPE_OBJECT,
+                    properties={
+                        'crees': openapi.Schema(type=openapi.TYPE_INTEGER),
+                        'utilisateurs': openapi.Schema(type=openapi.TYPE_ARRAY, items=openapi.Schema(
+                            type=openapi.TYPE_OBJECT,
+                            properties={
+                                'ligne': openapi.Schema(type=openapi.TYPE_INTEGER),
+                                'matricule': openapi.Schema(type=openapi.TYPE_STRING),
+                                'username': openapi.Schema(type=openapi.TYPE_STRING),
+                                'mot_de_passe': openapi.Schema(type=openapi.TYPE_STRING, x_nullable=True)
+                            }
+                        ))
+                    }
+                )
+            ),
+            400: "Roster invalide (erreurs par numéro de ligne)"
+        },
+        tags=tags
+    )
+    @action(detail=False, methods=['post'], url_path='import', parser_classes=[MultiPartParser],
+            permission_classes=[permissions.IsAdminUser])
+    def importer(self, request):
+        serializer = ImportUtilisateursSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        lignes = lire_roster(serializer.validated_data['fichier'], serializer.validated_data.get('user_type'))
+        comptes = importer_utilisateurs(lignes)
+        return Response({'crees': len(comptes), 'utilisateurs': comptes}, status=status.HTTP_201_CREATED)
+
 class RegisterView(APIView):
     permission_classes = [permissions.AllowAny]
 
@@ -121,12 +166,16 @@ class LoginView(APIView):
             ),
             400: openapi.Response(
                 description="Identifiants invalides"
+            ),
+            429: openapi.Response(
+                description="Trop d'échecs pour cet identifiant depuis cette adresse (CONNEXION_ECHECS_MAX dans "
+                            "la fenêtre CONNEXION_ECHECS_FENETRE)"
             )
         },
         tags=["Authentification"]
     )
     def post(self, request):
-        serializer = LoginSerializer(data=request.data)
+        serializer = LoginSerializer(data=request.data, context={'request': request})
         if serializer.is_valid():
             user = serializer.validated_data
             refresh = RefreshToken.for_user(user)
@@ -138,6 +187,34 @@ class LoginView(APIView):
         return Response(serializer.errors, status=400)
 
 
+class RefreshView(TokenRefreshView):
+    """Rafraîchissement des jetons : rotation et liste noire contrôlée via le cache (core/jetons.py)"""
+
+    @swagger_auto_schema(
+        operation_summary="Rafraîchir les jetons",
+        operation_description="Échange un jeton de rafraîchissement contre un nouveau jeton d'accès et un nouveau "
+                              "jeton de rafraîchissement ; l'ancien est mis sur liste noire",
+        responses={
+            200: openapi.Response(
+                description="Jetons renouvelés",
+                schema=openapi.Schema(
+                    type=openapi.TYPE_OBJECT,
+                    properties={
+                        'refresh': openapi.Schema(type=openapi.TYPE_STRING),
+                        'access': openapi.Schema(type=openapi.TYPE_STRING)
+                    }
+                )
+            ),
+            401: openapi.Response(
+                description="Jeton invalide, expiré ou sur liste noire"
+            )
+        },
+        tags=["Authentification"]
+    )
+    def post(self, request, *args, **kwargs):
+        return super().post(request, *args, **kwargs)
+
+
 class PasswordResetView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
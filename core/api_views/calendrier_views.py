@@ -0,0 +1,159 @@
+from django.contrib.auth import get_user_model
+from django.http import HttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from rest_framework import generics, status
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from core.authentication import JetonCalendrierAuthentication, CachedJWTAuthentication
+from core.caching import version
+from core.calendrier import (
+    ICalendarRenderer, fenetre_calendrier, calendrier_ics,
+    evenements_reservations_salles, evenements_recapitulatifs
+)
+from core.conditionnel import reponse_validee
+from core.models import Salle, ReservationSalle, RecapitulatifHoraire, JetonCalendrier
+from core.permissions import CanViewRecapitulatifHoraire
+from core.planning import VERSION_PLANNING, VERSION_UTILISATEURS
+from drf_yasg.utils import swagger_auto_schema
+from drf_yasg import openapi
+
+User = get_user_model()
+
+token_param = openapi.Parameter(
+    'token',
+    openapi.IN_QUERY,
+    description="Jeton de calendrier (POST /calendrier/jeton/), à défaut d'un en-tête Authorization",
+    type=openapi.TYPE_STRING
+)
+
+
+class FluxCalendrierView(generics.GenericAPIView):
+    """
+    Base des flux iCalendar : les agendas interrogent le flux toutes les
+    quelques minutes, une empreinte (max updated_at et nombre de lignes)
+    permet de répondre 304 sans reconstruire le calendrier.
+    """
+    authentication_classes = [JetonCalendrierAuthentication, CachedJWTAuthentication]
+    renderer_classes = [JSONRenderer, ICalendarRenderer]
+
+    def sources(self, debut, fin):
+        """Retourne (nom du calendrier, [(queryset, générateur d'événements)])"""
+        raise NotImplementedError
+
+    def get(self, request, *args, **kwargs):
+        debut, fin = fenetre_calendrier()
+        nom, sources = self.sources(debut, fin)
+
+        def construire():
+            contenu = calendrier_ics(nom, *(generateur(queryset) for queryset, generateur in sources))
+            response = HttpResponse(contenu, content_type='text/calendar; charset=utf-8')
+            response['Content-Disposition'] = 'inline; filename="planning.ics"'
+            return response
+
+        # Les noms (salles, formations, créneaux) viennent des référentiels, suivis par VERSION_PLANNING ;
+        # ceux des enseignants par VERSION_UTILISATEURS
+        return reponse_validee(
+            request, construire, *(queryset for queryset, _ in sources),
+            extra=(debut, version(VERSION_PLANNING), version(VERSION_UTILISATEURS))
+        )
+
+
+class CalendrierEnseignantView(FluxCalendrierView):
+    """Flux iCalendar d'un enseignant : ses réservations de salles et ses récapitulatifs horaires"""
+    permission_classes = [CanViewRecapitulatifHoraire]
+
+    def sources(self, debut, fin):
+        enseignant = get_object_or_404(User, pk=self.kwargs['enseignant_id'], user_type='enseignant')
+        reservations = ReservationSalle.objects.filter(
+            enseignant=enseignant, date__range=(debut, fin)
+        ).select_related('salle', 'formation', 'creneau')
+        recapitulatifs = RecapitulatifHoraire.objects.filter(
+            enseignant=enseignant, date__range=(debut, fin)
+        ).select_related('formation', 'creneau', 'salle_prevue')
+        return f"EduReserve - {enseignant}", [
+            (reservations, evenements_reservations_salles),
+            (recapitulatifs, evenements_recapitulatifs),
+        ]
+
+    @swagger_auto_schema(
+        operation_summary="Flux iCalendar d'un enseignant",
+        operation_description="Réservations de salles et récapitulatifs horaires de l'enseignant, du mois écoulé "
+                              "aux six prochains mois, au format text/calendar. Répond 304 si If-None-Match "
+                              "correspond à l'ETag courant",
+        manual_parameters=[token_param],
+        responses={200: openapi.Response(description="Calendrier iCalendar"), 304: "Non modifié"},
+        tags=["Calendrier"]
+    )
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
+
+class CalendrierSalleView(FluxCalendrierView):
+    """Flux iCalendar des réservations d'une salle"""
+
+    def sources(self, debut, fin):
+        salle = get_object_or_404(Salle, pk=self.kwargs['salle_id'])
+        reservations = ReservationSalle.objects.filter(
+            salle=salle, date__range=(debut, fin)
+        ).select_related('salle', 'formation', 'creneau', 'enseignant')
+        return f"EduReserve - Salle {salle.nom}", [
+            (reservations, lambda queryset: evenements_reservations_salles(queryset, avec_enseignant=True)),
+        ]
+
+    @swagger_auto_schema(
+        operation_summary="Flux iCalendar d'une salle",
+        operation_description="Réservations de la salle, du mois écoulé aux six prochains mois, au format "
+                              "text/calendar. Répond 304 si If-None-Match correspond à l'ETag courant",
+        manual_parameters=[token_param],
+        responses={200: openapi.Response(description="Calendrier iCalendar"), 304: "Non modifié"},
+        tags=["Calendrier"]
+    )
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
+
+class JetonCalendrierView(APIView):
+    """Vue pour générer ou révoquer le jeton des flux iCalendar de l'utilisateur connecté"""
+
+    @swagger_auto_schema(
+        operation_summary="Générer le jeton de calendrier",
+        operation_description="Crée (ou remplace) le jeton longue durée des flux iCalendar de l'utilisateur connecté "
+                              "et renvoie les URLs d'abonnement. Le jeton n'est affiché qu'une fois",
+        responses={
+            201: openapi.Response(
+                description="Jeton généré",
+                schema=openapi.Schema(
+                    type=openapi.TYPE_OBJECT,
+                    properties={
+                        'jeton': openapi.Schema(type=openapi.TYPE_STRING),
+                        'flux': openapi.Schema(type=openapi.TYPE_OBJECT)
+                    }
+                )
+            )
+        },
+        tags=["Calendrier"]
+    )
+    def post(self, request, *args, **kwargs):
+        jeton = JetonCalendrier.generer(request.user)
+        flux = {
+            'salle': request.build_absolute_uri(
+                reverse('calendrier-salle', args=[0])
+            ).replace('/0.ics', '/{salle_id}.ics') + f'?token={jeton}'
+        }
+        if request.user.user_type == 'enseignant':
+            flux['enseignant'] = request.build_absolute_uri(
+                reverse('calendrier-enseignant', args=[request.user.pk])
+            ) + f'?token={jeton}'
+        return Response({'jeton': jeton, 'flux': flux}, status=status.HTTP_201_CREATED)
+
+    @swagger_auto_schema(
+        operation_summary="Révoquer le jeton de calendrier",
+        operation_description="Supprime le jeton : les abonnements existants cessent de fonctionner",
+        responses={204: "Jeton révoqué"},
+        tags=["Calendrier"]
+    )
+    def delete(self, request, *args, **kwargs):
+        JetonCalendrier.objects.filter(utilisateur=request.user).delete()
+        return Response(status=status.HTTP_204_NO_CONTENT)
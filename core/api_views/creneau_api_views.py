@@ -2,6 +2,7 @@ from rest_framework import viewsets
 from rest_framework import permissions
 from core.models import CreneauHoraire
 from core.serializers import CreneauHoraireSerializer
+from core.referentiels import ListeReferentielMixin
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 from django.utils.decorators import method_decorator
@@ -34,7 +35,8 @@ auth_header_param = openapi.Parameter(
         tags = tags
     )
 )
-class CreneauHoraireViewSet(viewsets.ReadOnlyModelViewSet):
+class CreneauHoraireViewSet(ListeReferentielMixin, viewsets.ReadOnlyModelViewSet):
     queryset = CreneauHoraire.objects.all()
     serializer_class = CreneauHoraireSerializer
-    permission_classes = [permissions.IsAuthenticated]
\ No newline at end of file
+    permission_classes = [permissions.IsAuthenticated]
+    nom_referentiel = 'creneaux'
\ No newline at end of file
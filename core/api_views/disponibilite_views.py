@@ -2,8 +2,9 @@ from rest_framework import generics
 from rest_framework import permissions
 from rest_framework.response import Response
 from rest_framework import status
-from core.models import ReservationSalle, ReservationMateriel
-from core.serializers import DisponibiliteSerializer
+from core.models import CreneauHoraire
+from core.occupancy import verifier_disponibilite, matrice_disponibilite
+from core.serializers import DisponibiliteSerializer, DisponibiliteBatchSerializer
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 
@@ -46,30 +47,8 @@ class DisponibiliteView(generics.GenericAPIView):
             date = serializer.validated_data['date']
             creneau_id = serializer.validated_data['creneau_id']
 
-            disponible = True
-            conflit = None
-
-            if type_ressource == 'salle':
-                conflit_reservation = ReservationSalle.objects.filter(
-                    salle_id=ressource_id,
-                    date=date,
-                    creneau_id=creneau_id
-                ).first()
-
-                if conflit_reservation:
-                    disponible = False
-                    conflit = f"Réservée par {conflit_reservation.enseignant} pour {conflit_reservation.formation.nom}"
-
-            elif type_ressource == 'materiel':
-                conflit_reservation = ReservationMateriel.objects.filter(
-                    materiel_id=ressource_id,
-                    date=date,
-                    creneau_id=creneau_id
-                ).first()
-
-                if conflit_reservation:
-                    disponible = False
-                    conflit = f"Réservé par {conflit_reservation.enseignant} pour {conflit_reservation.formation.nom}"
+            # L'index d'occupation répond sans requête lorsque la ressource est libre
+            disponible, conflit = verifier_disponibilite(type_ressource, ressource_id, date, creneau_id)
 
             response_data = serializer.validated_data.copy()
             response_data['disponible'] = disponible
@@ -78,4 +57,57 @@ class DisponibiliteView(generics.GenericAPIView):
 
             return Response(response_data)
 
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
\ No newline at end of file
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+class DisponibiliteBatchView(generics.GenericAPIView):
+    """Vue pour vérifier en un seul appel la disponibilité de plusieurs ressources"""
+    permission_classes = [permissions.IsAuthenticated]
+
+    @swagger_auto_schema(
+        operation_summary="Vérifier la disponibilité en lot",
+        operation_description="Vérifie la disponibilité de plusieurs salles et matériels sur une liste ou une période "
+                              "de dates et un ensemble de créneaux (tous les créneaux par défaut). Chaque ressource "
+                              "reçoit une chaîne par date, avec un caractère par créneau : '1' libre, '0' réservé",
+        request_body=DisponibiliteBatchSerializer,
+        responses={
+            200: openapi.Response(
+                description="Matrice de disponibilité",
+                schema=openapi.Schema(
+                    type=openapi.TYPE_OBJECT,
+                    properties={
+                        'dates': openapi.Schema(type=openapi.TYPE_ARRAY,
+                                                items=openapi.Schema(type=openapi.TYPE_STRING, format=openapi.FORMAT_DATE)),
+                        'creneaux': openapi.Schema(type=openapi.TYPE_ARRAY,
+                                                   items=openapi.Schema(type=openapi.TYPE_INTEGER)),
+                        'salles': openapi.Schema(type=openapi.TYPE_OBJECT),
+                        'materiels': openapi.Schema(type=openapi.TYPE_OBJECT)
+                    }
+                )
+            ),
+            400: openapi.Response(
+                description="Données invalides ou identifiants de salle, de matériel ou de créneau inconnus"
+            )
+        },
+        tags=["Disponibilité"]
+    )
+    def post(self, request, *args, **kwargs):
+        serializer = DisponibiliteBatchSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        data = serializer.validated_data
+        creneau_ids = data.get('creneaux') or list(CreneauHoraire.objects.values_list('id', flat=True))
+
+        # Une requête groupée au plus par type de ressource, quelle que soit la taille du lot
+        matrices = {
+            type_ressource: matrice_disponibilite(type_ressource, data[champ], data['dates'], creneau_ids)
+            for type_ressource, champ in (('salle', 'salles'), ('materiel', 'materiels'))
+        }
+
+        return Response({
+            'dates': data['dates'],
+            'creneaux': creneau_ids,
+            'salles': {str(pk): lignes for pk, lignes in matrices['salle'].items()},
+            'materiels': {str(pk): lignes for pk, lignes in matrices['materiel'].items()}
+        })
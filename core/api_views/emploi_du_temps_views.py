@@ -0,0 +1,138 @@
+from django.http import FileResponse, Http404
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import generics, permissions, status
+from rest_framework.exceptions import PermissionDenied
+from rest_framework.response import Response
+from core.emplois_du_temps import (
+    TYPES_EMPLOI_DU_TEMPS, CLE_EMPLOI_DU_TEMPS, lundi, cle_emploi_du_temps, chemin_pdf,
+    etat_generation, reserver_generation
+)
+from core.serializers import EmploiDuTempsSerializer
+from core.tasks import generer_emploi_du_temps_pdf
+from drf_yasg.utils import swagger_auto_schema
+from drf_yasg import openapi
+
+reponse_emploi_du_temps = openapi.Schema(
+    type=openapi.TYPE_OBJECT,
+    properties={
+        'cle': openapi.Schema(type=openapi.TYPE_STRING),
+        'statut': openapi.Schema(type=openapi.TYPE_STRING, enum=['en_cours', 'pret', 'erreur']),
+        'statut_url': openapi.Schema(type=openapi.TYPE_STRING),
+        'fichier': openapi.Schema(type=openapi.TYPE_STRING, description="URL du PDF lorsque le statut est 'pret'"),
+        'erreur': openapi.Schema(type=openapi.TYPE_STRING)
+    }
+)
+
+
+def verifier_acces(user, type_emploi):
+    """Les emplois du temps d'enseignants sont réservés aux enseignants, comme leurs récapitulatifs"""
+    if type_emploi == 'enseignant' and user.user_type != 'enseignant':
+        raise PermissionDenied("Seuls les enseignants peuvent consulter l'emploi du temps d'un enseignant")
+
+
+def etat_emploi_du_temps(request, cle, etat):
+    donnees = {
+        'cle': cle,
+        'statut': etat['statut'],
+        'statut_url': request.build_absolute_uri(reverse('emploi-du-temps-statut', args=[cle]))
+    }
+    if etat['statut'] == 'pret':
+        donnees['fichier'] = request.build_absolute_uri(reverse('emploi-du-temps-fichier', args=[etat['cle']]))
+    elif etat['statut'] == 'erreur':
+        donnees['erreur'] = etat['erreur']
+    return donnees
+
+
+class EmploiDuTempsView(generics.GenericAPIView):
+    """Vue pour demander la génération de l'emploi du temps PDF d'une semaine"""
+    permission_classes = [permissions.IsAuthenticated]
+    serializer_class = EmploiDuTempsSerializer
+
+    @swagger_auto_schema(
+        operation_summary="Demander un emploi du temps PDF",
+        operation_description="Emploi du temps hebdomadaire (lundi au samedi) d'une salle, d'une formation ou d'un "
+                              "enseignant. Si le PDF existe déjà pour l'état actuel des réservations, son URL est "
+                              "renvoyée immédiatement (200) ; sinon la génération est lancée en tâche de fond (202) "
+                              "et l'avancement se suit sur statut_url",
+        request_body=EmploiDuTempsSerializer,
+        responses={
+            200: openapi.Response(description="PDF disponible", schema=reponse_emploi_du_temps),
+            202: openapi.Response(description="Génération en cours", schema=reponse_emploi_du_temps),
+            400: "Données invalides",
+            404: "Salle, formation ou enseignant introuvable"
+        },
+        tags=["Emplois du temps"]
+    )
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        type_emploi = serializer.validated_data['type']
+        pk = serializer.validated_data['id']
+        debut = lundi(serializer.validated_data.get('semaine') or timezone.localdate())
+        verifier_acces(request.user, type_emploi)
+        modele, _, filtres = TYPES_EMPLOI_DU_TEMPS[type_emploi]
+        if not modele.objects.filter(pk=pk, **filtres).exists():
+            raise Http404
+
+        cle = cle_emploi_du_temps(type_emploi, pk, debut)
+        etat = etat_generation(cle)
+        if etat is None or etat['statut'] == 'erreur':
+            if reserver_generation(cle):
+                # Exécutée sur place en mode eager (sans broker), par un worker sinon
+                generer_emploi_du_temps_pdf.delay(type_emploi, pk, debut.isoformat(), cle)
+            etat = etat_generation(cle) or {'statut': 'en_cours'}
+
+        return Response(
+            etat_emploi_du_temps(request, cle, etat),
+            status=status.HTTP_200_OK if etat['statut'] == 'pret' else status.HTTP_202_ACCEPTED
+        )
+
+
+class EmploiDuTempsStatutView(generics.GenericAPIView):
+    """Vue pour suivre la génération d'un emploi du temps PDF"""
+    permission_classes = [permissions.IsAuthenticated]
+
+    @swagger_auto_schema(
+        operation_summary="Statut d'un emploi du temps PDF",
+        operation_description="Renvoie l'état de la génération ('en_cours', 'pret' avec l'URL du fichier, 'erreur')",
+        responses={200: openapi.Response(description="État de la génération", schema=reponse_emploi_du_temps),
+                   404: "Génération inconnue ou expirée"},
+        tags=["Emplois du temps"]
+    )
+    def get(self, request, cle, *args, **kwargs):
+        correspondance = CLE_EMPLOI_DU_TEMPS.match(cle)
+        if not correspondance:
+            raise Http404
+        verifier_acces(request.user, correspondance.group(1))
+        etat = etat_generation(cle)
+        if etat is None:
+            raise Http404
+        return Response(etat_emploi_du_temps(request, cle, etat))
+
+
+class EmploiDuTempsFichierView(generics.GenericAPIView):
+    """Vue pour télécharger un emploi du temps PDF généré"""
+    permission_classes = [permissions.IsAuthenticated]
+
+    @swagger_auto_schema(
+        operation_summary="Télécharger un emploi du temps PDF",
+        operation_description="Sert le fichier généré depuis le disque. Son nom dépend de l'état des données : "
+                              "le contenu d'une URL ne change jamais",
+        responses={200: openapi.Response(description="Document PDF"), 404: "Fichier introuvable"},
+        tags=["Emplois du temps"]
+    )
+    def get(self, request, cle, *args, **kwargs):
+        correspondance = CLE_EMPLOI_DU_TEMPS.match(cle)
+        if not correspondance:
+            raise Http404
+        verifier_acces(request.user, correspondance.group(1))
+        try:
+            fichier = open(chemin_pdf(cle), 'rb')
+        except FileNotFoundError:
+            raise Http404
+        response = FileResponse(fichier, content_type='application/pdf', filename=f'emploi-du-temps-{cle}.pdf')
+        response['Cache-Control'] = 'private, max-age=31536000, immutable'
+        return response
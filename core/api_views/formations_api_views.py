@@ -3,6 +3,7 @@ from core.models import Formation
 from core.serializers import FormationSerializer
 from core.permissions import IsEnseignantOrReadOnly
 from core.paginations import StandardResultsSetPagination
+from core.referentiels import ListeReferentielMixin
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 from django.utils.decorators import method_decorator
@@ -71,8 +72,9 @@ auth_header_param = openapi.Parameter(
         tags = tags
     )
 )
-class FormationViewSet(viewsets.ModelViewSet):
+class FormationViewSet(ListeReferentielMixin, viewsets.ModelViewSet):
     queryset = Formation.objects.all()
     serializer_class = FormationSerializer
     permission_classes = [IsEnseignantOrReadOnly]
-    pagination_class = StandardResultsSetPagination
\ No newline at end of file
+    pagination_class = StandardResultsSetPagination
+    nom_referentiel = 'formations'
\ No newline at end of file
@@ -7,6 +7,10 @@ from core.models import Materiel, ReservationMateriel
 from core.serializers import MaterielSerializer, ReservationMaterielSerializer
 from core.permissions import IsEnseignantOrReadOnly
 from core.paginations import StandardResultsSetPagination
+from core.caching import version
+from core.conditionnel import reponse_validee
+from core.planning import VERSION_PLANNING, VERSION_UTILISATEURS
+from core.sideload import Inclusions, serialiser_a_plat, sideload_demande, sideload_param
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 from django.utils.decorators import method_decorator
@@ -90,7 +94,8 @@ class MaterielViewSet(viewsets.ModelViewSet):
 
     @swagger_auto_schema(
         operation_summary="Planning d'un matériel",
-        operation_description="Récupère le planning d'un matériel pour une période donnée",
+        operation_description="Récupère le planning d'un matériel pour une période donnée. Répond 304 si "
+                              "If-None-Match correspond à l'ETag courant",
         manual_parameters=[
             openapi.Parameter(
                 'date_debut',
@@ -106,6 +111,7 @@ class MaterielViewSet(viewsets.ModelViewSet):
                 type=openapi.TYPE_STRING,
                 format=openapi.FORMAT_DATE
             ),
+            sideload_param,
             auth_header_param
         ],
         responses={
@@ -139,11 +145,24 @@ class MaterielViewSet(viewsets.ModelViewSet):
         reservations = ReservationMateriel.objects.filter(
             materiel=materiel,
             date__range=[date_debut, date_fin]
-        ).select_related('enseignant', 'formation', 'creneau')
+        ).select_related('enseignant', 'materiel')
 
-        serializer = ReservationMaterielSerializer(reservations, many=True)
-        return Response({
-            'materiel': MaterielSerializer(materiel).data,
-            'periode': {'debut': date_debut, 'fin': date_fin},
-            'reservations': serializer.data
-        })
+        def construire():
+            data = {
+                'materiel': MaterielSerializer(materiel, context=self.get_serializer_context()).data,
+                'periode': {'debut': date_debut, 'fin': date_fin},
+            }
+            if sideload_demande(request):
+                inclusions = Inclusions()
+                data['reservations'] = serialiser_a_plat(reservations, inclusions)
+                data['included'] = inclusions.serialiser()
+            else:
+                data['reservations'] = ReservationMaterielSerializer(
+                    reservations, many=True, context=self.get_serializer_context()
+                ).data
+            return Response(data)
+
+        # Les référentiels imbriqués (matériel, type, formations, créneaux) sont suivis par VERSION_PLANNING,
+        # les enseignants imbriqués par VERSION_UTILISATEURS
+        return reponse_validee(request, construire, reservations,
+                               extra=(date_debut, date_fin, version(VERSION_PLANNING), version(VERSION_UTILISATEURS)))
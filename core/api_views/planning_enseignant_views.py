@@ -3,11 +3,15 @@ from rest_framework.response import Response
 from rest_framework import status
 from datetime import datetime, timedelta
 from django.contrib.auth import get_user_model
+from core.caching import version
+from core.conditionnel import reponse_validee
 from core.permissions import CanViewRecapitulatifHoraire
 from core.models import RecapitulatifHoraire, ReservationMateriel, ReservationSalle
 from core.paginations import StandardResultsSetPagination
+from core.planning import VERSION_PLANNING
 from core.serializers import UserSerializer, RecapitulatifHoraireSerializer, ReservationMaterielSerializer, \
     ReservationSalleSerializer, MaterielSerializer
+from core.sideload import Inclusions, serialiser_a_plat, sideload_demande, sideload_param
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 
@@ -21,7 +25,8 @@ class PlanningEnseignantView(generics.ListAPIView):
 
     @swagger_auto_schema(
         operation_summary="Planning d'un enseignant",
-        operation_description="Récupère le planning complet d'un enseignant avec ses récapitulatifs horaires et réservations",
+        operation_description="Récupère le planning complet d'un enseignant avec ses récapitulatifs horaires et "
+                              "réservations. Répond 304 si If-None-Match correspond à l'ETag courant",
         manual_parameters=[
             openapi.Parameter(
                 'enseignant_id',
@@ -43,7 +48,8 @@ class PlanningEnseignantView(generics.ListAPIView):
                 description="Date de fin du filtre (format: YYYY-MM-DD)",
                 type=openapi.TYPE_STRING,
                 format=openapi.FORMAT_DATE
-            )
+            ),
+            sideload_param
         ],
         responses={
             200: openapi.Response(
@@ -79,7 +85,7 @@ class PlanningEnseignantView(generics.ListAPIView):
         # Récupérer les récapitulatifs horaires
         recapitulatifs = RecapitulatifHoraire.objects.filter(
             enseignant=enseignant
-        ).select_related('formation', 'creneau', 'salle_prevue')
+        ).select_related('enseignant')
 
         # Filtrer par date si spécifiée
         date_debut = request.query_params.get('date_debut', None)
@@ -96,11 +102,11 @@ class PlanningEnseignantView(generics.ListAPIView):
         # Récupérer aussi les réservations réelles pour comparaison
         reservations_salles = ReservationSalle.objects.filter(
             enseignant=enseignant
-        ).select_related('salle', 'formation', 'creneau')
+        ).select_related('enseignant')
 
         reservations_materiels = ReservationMateriel.objects.filter(
             enseignant=enseignant
-        ).select_related('salle', 'formation', 'creneau')
+        ).select_related('enseignant', 'materiel')
 
         if date_debut:
             reservations_salles = reservations_salles.filter(date__gte=date_debut)
@@ -109,9 +115,25 @@ class PlanningEnseignantView(generics.ListAPIView):
             reservations_salles = reservations_salles.filter(date__lte=date_fin)
             reservations_materiels = reservations_materiels.filter(date__lte=date_fin)
 
-        return Response({
-            'enseignant': UserSerializer(enseignant).data,
-            'recapitulatifs': RecapitulatifHoraireSerializer(recapitulatifs, many=True).data,
-            'reservations_salles': ReservationSalleSerializer(reservations_salles, many=True).data,
-            'reservation_materiels': MaterielSerializer(reservations_materiels, many=True).data,
-        })
+        def construire():
+            if sideload_demande(request):
+                inclusions = Inclusions()
+                return Response({
+                    'enseignant': UserSerializer(enseignant).data,
+                    'recapitulatifs': serialiser_a_plat(recapitulatifs, inclusions),
+                    'reservations_salles': serialiser_a_plat(reservations_salles, inclusions),
+                    'reservation_materiels': serialiser_a_plat(reservations_materiels, inclusions),
+                    'included': inclusions.serialiser()
+                })
+
+            return Response({
+                'enseignant': UserSerializer(enseignant).data,
+                'recapitulatifs': RecapitulatifHoraireSerializer(recapitulatifs, many=True).data,
+                'reservations_salles': ReservationSalleSerializer(reservations_salles, many=True).data,
+                'reservation_materiels': MaterielSerializer(reservations_materiels, many=True).data,
+            })
+
+        # L'enseignant, déjà chargé, entre dans l'empreinte ; les référentiels sont suivis par VERSION_PLANNING
+        return reponse_validee(request, construire, recapitulatifs, reservations_salles, reservations_materiels,
+                               extra=(enseignant.first_name, enseignant.last_name, enseignant.email,
+                                      version(VERSION_PLANNING)))
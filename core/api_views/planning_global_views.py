@@ -1,10 +1,13 @@
 from rest_framework import generics
+from rest_framework import permissions
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
-from datetime import datetime, timedelta
 from django.utils import timezone
-from core.models import ReservationSalle, ReservationMateriel, CreneauHoraire
-from core.serializers import ReservationMaterielSerializer, ReservationSalleSerializer, CreneauHoraireSerializer
 from core.permissions import CanViewPlanningDetails
+from core.sideload import sideload_demande, sideload_param, fusionner_inclusions
+from core.conditionnel import reponse_avec_validateurs
+from core.planning import plannings_en_cache, statistiques_cache_plannings, validateurs_plannings, MAX_JOURS_PLANNING
+from core.utils import parse_date
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 
@@ -14,7 +17,9 @@ class PlanningGeneralView(generics.ListAPIView):
 
     @swagger_auto_schema(
         operation_summary="Planning général",
-        operation_description="Récupère le planning général des salles et matériels pour une date donnée, organisé par créneaux horaires",
+        operation_description="Récupère le planning général des salles et matériels pour une date donnée, organisé par "
+                              "créneaux horaires. Avec date_debut/date_fin, renvoie un planning par jour de la période. "
+                              "Répond 304 si If-None-Match correspond à l'ETag courant",
         manual_parameters=[
             openapi.Parameter(
                 'date',
@@ -22,7 +27,23 @@ class PlanningGeneralView(generics.ListAPIView):
                 description="Date du planning (format: YYYY-MM-DD). Par défaut: aujourd'hui",
                 type=openapi.TYPE_STRING,
                 format=openapi.FORMAT_DATE
-            )
+            ),
+            openapi.Parameter(
+                'date_debut',
+                openapi.IN_QUERY,
+                description="Début d'une période de plusieurs jours (format: YYYY-MM-DD), "
+                            f"au plus {MAX_JOURS_PLANNING} jours avec date_fin",
+                type=openapi.TYPE_STRING,
+                format=openapi.FORMAT_DATE
+            ),
+            openapi.Parameter(
+                'date_fin',
+                openapi.IN_QUERY,
+                description="Fin de la période (format: YYYY-MM-DD). Par défaut: date_debut",
+                type=openapi.TYPE_STRING,
+                format=openapi.FORMAT_DATE
+            ),
+            sideload_param
         ],
         responses={
             200: openapi.Response(
@@ -32,48 +53,81 @@ class PlanningGeneralView(generics.ListAPIView):
                     properties={
                         'date': openapi.Schema(type=openapi.TYPE_STRING, format=openapi.FORMAT_DATE),
                         'planning': openapi.Schema(type=openapi.TYPE_OBJECT),
+                        'periode': openapi.Schema(type=openapi.TYPE_OBJECT,
+                                                  description="Uniquement avec date_debut/date_fin"),
+                        'plannings': openapi.Schema(type=openapi.TYPE_OBJECT,
+                                                    description="Planning de chaque jour, indexé par date"),
+                        'included': openapi.Schema(type=openapi.TYPE_OBJECT,
+                                                   description="Objets liés dédupliqués (avec sideload=1)"),
                         'creneaux': openapi.Schema(type=openapi.TYPE_ARRAY,
                                                    items=openapi.Schema(type=openapi.TYPE_OBJECT))
                     }
                 )
-            )
+            ),
+            304: "Non modifié"
         },
         tags=["Planning"]
     )
     def get(self, request, *args, **kwargs):
-        date = request.query_params.get('date', timezone.now().date())
-        if isinstance(date, str):
-            date = datetime.strptime(date, '%Y-%m-%d').date()
+        a_plat = sideload_demande(request)
+        date_debut = parse_date(request.query_params.get('date_debut'), nom='date_debut')
 
-        # Récupérer toutes les réservations pour la date donnée
-        reservations_salles = ReservationSalle.objects.filter(date=date).select_related(
-            'salle', 'enseignant', 'formation', 'creneau'
-        )
-        reservations_materiels = ReservationMateriel.objects.filter(date=date).select_related(
-            'materiel', 'enseignant', 'formation', 'creneau'
-        )
+        if date_debut is None:
+            date = parse_date(request.query_params.get('date'), timezone.now().date())
 
-        # Organiser par créneau
-        creneaux = CreneauHoraire.objects.all()
-        planning = {}
+            def construire():
+                instantanes, creneaux = plannings_en_cache(date, date, a_plat)
+                return Response({
+                    'date': date,
+                    **instantanes[date],
+                    'creneaux': creneaux
+                })
 
-        for creneau in creneaux:
-            # Récupérer la réservation de salle pour ce créneau (s'il y en a une)
-            reservation_salle = reservations_salles.filter(creneau=creneau)
-            salle_data = ReservationSalleSerializer(reservation_salle, many=True).data
+            # Les révisions suivent l'invalidation du cache des instantanés : une réponse 304 ne coûte aucune requête
+            return reponse_avec_validateurs(request, construire, *validateurs_plannings(date, date))
 
-            # Récupérer les réservations de matériel pour ce créneau
-            reservations_mat = reservations_materiels.filter(creneau=creneau)
-            materiels_data = ReservationMaterielSerializer(reservations_mat, many=True).data
+        date_fin = parse_date(request.query_params.get('date_fin'), date_debut, nom='date_fin')
+        if date_fin < date_debut:
+            raise ValidationError({'date_fin': "date_fin doit être postérieure ou égale à date_debut"})
+        if (date_fin - date_debut).days >= MAX_JOURS_PLANNING:
+            raise ValidationError({'date_fin': f"La période ne peut pas dépasser {MAX_JOURS_PLANNING} jours"})
 
-            # Ajouter au planning
-            planning[creneau.nom] = {
-                'salle': salle_data,
-                'materiels': materiels_data
+        def construire():
+            instantanes, creneaux = plannings_en_cache(date_debut, date_fin, a_plat)
+            data = {
+                'periode': {'debut': date_debut, 'fin': date_fin},
+                'plannings': {jour.isoformat(): instantane['planning'] for jour, instantane in instantanes.items()},
+                'creneaux': creneaux
             }
+            if a_plat:
+                data['included'] = fusionner_inclusions(instantane['included'] for instantane in instantanes.values())
+            return Response(data)
+
+        return reponse_avec_validateurs(request, construire, *validateurs_plannings(date_debut, date_fin))
+
+
+class PlanningCacheStatsView(generics.GenericAPIView):
+    """Vue pour suivre l'efficacité du cache des plannings"""
+    permission_classes = [permissions.IsAdminUser]
 
-        return Response({
-            'date': date,
-            'planning': dict(planning),
-            'creneaux': CreneauHoraireSerializer(creneaux, many=True).data
-        })
\ No newline at end of file
+    @swagger_auto_schema(
+        operation_summary="Statistiques du cache des plannings",
+        operation_description="Nombre de jours de planning servis depuis le cache (hits) ou reconstruits (misses) "
+                              "et taux de succès, cumulés depuis le dernier vidage du cache",
+        responses={
+            200: openapi.Response(
+                description="Compteurs du cache",
+                schema=openapi.Schema(
+                    type=openapi.TYPE_OBJECT,
+                    properties={
+                        'hits': openapi.Schema(type=openapi.TYPE_INTEGER),
+                        'misses': openapi.Schema(type=openapi.TYPE_INTEGER),
+                        'ratio': openapi.Schema(type=openapi.TYPE_NUMBER)
+                    }
+                )
+            )
+        },
+        tags=["Planning"]
+    )
+    def get(self, request, *args, **kwargs):
+        return Response(statistiques_cache_plannings())
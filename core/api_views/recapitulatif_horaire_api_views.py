@@ -2,7 +2,9 @@ from rest_framework import viewsets
 from core.models import RecapitulatifHoraire
 from core.serializers import RecapitulatifHoraireSerializer
 from core.permissions import IsResponsableFormationOrReadOnly
-from core.paginations import LargeResultsSetPagination
+from core.paginations import ReservationPagination, keyset_params
+from core.sideload import SideloadMixin, sideload_param
+from core.exports import ExportCSVMixin, export_params
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 from django.utils.decorators import method_decorator
@@ -42,6 +44,8 @@ auth_header_param = openapi.Parameter(
                 type=openapi.TYPE_STRING,
                 format=openapi.FORMAT_DATE
             ),
+            sideload_param,
+            *keyset_params,
             auth_header_param
         ],
         tags = tags
@@ -52,7 +56,7 @@ auth_header_param = openapi.Parameter(
     decorator=swagger_auto_schema(
         operation_summary="Détails d'un récapitulatif horaire",
         operation_description="Récupère les détails d'un récapitulatif horaire spécifique",
-        manual_parameters=[auth_header_param],
+        manual_parameters=[sideload_param, auth_header_param],
         tags = tags
     )
 )
@@ -92,15 +96,37 @@ auth_header_param = openapi.Parameter(
         tags = tags
     )
 )
-class RecapitulatifHoraireViewSet(viewsets.ModelViewSet):
+@method_decorator(
+    name="export",
+    decorator=swagger_auto_schema(
+        operation_summary="Exporter les récapitulatifs horaires en CSV",
+        operation_description="Exporte en CSV, en flux continu, les lignes de la liste avec les mêmes filtres, "
+                              "éventuellement restreintes à une période (date_debut, date_fin)",
+        manual_parameters=export_params + [auth_header_param],
+        responses={200: openapi.Response(description="Fichier CSV")},
+        tags = tags
+    )
+)
+class RecapitulatifHoraireViewSet(ExportCSVMixin, SideloadMixin, viewsets.ModelViewSet):
     serializer_class = RecapitulatifHoraireSerializer
     permission_classes = [IsResponsableFormationOrReadOnly]
-    pagination_class = LargeResultsSetPagination
+    pagination_class = ReservationPagination
+    colonnes_export = [
+        ('id', 'id'),
+        ('formation', 'formation__nom'),
+        ('date', 'date'),
+        ('creneau', 'creneau__nom'),
+        ('matricule_enseignant', 'enseignant__matricule'),
+        ('nom_enseignant', 'enseignant__last_name'),
+        ('prenom_enseignant', 'enseignant__first_name'),
+        ('sujet', 'sujet'),
+        ('salle_prevue', 'salle_prevue__nom'),
+        ('commentaires', 'commentaires'),
+    ]
+    nom_export = 'recapitulatifs'
 
     def get_queryset(self):
-        queryset = RecapitulatifHoraire.objects.select_related(
-            'formation', 'enseignant', 'creneau', 'salle_prevue'
-        )
+        queryset = RecapitulatifHoraire.objects.select_related('enseignant', 'formation')
 
         # Filtrer par formation si l'utilisateur est responsable
         formation = self.request.query_params.get('formation', None)
@@ -1,8 +1,11 @@
 from rest_framework import viewsets
 from core.models import ReservationMateriel
-from core.serializers import ReservationMaterielSerializer
+from core.serializers import ReservationMaterielSerializer, ReservationMaterielEnMasseSerializer, ReservationsEnMasseSerializer
+from core.bulk import ReservationEnMasseMixin
 from core.permissions import IsEnseignant, IsOwnerOrReadOnly
-from core.paginations import LargeResultsSetPagination
+from core.paginations import ReservationPagination, keyset_params
+from core.sideload import SideloadMixin, sideload_param
+from core.exports import ExportCSVMixin, export_params
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 from django.utils.decorators import method_decorator
@@ -42,6 +45,8 @@ auth_header_param = openapi.Parameter(
                 description="Filtrer par ID de formation",
                 type=openapi.TYPE_INTEGER
             ),
+            sideload_param,
+            *keyset_params,
             auth_header_param
         ],
         tags = tags
@@ -52,7 +57,7 @@ auth_header_param = openapi.Parameter(
     decorator=swagger_auto_schema(
         operation_summary="Détails d'une réservation de matériels",
         operation_description="Récupère les détails d'une réservation de matériels spécifique",
-        manual_parameters=[auth_header_param],
+        manual_parameters=[sideload_param, auth_header_param],
         tags = tags
     )
 )
@@ -92,10 +97,58 @@ auth_header_param = openapi.Parameter(
         tags = tags
     )
 )
-class ReservationMaterielViewSet(viewsets.ModelViewSet):
+@method_decorator(
+    name="en_masse",
+    decorator=swagger_auto_schema(
+        operation_summary="Créer des réservations de matériels en masse",
+        operation_description="Crée jusqu'à 1000 réservations pour l'enseignant connecté. Les conflits avec la base "
+                              "et à l'intérieur du lot sont détectés en une requête groupée, puis les réservations "
+                              "sont insérées en une transaction. Mode `tout_ou_rien` (défaut) : rien n'est créé si un "
+                              "élément est en erreur ; mode `partiel` : les éléments valides sont créés. Chaque "
+                              "élément de `reservations` suit le format de ReservationMaterielEnMasseSerializer",
+        request_body=ReservationsEnMasseSerializer,
+        manual_parameters=[auth_header_param],
+        responses={
+            201: openapi.Response(description="Réservations créées (identifiants seuls) et rapport d'erreurs par indice"),
+            400: openapi.Response(description="Aucune réservation créée, rapport d'erreurs par indice"),
+            409: openapi.Response(description="Conflit avec une réservation enregistrée pendant l'insertion")
+        },
+        tags = tags
+    )
+)
+@method_decorator(
+    name="export",
+    decorator=swagger_auto_schema(
+        operation_summary="Exporter les réservations de matériels en CSV",
+        operation_description="Exporte en CSV, en flux continu, les lignes de la liste avec les mêmes filtres, "
+                              "éventuellement restreintes à une période (date_debut, date_fin)",
+        manual_parameters=export_params + [auth_header_param],
+        responses={200: openapi.Response(description="Fichier CSV")},
+        tags = tags
+    )
+)
+class ReservationMaterielViewSet(ExportCSVMixin, ReservationEnMasseMixin, SideloadMixin, viewsets.ModelViewSet):
     serializer_class = ReservationMaterielSerializer
     permission_classes = [IsEnseignant, IsOwnerOrReadOnly]
-    pagination_class = LargeResultsSetPagination
+    pagination_class = ReservationPagination
+    colonnes_export = [
+        ('id', 'id'),
+        ('date', 'date'),
+        ('creneau', 'creneau__nom'),
+        ('materiel', 'materiel__nom'),
+        ('numero_serie', 'materiel__numero_serie'),
+        ('type_materiel', 'materiel__type_materiel__nom'),
+        ('formation', 'formation__nom'),
+        ('matricule_enseignant', 'enseignant__matricule'),
+        ('nom_enseignant', 'enseignant__last_name'),
+        ('prenom_enseignant', 'enseignant__first_name'),
+        ('commentaires', 'commentaires'),
+        ('cree_le', 'created_at'),
+    ]
+    nom_export = 'reservations-materiels'
+    champ_ressource = 'materiel'
+    element_en_masse_serializer_class = ReservationMaterielEnMasseSerializer
+    message_conflit = "Le matériel {} est déjà réservé pour ce créneau"
 
     def get_queryset(self):
         
@@ -103,13 +156,11 @@ class ReservationMaterielViewSet(viewsets.ModelViewSet):
         if getattr(self, 'swagger_fake_view', False):
             return ReservationMateriel.objects.none()
             
-        queryset = ReservationMateriel.objects.select_related(
-            'enseignant', 'salle', 'formation', 'creneau'
-        )
+        queryset = ReservationMateriel.objects.select_related('enseignant', 'materiel')
 
         # Filtrer par enseignant pour les utilisateurs non-admin
         if not self.request.user.is_superuser:
-            if self.action in ['list', 'retrieve']:
+            if self.action in ['list', 'retrieve', 'export']:
                 # Pour la lecture, tout le monde peut voir les réservations
                 pass
             else:
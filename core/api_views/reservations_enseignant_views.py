@@ -1,10 +1,14 @@
 from rest_framework import generics
 from datetime import datetime, timedelta
 from rest_framework.response import Response
+from core.caching import version
+from core.conditionnel import reponse_validee
 from core.models import ReservationSalle, ReservationMateriel
 from core.serializers import ReservationSalleSerializer, ReservationMaterielSerializer
 from core.permissions import IsEnseignant
 from core.paginations import StandardResultsSetPagination
+from core.planning import VERSION_PLANNING, VERSION_UTILISATEURS
+from core.sideload import Inclusions, serialiser_a_plat, sideload_demande, sideload_param
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 
@@ -15,7 +19,8 @@ class MesReservationsView(generics.ListAPIView):
 
     @swagger_auto_schema(
         operation_summary="Mes réservations",
-        operation_description="Récupère toutes les réservations (salles et matériels) de l'enseignant connecté",
+        operation_description="Récupère toutes les réservations (salles et matériels) de l'enseignant connecté. "
+                              "Répond 304 si If-None-Match correspond à l'ETag courant",
         manual_parameters=[
             openapi.Parameter(
                 'date_debut',
@@ -30,7 +35,8 @@ class MesReservationsView(generics.ListAPIView):
                 description="Date de fin du filtre (format: YYYY-MM-DD)",
                 type=openapi.TYPE_STRING,
                 format=openapi.FORMAT_DATE
-            )
+            ),
+            sideload_param
         ],
         responses={
             200: openapi.Response(
@@ -52,12 +58,12 @@ class MesReservationsView(generics.ListAPIView):
         # Récupérer les réservations de salles
         reservations_salles = ReservationSalle.objects.filter(
             enseignant=request.user
-        ).select_related('salle', 'formation', 'creneau')
+        ).select_related('enseignant')
 
         # Récupérer les réservations de matériel
         reservations_materiels = ReservationMateriel.objects.filter(
             enseignant=request.user
-        ).select_related('materiel', 'formation', 'creneau')
+        ).select_related('enseignant', 'materiel')
 
         # Filtrer par date si spécifiée
         date_debut = request.query_params.get('date_debut', None)
@@ -73,7 +79,22 @@ class MesReservationsView(generics.ListAPIView):
             reservations_salles = reservations_salles.filter(date__lte=date_fin)
             reservations_materiels = reservations_materiels.filter(date__lte=date_fin)
 
-        return Response({
-            'reservations_salles': ReservationSalleSerializer(reservations_salles, many=True).data,
-            'reservations_materiels': ReservationMaterielSerializer(reservations_materiels, many=True).data
-        })
\ No newline at end of file
+        def construire():
+            if sideload_demande(request):
+                inclusions = Inclusions()
+                return Response({
+                    'reservations_salles': serialiser_a_plat(reservations_salles, inclusions),
+                    'reservations_materiels': serialiser_a_plat(reservations_materiels, inclusions),
+                    'included': inclusions.serialiser()
+                })
+
+            return Response({
+                'reservations_salles': ReservationSalleSerializer(reservations_salles, many=True).data,
+                'reservations_materiels': ReservationMaterielSerializer(
+                    reservations_materiels, many=True, context=self.get_serializer_context()
+                ).data
+            })
+
+        # Les référentiels imbriqués sont suivis par VERSION_PLANNING, l'enseignant par VERSION_UTILISATEURS
+        return reponse_validee(request, construire, reservations_salles, reservations_materiels,
+                               extra=(request.user.pk, version(VERSION_PLANNING), version(VERSION_UTILISATEURS)))
\ No newline at end of file
@@ -1,11 +1,17 @@
 from rest_framework import viewsets
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from core.serializers import SalleSerializer, ReservationSalleSerializer
+from django.db.models import Exists, OuterRef, F
+from core.serializers import SalleSerializer, ReservationSalleSerializer, SalleLibreSerializer, RechercheSalleLibreSerializer
 from core.models import Salle, ReservationSalle
 from core.permissions import IsEnseignantOrReadOnly
 from datetime import datetime, timedelta
 from django.utils import timezone
+from core.caching import version
+from core.conditionnel import reponse_validee
+from core.planning import VERSION_PLANNING, VERSION_UTILISATEURS
+from core.referentiels import ListeReferentielMixin
+from core.sideload import Inclusions, serialiser_a_plat, sideload_demande, sideload_param
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 from django.utils.decorators import method_decorator
@@ -74,14 +80,20 @@ auth_header_param = openapi.Parameter(
         tags = tags
     )
 )
-class SalleViewSet(viewsets.ModelViewSet):
+class SalleViewSet(ListeReferentielMixin, viewsets.ModelViewSet):
     queryset = Salle.objects.filter(active=True)
     serializer_class = SalleSerializer
     permission_classes = [IsEnseignantOrReadOnly]
+    nom_referentiel = 'salles'
+
+    def filtrer_referentiel(self, donnees):
+        # Le référentiel contient aussi les salles désactivées, encore citées par des réservations
+        return [salle for salle in donnees if salle['active']]
 
     @swagger_auto_schema(
         operation_summary="Planning d'une salle",
-        operation_description="Récupère le planning d'une salle pour une période donnée",
+        operation_description="Récupère le planning d'une salle pour une période donnée. Répond 304 si "
+                              "If-None-Match correspond à l'ETag courant",
         manual_parameters=[
             openapi.Parameter(
                 'date_debut',
@@ -96,7 +108,8 @@ class SalleViewSet(viewsets.ModelViewSet):
                 description="Date de fin (format: YYYY-MM-DD). Par défaut: dans 7 jours",
                 type=openapi.TYPE_STRING,
                 format=openapi.FORMAT_DATE
-            )
+            ),
+            sideload_param
         ],
         responses={
             200: openapi.Response(
@@ -129,11 +142,116 @@ class SalleViewSet(viewsets.ModelViewSet):
         reservations = ReservationSalle.objects.filter(
             salle=salle,
             date__range=[date_debut, date_fin]
-        ).select_related('enseignant', 'formation', 'creneau')
+        ).select_related('enseignant')
+
+        def construire():
+            data = {
+                'salle': SalleSerializer(salle).data,
+                'periode': {'debut': date_debut, 'fin': date_fin},
+            }
+            if sideload_demande(request):
+                inclusions = Inclusions()
+                data['reservations'] = serialiser_a_plat(reservations, inclusions)
+                data['included'] = inclusions.serialiser()
+            else:
+                data['reservations'] = ReservationSalleSerializer(reservations, many=True).data
+            return Response(data)
+
+        # Les référentiels imbriqués (salle, formations, créneaux) sont suivis par VERSION_PLANNING,
+        # les enseignants imbriqués par VERSION_UTILISATEURS
+        return reponse_validee(request, construire, reservations,
+                               extra=(date_debut, date_fin, version(VERSION_PLANNING), version(VERSION_UTILISATEURS)))
+
+    @swagger_auto_schema(
+        operation_summary="Rechercher les salles libres",
+        operation_description="Retourne les salles actives d'au moins `capacite` places, disposant des équipements "
+                              "demandés et libres sur tous les créneaux demandés de la période, de la plus ajustée "
+                              "à la plus grande. La recherche est résolue en une seule requête (anti-jointure)",
+        manual_parameters=[
+            openapi.Parameter(
+                'capacite',
+                openapi.IN_QUERY,
+                description="Capacité minimale",
+                type=openapi.TYPE_INTEGER
+            ),
+            openapi.Parameter(
+                'equipements',
+                openapi.IN_QUERY,
+                description="Mots-clés d'équipements séparés par des virgules (ex: vidéoprojecteur,audio)",
+                type=openapi.TYPE_STRING
+            ),
+            openapi.Parameter(
+                'date_debut',
+                openapi.IN_QUERY,
+                description="Date de début (format: YYYY-MM-DD)",
+                type=openapi.TYPE_STRING,
+                format=openapi.FORMAT_DATE,
+                required=True
+            ),
+            openapi.Parameter(
+                'date_fin',
+                openapi.IN_QUERY,
+                description="Date de fin (format: YYYY-MM-DD), au plus 31 jours après date_debut. "
+                            "Par défaut: date_debut",
+                type=openapi.TYPE_STRING,
+                format=openapi.FORMAT_DATE
+            ),
+            openapi.Parameter(
+                'creneaux',
+                openapi.IN_QUERY,
+                description="Identifiants de créneaux séparés par des virgules. Par défaut: tous les créneaux",
+                type=openapi.TYPE_STRING
+            ),
+            auth_header_param
+        ],
+        responses={
+            200: openapi.Response(
+                description="Salles libres classées par ajustement de capacité",
+                schema=openapi.Schema(
+                    type=openapi.TYPE_OBJECT,
+                    properties={
+                        'periode': openapi.Schema(type=openapi.TYPE_OBJECT),
+                        'creneaux': openapi.Schema(type=openapi.TYPE_ARRAY,
+                                                   items=openapi.Schema(type=openapi.TYPE_INTEGER)),
+                        'count': openapi.Schema(type=openapi.TYPE_INTEGER),
+                        'salles': openapi.Schema(type=openapi.TYPE_ARRAY,
+                                                 items=openapi.Schema(type=openapi.TYPE_OBJECT))
+                    }
+                )
+            ),
+            400: openapi.Response(
+                description="Paramètres invalides"
+            )
+        },
+        tags=tags
+    )
+    @action(detail=False, methods=['get'])
+    def libres(self, request):
+        """Recherche les salles libres répondant aux critères de capacité et d'équipements"""
+        recherche = RechercheSalleLibreSerializer(data=request.query_params)
+        recherche.is_valid(raise_exception=True)
+        criteres = recherche.validated_data
+
+        reservations = ReservationSalle.objects.filter(
+            salle=OuterRef('pk'),
+            date__range=[criteres['date_debut'], criteres['date_fin']]
+        )
+        if criteres['creneaux']:
+            reservations = reservations.filter(creneau_id__in=criteres['creneaux'])
+
+        salles = Salle.objects.filter(active=True, capacite__gte=criteres['capacite'])
+        for mot in criteres['equipements']:
+            salles = salles.filter(equipements__icontains=mot)
+
+        # Anti-jointure : une seule requête, la salle la plus ajustée en premier
+        salles = salles.exclude(Exists(reservations)).annotate(
+            ecart_capacite=F('capacite') - criteres['capacite']
+        ).order_by('capacite', 'nom')
 
-        serializer = ReservationSalleSerializer(reservations, many=True)
+        donnees = SalleLibreSerializer(salles, many=True).data
         return Response({
-            'salle': SalleSerializer(salle).data,
-            'periode': {'debut': date_debut, 'fin': date_fin},
-            'reservations': serializer.data
-        })
\ No newline at end of file
+            'periode': {'debut': criteres['date_debut'], 'fin': criteres['date_fin']},
+            'creneaux': criteres['creneaux'],
+            'count': len(donnees),
+            'salles': donnees
+        })
@@ -1,9 +1,18 @@
+from datetime import timedelta
 from rest_framework import generics
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
-from core.models import ReservationSalle, ReservationMateriel
-from django.db.models import Q, Count
+from django.utils import timezone
+from core.models import OccupationSalle, OccupationMateriel, OccupationFormation
+from django.db.models import Sum
 from core.serializers import StatistiquesSerializer
 from core.permissions import IsEnseignant
+from core.utilisation import taux_utilisation, SOURCES, MAX_JOURS_UTILISATION
+from core.tendances import (
+    tendances_en_cache, nommer_groupes, periodes, periode_suivante,
+    TRONCATURES, DIMENSIONS, MAX_PERIODES_TENDANCES
+)
+from core.utils import parse_date
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 from django.utils.decorators import method_decorator
@@ -12,6 +21,15 @@ from django.utils.decorators import method_decorator
 class StatistiquesView(generics.GenericAPIView):
     """Vue pour les statistiques générales"""
     permission_classes = [IsEnseignant]
+
+    @staticmethod
+    def plus_reservees(agregat, champ, nombre=5):
+        """Ressources les plus réservées : somme groupée sur l'index (ressource, nombre), puis les noms des seules retenues"""
+        totaux = list(
+            agregat.objects.values(f'{champ}_id').annotate(count=Sum('nombre')).filter(count__gt=0).order_by('-count')[:nombre]
+        )
+        ressources = agregat._meta.get_field(champ).related_model.objects.in_bulk([total[f'{champ}_id'] for total in totaux])
+        return [{f'{champ}__nom': ressources[total[f'{champ}_id']].nom, 'count': total['count']} for total in totaux]
         
     @swagger_auto_schema(
         operation_summary="Statistiques générales",
@@ -25,30 +43,221 @@ class StatistiquesView(generics.GenericAPIView):
         }
     )
     def get(self, request, *args, **kwargs):
-        # Statistiques générales
-        total_reservations_salles = ReservationSalle.objects.count()
-        total_reservations_materiels = ReservationMateriel.objects.count()
-
-        # Salles les plus réservées
-        salles_populaires = ReservationSalle.objects.values(
-            'salle__nom'
-        ).annotate(
-            count=Count('id')
-        ).order_by('-count')[:5]
-
-        # Matériels les plus réservés
-        materiels_populaires = ReservationMateriel.objects.values(
-            'materiel__nom'
-        ).annotate(
-            count=Count('id')
-        ).order_by('-count')[:5]
-
-        data = {
-            'total_reservations_salles': total_reservations_salles,
-            'total_reservations_materiels': total_reservations_materiels,
-            'salles_les_plus_reservees': list(salles_populaires),
-            'materiels_les_plus_reserves': list(materiels_populaires)
+        serializer = StatistiquesSerializer(self.calculer())
+        return Response(serializer.data)
+
+    @classmethod
+    def calculer(cls):
+        # Lecture des agrégats journaliers (core/rollups.py) plutôt que de l'historique des réservations
+        totaux = OccupationFormation.objects.aggregate(
+            salles=Sum('reservations_salles'),
+            materiels=Sum('reservations_materiels')
+        )
+
+        salles_populaires = cls.plus_reservees(OccupationSalle, 'salle')
+        materiels_populaires = cls.plus_reservees(OccupationMateriel, 'materiel')
+
+        return {
+            'total_reservations_salles': totaux['salles'] or 0,
+            'total_reservations_materiels': totaux['materiels'] or 0,
+            'salles_les_plus_reservees': salles_populaires,
+            'materiels_les_plus_reserves': materiels_populaires
         }
 
-        serializer = StatistiquesSerializer(data)
-        return Response(serializer.data)
+
+class UtilisationView(generics.GenericAPIView):
+    """Vue pour les taux d'utilisation des salles et des matériels"""
+    permission_classes = [IsEnseignant]
+
+    @swagger_auto_schema(
+        operation_summary="Taux d'utilisation",
+        operation_description="Taux d'occupation (créneaux réservés / créneaux disponibles) des salles ou matériels "
+                              "actifs sur une période : par ressource, par type de matériel, par jour de la semaine "
+                              "et par créneau, avec les percentiles des taux par ressource et les créneaux les plus "
+                              "chargés. Tous les jours de la période sont comptés comme disponibles",
+        manual_parameters=[
+            openapi.Parameter(
+                'ressource',
+                openapi.IN_QUERY,
+                description="Type de ressource : salle (par défaut) ou materiel",
+                type=openapi.TYPE_STRING,
+                enum=list(SOURCES)
+            ),
+            openapi.Parameter(
+                'date_debut',
+                openapi.IN_QUERY,
+                description="Début de la période (format: YYYY-MM-DD). Par défaut: 30 jours avant date_fin",
+                type=openapi.TYPE_STRING,
+                format=openapi.FORMAT_DATE
+            ),
+            openapi.Parameter(
+                'date_fin',
+                openapi.IN_QUERY,
+                description=f"Fin de la période (format: YYYY-MM-DD), au plus {MAX_JOURS_UTILISATION} jours "
+                            "après date_debut. Par défaut: aujourd'hui",
+                type=openapi.TYPE_STRING,
+                format=openapi.FORMAT_DATE
+            ),
+            openapi.Parameter(
+                'top',
+                openapi.IN_QUERY,
+                description="Nombre de créneaux (jour de la semaine x créneau) les plus chargés à renvoyer (10 par défaut)",
+                type=openapi.TYPE_INTEGER
+            )
+        ],
+        responses={
+            200: openapi.Response(
+                description="Taux d'utilisation calculés (en pourcentage)",
+                schema=openapi.Schema(
+                    type=openapi.TYPE_OBJECT,
+                    properties={
+                        'type_ressource': openapi.Schema(type=openapi.TYPE_STRING),
+                        'periode': openapi.Schema(type=openapi.TYPE_OBJECT),
+                        'global': openapi.Schema(type=openapi.TYPE_NUMBER),
+                        'percentiles': openapi.Schema(type=openapi.TYPE_OBJECT,
+                                                      description="p50, p75, p90 et p95 des taux par ressource"),
+                        'ressources': openapi.Schema(type=openapi.TYPE_ARRAY,
+                                                     items=openapi.Schema(type=openapi.TYPE_OBJECT)),
+                        'types_materiel': openapi.Schema(type=openapi.TYPE_ARRAY,
+                                                         items=openapi.Schema(type=openapi.TYPE_OBJECT),
+                                                         description="Uniquement pour ressource=materiel"),
+                        'jours_semaine': openapi.Schema(type=openapi.TYPE_ARRAY,
+                                                        items=openapi.Schema(type=openapi.TYPE_OBJECT)),
+                        'par_creneau': openapi.Schema(type=openapi.TYPE_ARRAY,
+                                                      items=openapi.Schema(type=openapi.TYPE_OBJECT)),
+                        'pics': openapi.Schema(type=openapi.TYPE_ARRAY,
+                                               items=openapi.Schema(type=openapi.TYPE_OBJECT)),
+                        'creneaux': openapi.Schema(type=openapi.TYPE_ARRAY,
+                                                   items=openapi.Schema(type=openapi.TYPE_OBJECT))
+                    }
+                )
+            )
+        },
+        tags=["Statistiques"]
+    )
+    def get(self, request, *args, **kwargs):
+        type_ressource = request.query_params.get('ressource', 'salle')
+        if type_ressource not in SOURCES:
+            raise ValidationError({'ressource': f"Valeurs possibles : {', '.join(SOURCES)}"})
+        try:
+            top = int(request.query_params.get('top', 10))
+        except ValueError:
+            raise ValidationError({'top': "Nombre entier attendu"})
+        if top < 1:
+            raise ValidationError({'top': "Nombre entier positif attendu"})
+
+        date_fin = parse_date(request.query_params.get('date_fin'), timezone.now().date(), nom='date_fin')
+        date_debut = parse_date(request.query_params.get('date_debut'), date_fin - timedelta(days=29), nom='date_debut')
+        if date_fin < date_debut:
+            raise ValidationError({'date_fin': "date_fin doit être postérieure ou égale à date_debut"})
+        if (date_fin - date_debut).days >= MAX_JOURS_UTILISATION:
+            raise ValidationError({'date_fin': f"La période ne peut pas dépasser {MAX_JOURS_UTILISATION} jours"})
+
+        return Response(taux_utilisation(type_ressource, date_debut, date_fin, top))
+
+
+class TendancesView(generics.GenericAPIView):
+    """Vue pour l'évolution des réservations par semaine ou par mois"""
+    permission_classes = [IsEnseignant]
+
+    @swagger_auto_schema(
+        operation_summary="Tendances des réservations",
+        operation_description="Nombre de réservations de salles et de matériels par semaine ou par mois, ventilé par "
+                              "formation, enseignant ou type de matériel. La période est étendue aux semaines ou mois "
+                              "complets ; les semaines et mois révolus sont servis depuis le cache",
+        manual_parameters=[
+            openapi.Parameter(
+                'periode',
+                openapi.IN_QUERY,
+                description="Granularité : semaine (par défaut) ou mois",
+                type=openapi.TYPE_STRING,
+                enum=list(TRONCATURES)
+            ),
+            openapi.Parameter(
+                'par',
+                openapi.IN_QUERY,
+                description="Axe de ventilation : formation (par défaut), enseignant ou type_materiel "
+                            "(réservations de matériels uniquement)",
+                type=openapi.TYPE_STRING,
+                enum=list(DIMENSIONS)
+            ),
+            openapi.Parameter(
+                'date_debut',
+                openapi.IN_QUERY,
+                description="Début de la période (format: YYYY-MM-DD). Par défaut: les 12 dernières semaines ou "
+                            "les 12 derniers mois",
+                type=openapi.TYPE_STRING,
+                format=openapi.FORMAT_DATE
+            ),
+            openapi.Parameter(
+                'date_fin',
+                openapi.IN_QUERY,
+                description=f"Fin de la période (format: YYYY-MM-DD), au plus {MAX_PERIODES_TENDANCES} semaines "
+                            "ou mois. Par défaut: aujourd'hui",
+                type=openapi.TYPE_STRING,
+                format=openapi.FORMAT_DATE
+            ),
+            openapi.Parameter('formation', openapi.IN_QUERY, description="Filtrer par formation (ID)",
+                              type=openapi.TYPE_INTEGER),
+            openapi.Parameter('enseignant', openapi.IN_QUERY, description="Filtrer par enseignant (ID)",
+                              type=openapi.TYPE_INTEGER)
+        ],
+        responses={
+            200: openapi.Response(
+                description="Séries récupérées avec succès",
+                schema=openapi.Schema(
+                    type=openapi.TYPE_OBJECT,
+                    properties={
+                        'periode': openapi.Schema(type=openapi.TYPE_STRING),
+                        'par': openapi.Schema(type=openapi.TYPE_STRING),
+                        'debut': openapi.Schema(type=openapi.TYPE_STRING, format=openapi.FORMAT_DATE),
+                        'fin': openapi.Schema(type=openapi.TYPE_STRING, format=openapi.FORMAT_DATE),
+                        'series': openapi.Schema(
+                            type=openapi.TYPE_ARRAY,
+                            description="Une entrée par semaine ou mois : debut, fin, totaux (salles, materiels) "
+                                        "et groupes [{id, nom, salles, materiels}]",
+                            items=openapi.Schema(type=openapi.TYPE_OBJECT)
+                        )
+                    }
+                )
+            )
+        },
+        tags=["Statistiques"]
+    )
+    def get(self, request, *args, **kwargs):
+        periode = request.query_params.get('periode', 'semaine')
+        if periode not in TRONCATURES:
+            raise ValidationError({'periode': f"Valeurs possibles : {', '.join(TRONCATURES)}"})
+        par = request.query_params.get('par', 'formation')
+        if par not in DIMENSIONS:
+            raise ValidationError({'par': f"Valeurs possibles : {', '.join(DIMENSIONS)}"})
+
+        filtres = {}
+        for nom in ('formation', 'enseignant'):
+            valeur = request.query_params.get(nom)
+            if valeur:
+                if not valeur.isdigit():
+                    raise ValidationError({nom: "Identifiant entier attendu"})
+                filtres[f'{nom}_id'] = int(valeur)
+
+        date_fin = parse_date(request.query_params.get('date_fin'), timezone.now().date(), nom='date_fin')
+        if periode == 'semaine':
+            defaut = date_fin - timedelta(weeks=11)
+        else:
+            defaut = periode_suivante(date_fin.replace(year=date_fin.year - 1, day=1), periode)
+        date_debut = parse_date(request.query_params.get('date_debut'), defaut, nom='date_debut')
+        if date_fin < date_debut:
+            raise ValidationError({'date_fin': "date_fin doit être postérieure ou égale à date_debut"})
+        debuts = periodes(date_debut, date_fin, periode)
+        if len(debuts) > MAX_PERIODES_TENDANCES:
+            raise ValidationError({'date_fin': f"La période ne peut pas dépasser {MAX_PERIODES_TENDANCES} "
+                                               f"{'semaines' if periode == 'semaine' else 'mois'}"})
+
+        series = tendances_en_cache(date_debut, date_fin, periode, par, filtres)
+        return Response({
+            'periode': periode,
+            'par': par,
+            'debut': debuts[0],
+            'fin': periode_suivante(debuts[-1], periode) - timedelta(days=1),
+            'series': nommer_groupes(series, par)
+        })
@@ -1,7 +1,14 @@
+from datetime import timedelta
 from rest_framework import viewsets
-from core.models import TypeMateriel
-from core.serializers import TypeMaterielSerializer
+from rest_framework.decorators import action
+from rest_framework.response import Response
+from django.db.models import Count, Q
+from django.utils import timezone
+from core.models import TypeMateriel, CreneauHoraire, ReservationMateriel
+from core.serializers import TypeMaterielSerializer, CreneauHoraireSerializer
 from core.permissions import IsEnseignantOrReadOnly
+from core.referentiels import ListeReferentielMixin
+from core.utils import annoter_comptes_materiels
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 from django.utils.decorators import method_decorator
@@ -70,7 +77,80 @@ auth_header_param = openapi.Parameter(
         tags = tags
     )
 )
-class TypeMaterielViewSet(viewsets.ModelViewSet):
+class TypeMaterielViewSet(ListeReferentielMixin, viewsets.ModelViewSet):
     queryset = TypeMateriel.objects.all()
     serializer_class = TypeMaterielSerializer
-    permission_classes = [IsEnseignantOrReadOnly]
\ No newline at end of file
+    permission_classes = [IsEnseignantOrReadOnly]
+    nom_referentiel = 'types_materiel'
+
+    def get_queryset(self):
+        # materiels_count annoté : une seule requête pour toute la liste
+        return annoter_comptes_materiels(TypeMateriel.objects.all())
+
+    @swagger_auto_schema(
+        operation_summary="Inventaire du matériel",
+        operation_description="Pour chaque type de matériel : nombre de matériels actifs et inactifs, nombre de "
+                              "matériels réservés aujourd'hui et nombre de matériels libres au prochain créneau "
+                              "(premier créneau non commencé, sinon premier créneau du lendemain)",
+        manual_parameters=[auth_header_param],
+        responses={
+            200: openapi.Response(
+                description="Inventaire récupéré avec succès",
+                schema=openapi.Schema(
+                    type=openapi.TYPE_OBJECT,
+                    properties={
+                        'date': openapi.Schema(type=openapi.TYPE_STRING, format=openapi.FORMAT_DATE),
+                        'prochain_creneau': openapi.Schema(type=openapi.TYPE_OBJECT),
+                        'types': openapi.Schema(type=openapi.TYPE_ARRAY,
+                                                items=openapi.Schema(type=openapi.TYPE_OBJECT)),
+                        'totaux': openapi.Schema(type=openapi.TYPE_OBJECT)
+                    }
+                )
+            )
+        },
+        tags=tags
+    )
+    @action(detail=False, methods=['get'])
+    def inventaire(self, request):
+        """Inventaire par type en trois requêtes : types annotés, créneaux, réservations groupées"""
+        maintenant = timezone.localtime()
+        aujourd_hui = maintenant.date()
+
+        creneaux = list(CreneauHoraire.objects.order_by('heure_debut'))
+        a_venir = [creneau for creneau in creneaux if creneau.heure_debut > maintenant.time()]
+        prochain, date_prochain = (a_venir[0], aujourd_hui) if a_venir else (
+            (creneaux[0], aujourd_hui + timedelta(days=1)) if creneaux else (None, None)
+        )
+
+        reservations = {
+            ligne['materiel__type_materiel_id']: ligne
+            for ligne in ReservationMateriel.objects.filter(
+                materiel__active=True, date__in={aujourd_hui, date_prochain or aujourd_hui}
+            ).order_by().values('materiel__type_materiel_id').annotate(
+                aujourd_hui=Count('materiel_id', filter=Q(date=aujourd_hui), distinct=True),
+                prochain=Count('materiel_id', filter=Q(date=date_prochain, creneau=prochain), distinct=True)
+            )
+        }
+
+        types = []
+        for type_materiel in annoter_comptes_materiels(TypeMateriel.objects.order_by('nom')):
+            comptes = reservations.get(type_materiel.pk, {})
+            types.append({
+                'id': type_materiel.pk,
+                'nom': type_materiel.nom,
+                'actifs': type_materiel.materiels_actifs,
+                'inactifs': type_materiel.materiels_inactifs,
+                'reserves_aujourd_hui': comptes.get('aujourd_hui', 0),
+                'libres_prochain_creneau': type_materiel.materiels_actifs - comptes.get('prochain', 0)
+                if prochain else None,
+            })
+
+        return Response({
+            'date': aujourd_hui,
+            'prochain_creneau': {**CreneauHoraireSerializer(prochain).data, 'date': date_prochain} if prochain else None,
+            'types': types,
+            'totaux': {
+                cle: sum(ligne[cle] or 0 for ligne in types)
+                for cle in ('actifs', 'inactifs', 'reserves_aujourd_hui', 'libres_prochain_creneau')
+            }
+        })
\ No newline at end of file
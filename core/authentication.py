@@ -0,0 +1,132 @@
+import hashlib
+from django.conf import settings
+from django.core.cache import cache
+from django.db import router
+from django.utils.translation import gettext_lazy as _
+from rest_framework.authentication import BaseAuthentication
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+from core.caching import version, incrementer_version
+from core.models import JetonCalendrier
+
+
+# Champs de l'utilisateur gardés en cache : identité affichée et contrôles de permissions
+CHAMPS_UTILISATEUR_EN_CACHE = (
+    'id', 'username', 'first_name', 'last_name', 'email', 'matricule', 'user_type',
+    'is_active', 'is_staff', 'is_superuser',
+)
+
+
+def _nom_version_utilisateur(pk):
+    return f'utilisateur:{pk}'
+
+
+def invalider_utilisateur(pk):
+    incrementer_version(_nom_version_utilisateur(pk))
+
+
+def _cle_echecs_connexion(identifiant, adresse):
+    # Compteur par identifiant et par adresse du client : des échecs venus d'ailleurs
+    # ne bloquent pas le titulaire du compte. Empreinte : l'identifiant saisi
+    # n'apparaît pas dans les clés du cache
+    empreinte = hashlib.sha256(f'{identifiant.strip().casefold()}\0{adresse or ""}'.encode()).hexdigest()
+    return 'connexion:echecs:' + empreinte
+
+
+def connexion_bloquee(identifiant, adresse):
+    """Vrai si l'identifiant a épuisé ses tentatives depuis cette adresse dans la fenêtre courante"""
+    return (cache.get(_cle_echecs_connexion(identifiant, adresse)) or 0) >= settings.CONNEXION_ECHECS_MAX
+
+
+def enregistrer_echec_connexion(identifiant, adresse):
+    """Compte un échec ; le premier ouvre une fenêtre de CONNEXION_ECHECS_FENETRE secondes"""
+    cle = _cle_echecs_connexion(identifiant, adresse)
+    if cache.add(cle, 1, timeout=settings.CONNEXION_ECHECS_FENETRE):
+        return
+    try:
+        cache.incr(cle)
+    except ValueError:
+        cache.set(cle, 1, timeout=settings.CONNEXION_ECHECS_FENETRE)
+
+
+def reinitialiser_echecs_connexion(identifiant, adresse):
+    cache.delete(_cle_echecs_connexion(identifiant, adresse))
+
+
+class JetonCalendrierAuthentication(BaseAuthentication):
+    """
+    Authentification des flux iCalendar par le paramètre ``?token=`` : les
+    applications d'agenda ne savent pas envoyer d'en-tête Authorization.
+    """
+    parametre = 'token'
+
+    def authenticate(self, request):
+        jeton = request.query_params.get(self.parametre)
+        if not jeton:
+            return None
+        try:
+            jeton_calendrier = JetonCalendrier.objects.select_related('utilisateur').get(
+                empreinte=JetonCalendrier.condenser(jeton)
+            )
+        except JetonCalendrier.DoesNotExist:
+            raise AuthenticationFailed("Jeton de calendrier invalide")
+        if not jeton_calendrier.utilisateur.is_active:
+            raise AuthenticationFailed("Utilisateur inactif")
+        return jeton_calendrier.utilisateur, jeton_calendrier
+
+    def authenticate_header(self, request):
+        return 'Token'
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication dont l'utilisateur est lu dans le cache plutôt que par
+    une requête par appel. La clé porte une version par utilisateur,
+    incrémentée par les signaux à chaque enregistrement ou suppression
+    (changement de mot de passe, désactivation...) : une requête authentifiée
+    ne touche la base que lorsque la ligne a changé depuis la dernière lecture.
+
+    Seuls les champs de CHAMPS_UTILISATEUR_EN_CACHE et l'empreinte du mot de
+    passe comparée par simplejwt sont mis en cache, jamais le hachage : les
+    autres champs (password, last_login...) sont différés et lus à la demande.
+    Les contrôles de simplejwt (compte actif, révocation par changement de mot
+    de passe) sont appliqués à l'entrée en cache.
+    """
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        cle = f'utilisateur:{user_id}:{version(_nom_version_utilisateur(user_id))}'
+        entree = cache.get(cle)
+        if entree is None:
+            try:
+                user = self.user_model.objects.get(**{api_settings.USER_ID_FIELD: user_id})
+            except self.user_model.DoesNotExist:
+                raise AuthenticationFailed(_("User not found"), code="user_not_found")
+            entree = (
+                {champ: getattr(user, champ) for champ in CHAMPS_UTILISATEUR_EN_CACHE},
+                get_md5_hash_password(user.password)
+            )
+            cache.set(cle, entree, timeout=settings.UTILISATEURS_CACHE_TIMEOUT)
+        else:
+            # Objet chargé dont les champs absents de l'entrée sont différés (from_db attend l'ordre du modèle)
+            champs = entree[0]
+            noms = [champ.attname for champ in self.user_model._meta.concrete_fields if champ.attname in champs]
+            user = self.user_model.from_db(
+                router.db_for_read(self.user_model), noms, [champs[nom] for nom in noms]
+            )
+
+        if not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != entree[1]:
+                raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
+
+        return user
@@ -0,0 +1,116 @@
+from django.db import IntegrityError, transaction
+from rest_framework import status
+from rest_framework.decorators import action
+from rest_framework.response import Response
+from core.exceptions import ConflitReservation
+from core.models import Formation, CreneauHoraire
+from core.rollups import ajouter_en_masse
+from core.serializers import ReservationsEnMasseSerializer
+from core.signals import reservations_creees_en_masse
+from core.sideload import serialiser_a_plat
+
+
+class ReservationEnMasseMixin:
+    """
+    Ajoute l'action POST ``en-masse`` à un viewset de réservations.
+
+    Les éléments sont validés un par un sans requête, les clés étrangères sont
+    résolues en une requête par modèle, les conflits (avec la base et à
+    l'intérieur du lot) sont détectés par une seule requête groupée, puis les
+    réservations valides sont insérées par ``bulk_create`` dans une transaction.
+
+    Modes : ``tout_ou_rien`` (rien n'est créé si un élément est en erreur) ou
+    ``partiel`` (les éléments valides sont créés). La réponse contient les
+    réservations créées et un rapport d'erreurs par indice d'élément.
+
+    Le viewset fournit ``champ_ressource`` ('salle' ou 'materiel'),
+    ``element_en_masse_serializer_class`` et ``message_conflit``.
+    """
+    champ_ressource = None
+    element_en_masse_serializer_class = None
+    message_conflit = "La ressource {} est déjà réservée pour ce créneau"
+
+    @action(detail=False, methods=['post'], url_path='en-masse')
+    def en_masse(self, request):
+        enveloppe = ReservationsEnMasseSerializer(data=request.data)
+        enveloppe.is_valid(raise_exception=True)
+        mode = enveloppe.validated_data['mode']
+
+        model = self.get_serializer_class().Meta.model
+        champ = self.champ_ressource
+        erreurs = {}
+
+        valides = []
+        for indice, element in enumerate(enveloppe.validated_data['reservations']):
+            serializer = self.element_en_masse_serializer_class(data=element)
+            if serializer.is_valid():
+                valides.append((indice, serializer.validated_data))
+            else:
+                erreurs[indice] = serializer.errors
+
+        # Une requête par modèle référencé
+        modele_ressource = model._meta.get_field(champ).related_model
+        references = {
+            champ: modele_ressource.objects.in_bulk({donnees[champ] for _, donnees in valides}),
+            'formation': Formation.objects.in_bulk({donnees['formation'] for _, donnees in valides}),
+            'creneau': CreneauHoraire.objects.in_bulk({donnees['creneau'] for _, donnees in valides}),
+        }
+
+        # Une seule requête pour les conflits avec la base : le filtre couvre un
+        # sur-ensemble des cellules demandées, l'appariement exact se fait ici
+        existantes = set()
+        if valides:
+            existantes = set(model.objects.filter(**{
+                f'{champ}_id__in': {donnees[champ] for _, donnees in valides},
+                'date__in': {donnees['date'] for _, donnees in valides},
+                'creneau_id__in': {donnees['creneau'] for _, donnees in valides},
+            }).values_list(f'{champ}_id', 'date', 'creneau_id'))
+
+        cellules_du_lot = {}
+        a_creer = []
+        for indice, donnees in valides:
+            introuvables = {
+                nom: [f"Clé primaire « {donnees[nom]} » non valide - l'objet n'existe pas."]
+                for nom, objets in references.items() if donnees[nom] not in objets
+            }
+            if introuvables:
+                erreurs[indice] = introuvables
+                continue
+
+            cellule = (donnees[champ], donnees['date'], donnees['creneau'])
+            if cellule in existantes:
+                erreurs[indice] = {'non_field_errors': [
+                    self.message_conflit.format(references[champ][donnees[champ]].nom)
+                ]}
+            elif cellule in cellules_du_lot:
+                erreurs[indice] = {'non_field_errors': [
+                    f"Même créneau que l'élément {cellules_du_lot[cellule]} du lot"
+                ]}
+            else:
+                cellules_du_lot[cellule] = indice
+                a_creer.append(model(
+                    **{**donnees, **{nom: references[nom][donnees[nom]] for nom in references}},
+                    enseignant=request.user
+                ))
+
+        rapport = [{'index': indice, 'erreurs': erreurs[indice]} for indice in sorted(erreurs)]
+        if not a_creer or (erreurs and mode == 'tout_ou_rien'):
+            return Response({'crees': [], 'erreurs': rapport}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            with transaction.atomic():
+                crees = model.objects.bulk_create(a_creer)
+                ajouter_en_masse(model, crees)
+                # bulk_create n'émet pas post_save : index d'occupation et caches de
+                # planning mis à jour une fois pour tout le lot, après la validation
+                reservations_creees_en_masse(model, crees)
+        except IntegrityError:
+            # Une réservation concurrente a pris une des cellules entre la vérification et l'insertion
+            raise ConflitReservation(
+                "Conflit avec une réservation enregistrée entre-temps, aucune réservation créée"
+            )
+
+        return Response(
+            {'crees': serialiser_a_plat(crees), 'erreurs': rapport},
+            status=status.HTTP_201_CREATED
+        )
@@ -0,0 +1,43 @@
+import time
+from django.core.cache import cache
+
+
+def _cle_version(nom):
+    return f'version:{nom}'
+
+
+def version(nom):
+    """
+    Retourne le compteur de version associé à ``nom``.
+
+    Les clés de cache construites avec ce compteur deviennent inaccessibles dès
+    qu'il est incrémenté. La valeur initiale est dérivée de l'horloge afin qu'un
+    compteur évincé du cache ne revienne jamais à une version déjà utilisée.
+    """
+    valeur = cache.get(_cle_version(nom))
+    if valeur is None:
+        cache.add(_cle_version(nom), time.time_ns(), timeout=None)
+        valeur = cache.get(_cle_version(nom), time.time_ns())
+    return valeur
+
+
+def incrementer_version(nom):
+    try:
+        return cache.incr(_cle_version(nom))
+    except ValueError:
+        # Compteur absent (expiré ou évincé) : repartir d'une valeur jamais utilisée
+        valeur = time.time_ns()
+        cache.set(_cle_version(nom), valeur, timeout=None)
+        return valeur
+
+
+def incrementer_compteur(cle, delta=1):
+    """Incrémente un compteur de statistiques, en le créant au besoin"""
+    if delta <= 0:
+        return
+    if cache.add(cle, delta, timeout=None):
+        return
+    try:
+        cache.incr(cle, delta)
+    except ValueError:
+        cache.set(cle, delta, timeout=None)
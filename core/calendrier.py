@@ -0,0 +1,129 @@
+import json
+from datetime import datetime, timedelta, timezone as fuseau
+from django.utils import timezone
+from rest_framework.renderers import BaseRenderer
+
+# Fenêtre des flux autour du jour courant
+CALENDRIER_JOURS_PASSES = 30
+CALENDRIER_JOURS_A_VENIR = 180
+
+PRODID = '-//EduReserve//Plannings//FR'
+
+
+class ICalendarRenderer(BaseRenderer):
+    """Rendu text/calendar ; les réponses d'erreur (dictionnaires) sont rendues en JSON"""
+    media_type = 'text/calendar'
+    format = 'ics'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, str):
+            return data.encode(self.charset)
+        return json.dumps(data, ensure_ascii=False).encode(self.charset)
+
+
+def fenetre_calendrier():
+    """Période couverte par les flux : (premier jour, dernier jour)"""
+    aujourd_hui = timezone.localdate()
+    return (
+        aujourd_hui - timedelta(days=CALENDRIER_JOURS_PASSES),
+        aujourd_hui + timedelta(days=CALENDRIER_JOURS_A_VENIR)
+    )
+
+
+def _echapper(texte):
+    """Échappement des valeurs TEXT (RFC 5545, 3.3.11)"""
+    return (str(texte or '').replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+            .replace('\r\n', '\\n').replace('\n', '\\n'))
+
+
+def _plier(ligne):
+    """Coupe les lignes de plus de 75 octets, sans couper un caractère UTF-8 (RFC 5545, 3.1)"""
+    morceaux = []
+    courant, taille, limite = [], 0, 75
+    for caractere in ligne:
+        octets = len(caractere.encode())
+        if taille + octets > limite:
+            morceaux.append(''.join(courant))
+            courant, taille, limite = [], 0, 74
+        courant.append(caractere)
+        taille += octets
+    morceaux.append(''.join(courant))
+    return '\r\n '.join(morceaux)
+
+
+def _horodatage(valeur):
+    return valeur.astimezone(fuseau.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def _moment(jour, heure):
+    return timezone.make_aware(datetime.combine(jour, heure))
+
+
+def evenement(uid, jour, creneau, resume, lieu=None, description=None, modifie=None):
+    """Lignes d'un VEVENT pour un créneau d'une journée"""
+    lignes = [
+        'BEGIN:VEVENT',
+        f'UID:{uid}',
+        f'DTSTAMP:{_horodatage(modifie or timezone.now())}',
+        f'DTSTART:{_horodatage(_moment(jour, creneau.heure_debut))}',
+        f'DTEND:{_horodatage(_moment(jour, creneau.heure_fin))}',
+        f'SUMMARY:{_echapper(resume)}',
+    ]
+    if lieu:
+        lignes.append(f'LOCATION:{_echapper(lieu)}')
+    if description:
+        lignes.append(f'DESCRIPTION:{_echapper(description)}')
+    if modifie:
+        lignes.append(f'LAST-MODIFIED:{_horodatage(modifie)}')
+    lignes.append('END:VEVENT')
+    return lignes
+
+
+def evenements_reservations_salles(reservations, avec_enseignant=False):
+    """Réservations de salles (select_related salle, formation, creneau et, au besoin, enseignant)"""
+    for reservation in reservations:
+        description = [f'Formation : {reservation.formation.nom}']
+        if avec_enseignant:
+            description.append(f'Enseignant : {reservation.enseignant}')
+        if reservation.commentaires:
+            description.append(reservation.commentaires)
+        yield evenement(
+            f'reservation-salle-{reservation.pk}@edureserve',
+            reservation.date, reservation.creneau,
+            reservation.sujet or f'{reservation.formation.nom} - {reservation.salle.nom}',
+            lieu=reservation.salle.nom,
+            description='\n'.join(description),
+            modifie=reservation.updated_at
+        )
+
+
+def evenements_recapitulatifs(recapitulatifs):
+    """Récapitulatifs horaires (select_related formation, creneau, salle_prevue)"""
+    for recapitulatif in recapitulatifs:
+        yield evenement(
+            f'recapitulatif-{recapitulatif.pk}@edureserve',
+            recapitulatif.date, recapitulatif.creneau,
+            f'{recapitulatif.formation.nom} : {recapitulatif.sujet}' if recapitulatif.sujet else recapitulatif.formation.nom,
+            lieu=recapitulatif.salle_prevue.nom if recapitulatif.salle_prevue else None,
+            description=recapitulatif.commentaires,
+            modifie=recapitulatif.updated_at
+        )
+
+
+def calendrier_ics(nom, *sources):
+    """Assemble un VCALENDAR à partir de générateurs d'événements"""
+    lignes = [
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        f'PRODID:{PRODID}',
+        'CALSCALE:GREGORIAN',
+        'METHOD:PUBLISH',
+        f'X-WR-CALNAME:{_echapper(nom)}',
+        f'X-WR-TIMEZONE:{timezone.get_current_timezone_name()}',
+    ]
+    for source in sources:
+        for evenement_ in source:
+            lignes.extend(evenement_)
+    lignes.append('END:VCALENDAR')
+    return '\r\n'.join(_plier(ligne) for ligne in lignes) + '\r\n'
@@ -0,0 +1,72 @@
+import hashlib
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+
+def etag(*valeurs):
+    """ETag fort calculé sur la représentation textuelle des valeurs"""
+    return '"%s"' % hashlib.md5('|'.join(str(valeur) for valeur in valeurs).encode(), usedforsecurity=False).hexdigest()
+
+
+def empreinte(*querysets, extra=()):
+    """
+    Empreinte d'un ensemble de données : le plus récent ``updated_at`` et le
+    nombre de lignes de chaque queryset (une requête d'agrégat chacun, sans
+    lecture des lignes). Un ajout ou une modification avance la date, une
+    suppression change le nombre. ``extra`` complète la signature (version
+    des référentiels, bornes de période...).
+
+    Retourne (etag, last_modified) ; last_modified vaut None si tout est vide.
+    """
+    signature = []
+    dernier = None
+    for queryset in querysets:
+        valeurs = queryset.order_by().aggregate(dernier=Max('updated_at'), nombre=Count('pk'))
+        signature.append(f"{valeurs['nombre']}:{valeurs['dernier'].isoformat() if valeurs['dernier'] else ''}")
+        if valeurs['dernier'] and (dernier is None or valeurs['dernier'] > dernier):
+            dernier = valeurs['dernier']
+    return etag(*signature, *extra), dernier
+
+
+def ajouter_validateurs(response, etag, dernier=None):
+    """Pose ETag et Last-Modified ; le client doit revalider à chaque utilisation"""
+    response['ETag'] = etag
+    if dernier is not None:
+        response['Last-Modified'] = http_date(dernier.timestamp())
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def reponse_conditionnelle(request, etag, dernier=None):
+    """
+    Réponse 304 si le client possède déjà cette version (If-None-Match, ou à
+    défaut If-Modified-Since), None sinon : la vue construit alors sa réponse.
+    """
+    response = get_conditional_response(
+        request, etag=etag, last_modified=int(dernier.timestamp()) if dernier else None
+    )
+    if response is not None:
+        ajouter_validateurs(response, etag, dernier)
+    return response
+
+
+def reponse_avec_validateurs(request, construire, etag, dernier=None):
+    """
+    Répond 304 si ``etag`` (ou ``dernier``) correspond aux validateurs du
+    client ; sinon appelle ``construire()`` (sérialisation) et pose ETag et
+    Last-Modified sur la réponse obtenue. Seules les réponses 200 portent
+    les validateurs.
+    """
+    non_modifie = reponse_conditionnelle(request, etag, dernier)
+    if non_modifie is not None:
+        return non_modifie
+    response = construire()
+    if response.status_code == 200:
+        ajouter_validateurs(response, etag, dernier)
+    return response
+
+
+def reponse_validee(request, construire, *querysets, extra=()):
+    """reponse_avec_validateurs avec l'empreinte des querysets (une requête d'agrégat chacun)"""
+    return reponse_avec_validateurs(request, construire, *empreinte(*querysets, extra=extra))
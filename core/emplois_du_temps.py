@@ -0,0 +1,233 @@
+import os
+import re
+import tempfile
+import time
+from collections import defaultdict
+from datetime import date, timedelta
+from pathlib import Path
+import fitz
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from core.caching import version
+from core.conditionnel import empreinte
+from core.models import Salle, Formation, ReservationSalle, CreneauHoraire
+from core.planning import VERSION_PLANNING, VERSION_UTILISATEURS
+
+User = get_user_model()
+
+JOURS_EMPLOI_DU_TEMPS = ['Lundi', 'Mardi', 'Mercredi', 'Jeudi', 'Vendredi', 'Samedi']
+
+# type d'emploi du temps -> (modèle, champ de ReservationSalle, filtre sur le modèle)
+TYPES_EMPLOI_DU_TEMPS = {
+    'salle': (Salle, 'salle_id', {}),
+    'formation': (Formation, 'formation_id', {}),
+    'enseignant': (User, 'enseignant_id', {'user_type': 'enseignant'}),
+}
+
+# Nom des fichiers : <type>-<id>-<lundi>-<empreinte des données>
+CLE_EMPLOI_DU_TEMPS = re.compile(r'^(salle|formation|enseignant)-(\d+)-(\d{4}-\d{2}-\d{2})-([0-9a-f]{16})$')
+
+# A4 paysage, en points
+LARGEUR_PAGE, HAUTEUR_PAGE = 842, 595
+MARGE = 36
+
+
+def lundi(jour):
+    return jour - timedelta(days=jour.weekday())
+
+
+def reservations_semaine(type_emploi, pk, debut):
+    _, champ, _ = TYPES_EMPLOI_DU_TEMPS[type_emploi]
+    return ReservationSalle.objects.filter(
+        **{champ: pk}, date__range=(debut, debut + timedelta(days=len(JOURS_EMPLOI_DU_TEMPS) - 1))
+    )
+
+
+def cle_emploi_du_temps(type_emploi, pk, debut):
+    """
+    Clé du fichier pour l'état actuel des données : agrégat sur les
+    réservations de la semaine, version des référentiels (noms de salles,
+    de formations...) et version des utilisateurs (noms d'enseignants dans
+    les cellules et le titre). Toute modification produit une nouvelle clé,
+    donc un nouveau fichier ; un fichier existant est toujours à jour.
+    """
+    etag, _ = empreinte(
+        reservations_semaine(type_emploi, pk, debut),
+        extra=(type_emploi, pk, debut, version(VERSION_PLANNING), version(VERSION_UTILISATEURS))
+    )
+    signature = etag.strip('"')[:16]
+    return f'{type_emploi}-{pk}-{debut.isoformat()}-{signature}'
+
+
+def chemin_pdf(cle):
+    return Path(settings.EMPLOIS_DU_TEMPS_ROOT) / f'{cle}.pdf'
+
+
+def _cle_etat(cle):
+    return f'emploi_du_temps:etat:{cle}'
+
+
+def etat_generation(cle):
+    """
+    État d'une génération : 'pret' si le fichier existe, sinon l'état
+    enregistré par la tâche ('en_cours', 'erreur', ou 'pret' avec la clé du
+    fichier produit si les données ont changé entre-temps) ; None si inconnu.
+    """
+    if chemin_pdf(cle).exists():
+        return {'statut': 'pret', 'cle': cle}
+    return cache.get(_cle_etat(cle))
+
+
+def enregistrer_remplacement(cle, nouvelle_cle):
+    """Les données ont changé pendant la génération : la clé demandée renvoie vers le fichier produit"""
+    cache.set(
+        _cle_etat(cle), {'statut': 'pret', 'cle': nouvelle_cle}, timeout=settings.EMPLOIS_DU_TEMPS_ETAT_TIMEOUT
+    )
+
+
+def reserver_generation(cle):
+    """
+    Marque la génération en cours ; False si une génération est déjà en
+    cours ou terminée (une seule tâche par clé). Une erreur peut être relancée.
+    """
+    en_cours = {'statut': 'en_cours'}
+    if cache.add(_cle_etat(cle), en_cours, timeout=settings.EMPLOIS_DU_TEMPS_ETAT_TIMEOUT):
+        return True
+    etat = cache.get(_cle_etat(cle))
+    if etat is not None and etat['statut'] == 'erreur':
+        cache.set(_cle_etat(cle), en_cours, timeout=settings.EMPLOIS_DU_TEMPS_ETAT_TIMEOUT)
+        return True
+    return False
+
+
+def enregistrer_erreur(cle, message):
+    cache.set(_cle_etat(cle), {'statut': 'erreur', 'erreur': message}, timeout=settings.EMPLOIS_DU_TEMPS_ETAT_TIMEOUT)
+
+
+def _libelle_cellule(type_emploi, reservation):
+    if type_emploi == 'salle':
+        lignes = [reservation.formation.nom, str(reservation.enseignant)]
+    elif type_emploi == 'formation':
+        lignes = [reservation.salle.nom, str(reservation.enseignant)]
+    else:
+        lignes = [reservation.formation.nom, reservation.salle.nom]
+    if reservation.sujet:
+        lignes.append(reservation.sujet)
+    return '\n'.join(lignes)
+
+
+def _ecrire(page, rect, texte, taille=7, **kwargs):
+    """Écrit dans le rectangle en réduisant la police jusqu'à ce que le texte tienne"""
+    while taille > 4 and page.insert_textbox(rect, texte, fontsize=taille, fontname='helv', **kwargs) < 0:
+        taille -= 1
+    if taille == 4:
+        page.insert_textbox(rect, texte, fontsize=taille, fontname='helv', **kwargs)
+
+
+def rendre_pdf(titre, debut, creneaux, cellules):
+    """
+    Grille d'une semaine (jours en colonnes, créneaux en lignes) sur une page
+    A4 paysage. ``cellules`` : {(date, creneau_id): [texte, ...]}.
+    """
+    document = fitz.open()
+    page = document.new_page(width=LARGEUR_PAGE, height=HAUTEUR_PAGE)
+    page.insert_text((MARGE, MARGE), titre, fontsize=14, fontname='hebo')
+    fin = debut + timedelta(days=len(JOURS_EMPLOI_DU_TEMPS) - 1)
+    page.insert_text(
+        (MARGE, MARGE + 16), f"Semaine du {debut.strftime('%d/%m/%Y')} au {fin.strftime('%d/%m/%Y')}",
+        fontsize=9, fontname='helv'
+    )
+
+    haut = MARGE + 30
+    largeur_creneaux = 70
+    largeur_jour = (LARGEUR_PAGE - 2 * MARGE - largeur_creneaux) / len(JOURS_EMPLOI_DU_TEMPS)
+    hauteur_entete = 20
+    hauteur_ligne = (HAUTEUR_PAGE - MARGE - haut - hauteur_entete) / max(len(creneaux), 1)
+
+    for i, nom_jour in enumerate(JOURS_EMPLOI_DU_TEMPS):
+        x = MARGE + largeur_creneaux + i * largeur_jour
+        rect = fitz.Rect(x, haut, x + largeur_jour, haut + hauteur_entete)
+        page.draw_rect(rect, color=(0, 0, 0), fill=(0.88, 0.88, 0.88), width=0.5)
+        jour = debut + timedelta(days=i)
+        _ecrire(page, rect + (0, 5, 0, 0), f"{nom_jour} {jour.strftime('%d/%m')}", taille=9, align=fitz.TEXT_ALIGN_CENTER)
+
+    for j, creneau in enumerate(creneaux):
+        y = haut + hauteur_entete + j * hauteur_ligne
+        rect = fitz.Rect(MARGE, y, MARGE + largeur_creneaux, y + hauteur_ligne)
+        page.draw_rect(rect, color=(0, 0, 0), fill=(0.88, 0.88, 0.88), width=0.5)
+        _ecrire(page, rect + (4, 4, -4, -4), creneau.nom, taille=9)
+        for i in range(len(JOURS_EMPLOI_DU_TEMPS)):
+            x = MARGE + largeur_creneaux + i * largeur_jour
+            rect = fitz.Rect(x, y, x + largeur_jour, y + hauteur_ligne)
+            page.draw_rect(rect, color=(0, 0, 0), width=0.5)
+            textes = cellules.get((debut + timedelta(days=i), creneau.pk))
+            if textes:
+                _ecrire(page, rect + (3, 3, -3, -3), '\n\n'.join(textes))
+
+    contenu = document.tobytes(garbage=3, deflate=True)
+    document.close()
+    return contenu
+
+
+def generer_emploi_du_temps(type_emploi, pk, debut):
+    """
+    Génère le PDF de la semaine commençant le lundi ``debut`` et l'écrit dans
+    EMPLOIS_DU_TEMPS_ROOT, sauf s'il existe déjà pour la version courante des
+    données. Les fichiers des versions précédentes de la même semaine sont
+    supprimés. Retourne la clé du fichier.
+    """
+    modele, _, filtres = TYPES_EMPLOI_DU_TEMPS[type_emploi]
+    cle = cle_emploi_du_temps(type_emploi, pk, debut)
+    chemin = chemin_pdf(cle)
+    if chemin.exists():
+        return cle
+
+    objet = modele.objects.get(pk=pk, **filtres)
+    creneaux = list(CreneauHoraire.objects.all())
+    cellules = defaultdict(list)
+    for reservation in reservations_semaine(type_emploi, pk, debut).select_related(
+        'salle', 'formation', 'enseignant'
+    ).order_by('date', 'creneau_id', 'id'):
+        cellules[(reservation.date, reservation.creneau_id)].append(_libelle_cellule(type_emploi, reservation))
+    titre = f"Emploi du temps - {'Salle ' + objet.nom if type_emploi == 'salle' else objet}"
+    contenu = rendre_pdf(titre, debut, creneaux, cellules)
+
+    # Écriture atomique : un téléchargement concurrent ne lit jamais un fichier partiel
+    chemin.parent.mkdir(parents=True, exist_ok=True)
+    descripteur, temporaire = tempfile.mkstemp(dir=chemin.parent, suffix='.tmp')
+    with os.fdopen(descripteur, 'wb') as fichier:
+        fichier.write(contenu)
+    os.replace(temporaire, chemin)
+
+    for ancien in chemin.parent.glob(f'{type_emploi}-{pk}-{debut.isoformat()}-*.pdf'):
+        if ancien != chemin:
+            ancien.unlink(missing_ok=True)
+    return cle
+
+
+def purger_emplois_du_temps(aujourd_hui=None):
+    """
+    Supprime les PDF des semaines terminées depuis plus de
+    EMPLOIS_DU_TEMPS_CONSERVATION_JOURS jours (ils seront régénérés à la
+    demande) et les fichiers temporaires abandonnés par une écriture
+    interrompue. Retourne le nombre de fichiers supprimés.
+    """
+    dossier = Path(settings.EMPLOIS_DU_TEMPS_ROOT)
+    if not dossier.is_dir():
+        return 0
+    limite = (aujourd_hui or date.today()) - timedelta(days=settings.EMPLOIS_DU_TEMPS_CONSERVATION_JOURS)
+    supprimes = 0
+    for chemin in dossier.glob('*.pdf'):
+        correspondance = CLE_EMPLOI_DU_TEMPS.match(chemin.stem)
+        if correspondance is None:
+            continue
+        fin_semaine = date.fromisoformat(correspondance.group(3)) + timedelta(days=len(JOURS_EMPLOI_DU_TEMPS) - 1)
+        if fin_semaine < limite:
+            chemin.unlink(missing_ok=True)
+            supprimes += 1
+    for chemin in dossier.glob('*.tmp'):
+        if chemin.stat().st_mtime < time.time() - 24 * 3600:
+            chemin.unlink(missing_ok=True)
+            supprimes += 1
+    return supprimes
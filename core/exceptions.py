@@ -0,0 +1,20 @@
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+
+class ConflitReservation(APIException):
+    """
+    La cellule (ressource, date, créneau) est déjà prise.
+
+    Levée lorsque la contrainte d'unicité de la base rejette une écriture :
+    c'est elle, et non une vérification préalable, qui arbitre entre deux
+    réservations concurrentes.
+    """
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = "Ce créneau est déjà réservé"
+    default_code = 'conflit_reservation'
+
+    def __init__(self, detail=None, code=None, conflit=None):
+        super().__init__(detail, code)
+        if conflit is not None:
+            self.detail = {'detail': self.detail, 'conflit': conflit}
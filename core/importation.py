@@ -0,0 +1,167 @@
+import csv
+import os
+import secrets
+from concurrent.futures import ProcessPoolExecutor
+import django
+from django.apps import apps
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password, PBKDF2PasswordHasher
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.validators import validate_email
+from django.db import IntegrityError, transaction
+from rest_framework.exceptions import ValidationError
+from core.models import CompteurMatricule
+
+User = get_user_model()
+
+COLONNES_ROSTER = ('nom', 'prenom', 'email', 'username', 'type', 'mot_de_passe')
+
+# Les mots de passe générés sont des secrets aléatoires de 96 bits : un PBKDF2
+# allégé ne les rend pas devinables. Django vérifie le hachage avec le nombre
+# d'itérations qu'il porte et le refait au réglage courant à la première connexion.
+ITERATIONS_MOT_DE_PASSE_GENERE = 1000
+
+# En deçà, le coût de démarrage des processus dépasse le gain
+MIN_MOTS_DE_PASSE_PARALLELES = 20
+
+
+def lire_roster(fichier, user_type=None):
+    """
+    Lit et valide un roster CSV (séparateur , ou ;). En-têtes : nom, prenom,
+    et facultativement email, username, type (enseignant ou etudiant, à
+    défaut ``user_type``) et mot_de_passe. Toutes les erreurs sont signalées
+    ensemble, par numéro de ligne, avant toute écriture.
+    """
+    contenu = fichier.read()
+    if isinstance(contenu, bytes):
+        contenu = contenu.decode('utf-8-sig')
+    premiere_ligne = contenu.split('\n', 1)[0]
+    separateur = ';' if premiere_ligne.count(';') > premiere_ligne.count(',') else ','
+    lecteur = csv.DictReader(contenu.splitlines(), delimiter=separateur)
+
+    entetes = [entete.strip().lower() for entete in lecteur.fieldnames or []]
+    manquantes = {'nom', 'prenom'} - set(entetes)
+    if manquantes:
+        raise ValidationError({'fichier': [f"Colonnes manquantes : {', '.join(sorted(manquantes))}"]})
+    lecteur.fieldnames = entetes
+
+    types = {valeur for valeur, _ in User.USER_TYPE_CHOICES}
+    lignes, erreurs, usernames, emails = [], {}, {}, {}
+    for numero, brute in enumerate(lecteur, start=2):
+        ligne = {colonne: (brute.get(colonne) or '').strip() for colonne in COLONNES_ROSTER}
+        ligne['type'] = ligne['type'] or user_type or ''
+        messages = []
+        if not ligne['nom']:
+            messages.append("nom manquant")
+        if ligne['type'] not in types:
+            messages.append(f"type invalide : '{ligne['type']}' (enseignant ou etudiant)")
+        if ligne['email']:
+            try:
+                validate_email(ligne['email'])
+            except DjangoValidationError:
+                messages.append(f"email invalide : {ligne['email']}")
+            else:
+                # Un email en double rendrait l'un des comptes inaccessible à la connexion par email
+                if ligne['email'] in emails:
+                    messages.append(f"email en double (ligne {emails[ligne['email']]})")
+                emails.setdefault(ligne['email'], numero)
+        if ligne['username']:
+            if ligne['username'] in usernames:
+                messages.append(f"username en double (ligne {usernames[ligne['username']]})")
+            usernames.setdefault(ligne['username'], numero)
+        if messages:
+            erreurs[numero] = messages
+        ligne['ligne'] = numero
+        lignes.append(ligne)
+
+    # Une requête pour tous les usernames fournis, une pour tous les emails
+    for username in User.objects.filter(username__in=list(usernames)).values_list('username', flat=True):
+        erreurs.setdefault(usernames[username], []).append(f"username déjà utilisé : {username}")
+    for email in User.objects.filter(email__in=list(emails)).values_list('email', flat=True).distinct():
+        erreurs.setdefault(emails[email], []).append(f"email déjà utilisé : {email}")
+    if erreurs:
+        raise ValidationError({'lignes': {numero: erreurs[numero] for numero in sorted(erreurs)}})
+    if not lignes:
+        raise ValidationError({'fichier': ["Aucun utilisateur à importer"]})
+    return lignes
+
+
+def _initialiser_processus():
+    # Processus démarrés par « spawn » (macOS, Windows) : configurer Django pour les hacheurs
+    if not apps.ready:
+        django.setup()
+
+
+def hacher_mots_de_passe(mots_de_passe):
+    """
+    Hache des mots de passe avec le hacheur par défaut, répartis sur un
+    processus par cœur (PBKDF2 est limité par le CPU et le GIL empêcherait
+    des threads de s'exécuter en parallèle).
+    """
+    processus = os.cpu_count() or 1
+    if processus == 1 or len(mots_de_passe) < MIN_MOTS_DE_PASSE_PARALLELES:
+        return [make_password(mot_de_passe) for mot_de_passe in mots_de_passe]
+    with ProcessPoolExecutor(max_workers=processus, initializer=_initialiser_processus) as executeur:
+        taille_morceau = max(len(mots_de_passe) // (processus * 4), 1)
+        return list(executeur.map(make_password, mots_de_passe, chunksize=taille_morceau))
+
+
+def hacher_mot_de_passe_genere(mot_de_passe, hacheur=PBKDF2PasswordHasher()):
+    return hacheur.encode(mot_de_passe, hacheur.salt(), iterations=ITERATIONS_MOT_DE_PASSE_GENERE)
+
+
+def importer_utilisateurs(lignes, taille_lot=None):
+    """
+    Crée les comptes d'un roster validé par lire_roster. Les matricules sont
+    réservés par plage (une écriture par type d'utilisateur), les mots de
+    passe fournis hachés en parallèle hors transaction, puis les comptes
+    insérés par bulk_create en lots de ``taille_lot``. Retourne, pour chaque
+    compte créé, son matricule, son username et le mot de passe généré le
+    cas échéant (à transmettre à l'utilisateur : il n'est conservé nulle part).
+    """
+    taille_lot = taille_lot or settings.IMPORT_UTILISATEURS_TAILLE_LOT
+
+    fournis = [ligne for ligne in lignes if ligne['mot_de_passe']]
+    for ligne, hachage in zip(fournis, hacher_mots_de_passe([ligne['mot_de_passe'] for ligne in fournis])):
+        ligne['hachage'] = hachage
+    generes = {}
+    for ligne in lignes:
+        if not ligne['mot_de_passe']:
+            generes[ligne['ligne']] = secrets.token_urlsafe(12)
+            ligne['hachage'] = hacher_mot_de_passe_genere(generes[ligne['ligne']])
+
+    # Les matricules servent de username par défaut : ceux que le roster fournit sont évités
+    fournis = {ligne['username'] for ligne in lignes if ligne['username']}
+    matricules = {}
+    for user_type, prefixe in CompteurMatricule.PREFIXES.items():
+        concernees = [ligne for ligne in lignes if ligne['type'] == user_type]
+        if concernees:
+            matricules.update(zip(
+                (ligne['ligne'] for ligne in concernees),
+                CompteurMatricule.reserver(prefixe, len(concernees), exclure=fournis)
+            ))
+
+    utilisateurs = [
+        User(
+            username=ligne['username'] or matricules[ligne['ligne']], matricule=matricules[ligne['ligne']],
+            first_name=ligne['prenom'], last_name=ligne['nom'], email=ligne['email'],
+            user_type=ligne['type'], password=ligne['hachage']
+        )
+        for ligne in lignes
+    ]
+    try:
+        with transaction.atomic():
+            User.objects.bulk_create(utilisateurs, batch_size=taille_lot)
+    except IntegrityError:
+        # Compte créé par ailleurs entre la validation et l'insertion
+        raise ValidationError({'fichier': ["Conflit avec des comptes créés pendant l'import, aucun compte créé : "
+                                           "relancer l'import"]})
+
+    return [
+        {
+            'ligne': ligne['ligne'], 'matricule': utilisateur.matricule, 'username': utilisateur.username,
+            'mot_de_passe': generes.get(ligne['ligne'])
+        }
+        for ligne, utilisateur in zip(lignes, utilisateurs)
+    ]
@@ -0,0 +1,74 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt import serializers as jwt_serializers, tokens
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import OutstandingToken, BlacklistedToken
+from rest_framework_simplejwt.utils import aware_utcnow, datetime_from_epoch
+
+
+def _cle_liste_noire(jti):
+    return f'jwt:liste_noire:{jti}'
+
+
+def _duree_restante(exp):
+    """Secondes avant l'expiration du jeton : au-delà, sa présence sur la liste noire n'importe plus"""
+    return max(int((datetime_from_epoch(exp) - aware_utcnow()).total_seconds()), 1)
+
+
+def est_sur_liste_noire(jti, exp):
+    """
+    Appartenance à la liste noire. Seules les réponses positives sont mises
+    en cache, jusqu'à l'expiration du jeton (aussi écrites à la mise sur
+    liste noire, voir core/signals.py) : un jeton rejoué est refusé sans
+    lecture de la table, un jeton valide est toujours vérifié en base. Un
+    « non » en cache pourrait survivre à la rotation concurrente du même
+    jeton, ou à sa révocation par un autre processus quand le cache n'est
+    pas partagé. Retirer une ligne de la liste noire ne réhabilite pas le
+    jeton avant l'expiration de sa clé.
+    """
+    if cache.get(_cle_liste_noire(jti)):
+        return True
+    if BlacklistedToken.objects.filter(token__jti=jti).exists():
+        memoriser_liste_noire(jti, exp)
+        return True
+    return False
+
+
+def memoriser_liste_noire(jti, exp):
+    cache.set(_cle_liste_noire(jti), True, timeout=_duree_restante(exp))
+
+
+class RefreshToken(tokens.RefreshToken):
+    """RefreshToken de simplejwt dont le contrôle de liste noire passe par le cache"""
+
+    def check_blacklist(self):
+        if est_sur_liste_noire(self.payload[api_settings.JTI_CLAIM], self.payload['exp']):
+            raise TokenError(_("Token is blacklisted"))
+
+
+class TokenRefreshSerializer(jwt_serializers.TokenRefreshSerializer):
+    token_class = RefreshToken
+
+
+def purger_jetons_expires(taille_lot=None):
+    """
+    Supprime les jetons expirés (OutstandingToken et leurs BlacklistedToken)
+    par lots de ``taille_lot`` lignes, chacun dans sa propre requête : ni
+    chargement de toute la table ni verrou prolongé. Retourne le nombre de
+    jetons supprimés.
+    """
+    taille_lot = taille_lot or settings.JETONS_PURGE_TAILLE_LOT
+    maintenant = aware_utcnow()
+    total = 0
+    while True:
+        ids = list(
+            OutstandingToken.objects.filter(expires_at__lte=maintenant).order_by().values_list('id', flat=True)[:taille_lot]
+        )
+        if not ids:
+            return total
+        # Liste noire d'abord : les jetons n'ont alors plus de lignes dépendantes à collecter
+        BlacklistedToken.objects.filter(token_id__in=ids).delete()
+        OutstandingToken.objects.filter(id__in=ids).delete()
+        total += len(ids)
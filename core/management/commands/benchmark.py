@@ -0,0 +1,415 @@
+import logging
+import random
+import time
+from datetime import date, time as heure, timedelta
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.db.models import Count
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from core.api_views.statistique_views import StatistiquesView
+from core.models import (
+    Formation, Salle, TypeMateriel, Materiel, CreneauHoraire,
+    ReservationSalle, ReservationMateriel, RecapitulatifHoraire
+)
+from core.occupancy import occupancy_index, verifier_disponibilite
+from core.referentiels import REFERENTIELS, invalider_referentiel
+from core.renderers import ORJSONRenderer
+from core.rollups import reconstruire, verifier
+from core.serializers import LoginSerializer
+from core.utilisation import taux_utilisation
+
+
+User = get_user_model()
+
+
+class AnnulerTransaction(Exception):
+    """Levée en fin de benchmark pour annuler les données générées"""
+
+
+def _disponibilite_sans_index(type_ressource, ressource_id, date, creneau_id):
+    """Implémentation historique de DisponibiliteView (jusqu'à 3 requêtes par vérification)"""
+    model, champ = (ReservationSalle, 'salle_id') if type_ressource == 'salle' else (ReservationMateriel, 'materiel_id')
+    conflit_reservation = model.objects.filter(**{champ: ressource_id, 'date': date, 'creneau_id': creneau_id}).first()
+    if conflit_reservation:
+        return False, f"Réservé par {conflit_reservation.enseignant} pour {conflit_reservation.formation.nom}"
+    return True, None
+
+
+def _utilisateur_sans_index(identifiant):
+    """Recherche historique de LoginSerializer (email non indexé, puis matricule)"""
+    return User.objects.filter(email=identifiant).first() or User.objects.filter(matricule=identifiant).first()
+
+
+def _statistiques_sans_agregats():
+    """Implémentation historique de StatistiquesView (parcours de toute l'historique)"""
+    return {
+        'total_reservations_salles': ReservationSalle.objects.count(),
+        'total_reservations_materiels': ReservationMateriel.objects.count(),
+        'salles_les_plus_reservees': list(
+            ReservationSalle.objects.values('salle__nom').annotate(count=Count('id')).order_by('-count')[:5]
+        ),
+        'materiels_les_plus_reserves': list(
+            ReservationMateriel.objects.values('materiel__nom').annotate(count=Count('id')).order_by('-count')[:5]
+        ),
+    }
+
+
+def _utilisation_en_python(date_debut, date_fin):
+    """Taux d'utilisation des salles par boucles Python (référence de comparaison pour la version vectorisée)"""
+    salles = list(Salle.objects.filter(active=True).values_list('id', flat=True))
+    creneaux = list(CreneauHoraire.objects.values_list('id', flat=True))
+    nb_jours = (date_fin - date_debut).days + 1
+    jours = [date_debut + timedelta(days=i) for i in range(nb_jours)]
+    reservees = set(ReservationSalle.objects.filter(date__range=(date_debut, date_fin)).values_list(
+        'salle_id', 'date', 'creneau_id'
+    ))
+
+    par_salle, par_jour_semaine, par_creneau = {}, [0] * 7, {creneau: 0 for creneau in creneaux}
+    for salle in salles:
+        par_salle[salle] = 0
+        for jour in jours:
+            for creneau in creneaux:
+                if (salle, jour, creneau) in reservees:
+                    par_salle[salle] += 1
+                    par_jour_semaine[jour.weekday()] += 1
+                    par_creneau[creneau] += 1
+    disponibles = nb_jours * len(creneaux)
+    return {
+        'ressources': {salle: round(reserves * 100 / disponibles, 1) for salle, reserves in par_salle.items()},
+        'jours_semaine': par_jour_semaine,
+        'par_creneau': par_creneau,
+    }
+
+
+class Command(BaseCommand):
+    help = 'Mesure les performances des chemins critiques sur un jeu de données généré puis annulé'
+
+    def add_arguments(self, parser):
+        parser.add_argument('scenario', choices=['connexion', 'disponibilite', 'explain', 'rendu', 'statistiques',
+                                                 'utilisation'])
+        parser.add_argument('--salles', type=int, default=100)
+        parser.add_argument('--materiels', type=int, default=100)
+        parser.add_argument('--jours', type=int, default=60)
+        parser.add_argument('--taux', type=float, default=0.5, help="Proportion de cellules réservées")
+        parser.add_argument('--iterations', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--utilisateurs', type=int, default=20000, help="connexion : comptes générés")
+        parser.add_argument('--strict', action='store_true',
+                            help="explain : échoue si une requête parcourt entièrement une table de réservations")
+
+    def handle(self, *args, **options):
+        random.seed(options['seed'])
+        try:
+            with transaction.atomic():
+                self.generer_donnees(options)
+                getattr(self, f"bench_{options['scenario']}")(options)
+                raise AnnulerTransaction
+        except AnnulerTransaction:
+            pass
+        finally:
+            occupancy_index.vider()
+            cache.clear()
+        if getattr(self, 'echec', None):
+            raise CommandError(self.echec)
+
+    def generer_donnees(self, options):
+        """Crée salles, matériels et réservations en masse (annulés en fin de commande)"""
+        creneaux_data = [
+            ('08:00-10:00', heure(8, 0), heure(10, 0)),
+            ('10:15-12:15', heure(10, 15), heure(12, 15)),
+            ('13:30-15:30', heure(13, 30), heure(15, 30)),
+            ('15:45-17:45', heure(15, 45), heure(17, 45)),
+        ]
+        self.creneaux = [
+            CreneauHoraire.objects.get_or_create(nom=nom, defaults={'heure_debut': debut, 'heure_fin': fin})[0]
+            for nom, debut, fin in creneaux_data
+        ]
+        self.enseignants = User.objects.bulk_create([
+            User(username=f'bench.ens{i}', matricule=f'BEN{i:08d}', user_type='enseignant') for i in range(20)
+        ])
+        self.formations = Formation.objects.bulk_create([
+            Formation(nom=f'Bench formation {i}', code=f'BENCH{i:06d}', responsable=self.enseignants[i])
+            for i in range(10)
+        ])
+        self.salles = Salle.objects.bulk_create([
+            Salle(nom=f'BENCH-{i}', capacite=random.randint(10, 200), equipements='Tableau blanc')
+            for i in range(options['salles'])
+        ])
+        type_materiel = TypeMateriel.objects.create(nom='Bench type')
+        self.materiels = Materiel.objects.bulk_create([
+            Materiel(nom=f'Bench matériel {i}', type_materiel=type_materiel, numero_serie=f'BENCH{i}')
+            for i in range(options['materiels'])
+        ])
+
+        self.date_debut = date.today() + timedelta(days=1)
+        self.dates = [self.date_debut + timedelta(days=i) for i in range(options['jours'])]
+        for model, champ, ressources in (
+            (ReservationSalle, 'salle', self.salles),
+            (ReservationMateriel, 'materiel', self.materiels),
+        ):
+            model.objects.bulk_create([
+                model(**{champ: ressource}, date=jour, creneau=creneau,
+                      enseignant=random.choice(self.enseignants), formation=random.choice(self.formations))
+                for ressource in ressources for jour in self.dates for creneau in self.creneaux
+                if random.random() < options['taux']
+            ], batch_size=1000)
+
+        # bulk_create n'émet pas de signaux et la transaction est annulée : versions des référentiels à la main
+        for nom in REFERENTIELS:
+            invalider_referentiel(nom)
+
+        self.stdout.write(
+            f"Jeu de données : {len(self.salles)} salles, {len(self.materiels)} matériels, "
+            f"{len(self.dates)} jours, {ReservationSalle.objects.count()} réservations de salles, "
+            f"{ReservationMateriel.objects.count()} réservations de matériels"
+        )
+
+    def mesurer(self, libelle, fonction, appels):
+        debut = time.perf_counter()
+        for arguments in appels:
+            fonction(*arguments)
+        duree = time.perf_counter() - debut
+        self.stdout.write(f"{libelle:<40} {len(appels) / duree:>12.0f} op/s  ({duree * 1000:.1f} ms)")
+        return duree
+
+    def bench_disponibilite(self, options):
+        appels = [
+            random.choice([
+                ('salle', random.choice(self.salles).pk),
+                ('materiel', random.choice(self.materiels).pk),
+            ]) + (random.choice(self.dates), random.choice(self.creneaux).pk)
+            for _ in range(options['iterations'])
+        ]
+        # Les deux implémentations doivent rendre le même verdict
+        for arguments in appels[:200]:
+            assert _disponibilite_sans_index(*arguments)[0] == verifier_disponibilite(*arguments)[0]
+        occupancy_index.vider()
+
+        avant = self.mesurer('Vérifications sans index', _disponibilite_sans_index, appels)
+        self.mesurer('Vérifications avec index (à froid)', verifier_disponibilite, appels)
+        apres = self.mesurer('Vérifications avec index (à chaud)', verifier_disponibilite, appels)
+        self.stdout.write(self.style.SUCCESS(f"Gain : x{avant / apres:.1f}"))
+
+        # Le cas « libre » (le plus fréquent côté formulaire) ne fait aucune requête
+        libres = [arguments for arguments in appels if occupancy_index.est_disponible(*arguments)]
+        if libres:
+            avant = self.mesurer('Cellules libres sans index', _disponibilite_sans_index, libres)
+            apres = self.mesurer('Cellules libres avec index', verifier_disponibilite, libres)
+            self.stdout.write(self.style.SUCCESS(f"Gain : x{avant / apres:.1f}"))
+
+    # Tables dont un parcours complet signale un index manquant
+    TABLES_SURVEILLEES = ('core_reservationsalle', 'core_reservationmateriel', 'core_recapitulatifhoraire')
+
+    def bench_explain(self, options):
+        """Affiche le plan d'exécution de chaque requête émise par les endpoints de lecture"""
+        enseignant = self.enseignants[0]
+        RecapitulatifHoraire.objects.bulk_create([
+            RecapitulatifHoraire(formation=random.choice(self.formations), enseignant=enseignant_recap,
+                                 date=jour, creneau=creneau, salle_prevue=random.choice(self.salles))
+            for enseignant_recap in self.enseignants for jour in self.dates for creneau in self.creneaux
+            if random.random() < options['taux'] / 4
+        ], batch_size=1000, ignore_conflicts=True)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+        debut, fin = self.dates[0].isoformat(), self.dates[min(6, len(self.dates) - 1)].isoformat()
+        periode = {'date_debut': debut, 'date_fin': fin}
+        endpoints = [
+            ('Planning général (jour)', 'get', reverse('planning-general'), {'date': debut}),
+            ('Planning général (semaine)', 'get', reverse('planning-general'), periode),
+            ('Mes réservations', 'get', reverse('mes-reservations'), periode),
+            ('Planning enseignant', 'get', reverse('planning-enseignant', args=[enseignant.pk]), periode),
+            ('Réservations salles ?date', 'get', reverse('reservationsalle-list'), {'date': debut}),
+            ('Réservations salles ?formation', 'get', reverse('reservationsalle-list'),
+             {'formation': self.formations[0].pk, 'pagination': 'curseur'}),
+            ('Réservations matériels ?date', 'get', reverse('reservationmateriel-list'), {'date': debut}),
+            ('Récapitulatifs ?enseignant', 'get', reverse('recapitulatifhoraire-list'), {'enseignant': enseignant.pk}),
+            ('Récapitulatifs ?date', 'get', reverse('recapitulatifhoraire-list'), {'date': debut}),
+            ('Salles libres', 'get', reverse('salle-libres'), {'capacite': 30, **periode}),
+            ('Disponibilité en lot', 'post', reverse('disponibilite-batch'), {
+                'salles': [salle.pk for salle in self.salles[:50]], 'date_debut': debut, 'date_fin': fin
+            }),
+        ]
+
+        client = APIClient()
+        client.force_authenticate(enseignant)
+        prefixe = connection.ops.explain_query_prefix()
+        parcours_complets = []
+        for libelle, methode, url, parametres in endpoints:
+            cache.clear()
+            occupancy_index.vider()
+            with CaptureQueriesContext(connection) as requetes:
+                if methode == 'get':
+                    reponse = client.get(url, parametres)
+                else:
+                    reponse = client.post(url, parametres, format='json')
+            self.stdout.write(self.style.MIGRATE_HEADING(f"\n{libelle} ({reponse.status_code}, {len(requetes)} requêtes)"))
+
+            # Les requêtes identiques (N+1) ne sont expliquées qu'une fois
+            occurrences = {}
+            for requete in requetes.captured_queries:
+                if requete['sql'].lstrip().upper().startswith('SELECT'):
+                    occurrences[requete['sql']] = occurrences.get(requete['sql'], 0) + 1
+
+            for sql, nombre in occurrences.items():
+                with connection.cursor() as cursor:
+                    cursor.execute(f'{prefixe} {sql}')
+                    plan = [' '.join(str(colonne) for colonne in ligne) for ligne in cursor.fetchall()]
+                self.stdout.write(f"  {'' if nombre == 1 else f'[x{nombre}] '}{sql[:110]}...")
+                for ligne in plan:
+                    # « SCAN t USING INDEX » reste un parcours complet (de l'index) : seul SEARCH cible des lignes
+                    complet = any(f'SCAN {table}' in ligne for table in self.TABLES_SURVEILLEES) or any(
+                        f'Seq Scan on {table}' in ligne for table in self.TABLES_SURVEILLEES
+                    )
+                    if complet:
+                        parcours_complets.append(libelle)
+                    self.stdout.write(self.style.WARNING(f"    {ligne}") if complet else f"    {ligne}")
+
+        if parcours_complets:
+            message = f"Parcours complets de tables de réservations : {', '.join(dict.fromkeys(parcours_complets))}"
+            self.stdout.write(self.style.WARNING(f"\n{message}"))
+            if options['strict']:
+                self.echec = message
+        else:
+            self.stdout.write(self.style.SUCCESS("\nAucun parcours complet des tables de réservations"))
+
+    def bench_rendu(self, options):
+        """Rendu JSON (DRF puis orjson) et octets transmis (brut puis gzip) des endpoints de planning"""
+        enseignant = self.enseignants[0]
+        debut, fin = self.dates[0].isoformat(), self.dates[min(6, len(self.dates) - 1)].isoformat()
+        periode = {'date_debut': debut, 'date_fin': fin}
+        endpoints = [
+            ('Planning général (semaine)', reverse('planning-general'), periode),
+            ('Planning général (semaine, sideload)', reverse('planning-general'), {**periode, 'sideload': 1}),
+            ('Planning d\'une salle', reverse('salle-planning', args=[self.salles[0].pk]), periode),
+            ('Mes réservations', reverse('mes-reservations'), periode),
+            ('Planning enseignant', reverse('planning-enseignant', args=[enseignant.pk]), periode),
+        ]
+
+        client = APIClient()
+        client.force_authenticate(enseignant)
+        appels = [()] * max(1, options['iterations'] // 100)
+        total_avant = total_apres = 0
+        for libelle, url, parametres in endpoints:
+            donnees = client.get(url, parametres).data
+            drf, rapide = JSONRenderer(), ORJSONRenderer()
+            # Aucun flottant dans ces réponses : mêmes octets que le rendu de DRF
+            assert drf.render(donnees) == rapide.render(donnees), libelle
+
+            self.stdout.write(self.style.MIGRATE_HEADING(f"\n{libelle}"))
+            avant = self.mesurer('Rendu JSONRenderer (DRF)', lambda: drf.render(donnees), appels)
+            apres = self.mesurer('Rendu ORJSONRenderer', lambda: rapide.render(donnees), appels)
+            total_avant += avant
+            total_apres += apres
+            self.stdout.write(self.style.SUCCESS(f"Gain : x{avant / apres:.1f}"))
+
+            brut = len(client.get(url, parametres).content)
+            compresse = client.get(url, parametres, HTTP_ACCEPT_ENCODING='gzip')
+            assert compresse.get('Content-Encoding') == 'gzip', libelle
+            self.stdout.write(f"{'Octets transmis':<40} {brut:>12} -> {len(compresse.content)} "
+                              f"(gzip, {len(compresse.content) / brut:.0%})")
+
+        self.stdout.write(self.style.SUCCESS(f"\nGain total sur le rendu : x{total_avant / total_apres:.1f}"))
+
+    def bench_statistiques(self, options):
+        # Le jeu de données est inséré par bulk_create : les agrégats sont construits ici
+        debut = time.perf_counter()
+        reconstruire()
+        self.stdout.write(f"Reconstruction des agrégats : {(time.perf_counter() - debut) * 1000:.0f} ms")
+        assert not any(verifier().values())
+
+        appels = [()] * max(1, options['iterations'] // 100)
+
+        # Même chemin des deux côtés : le calcul seul, sans requête HTTP ni rendu
+        attendu = _statistiques_sans_agregats()
+        obtenu = StatistiquesView.calculer()
+        assert (obtenu['total_reservations_salles'], obtenu['total_reservations_materiels']) == (
+            attendu['total_reservations_salles'], attendu['total_reservations_materiels']
+        )
+
+        avant = self.mesurer('Statistiques sur les réservations', _statistiques_sans_agregats, appels)
+        apres = self.mesurer('Statistiques sur les agrégats', StatistiquesView.calculer, appels)
+        self.stdout.write(self.style.SUCCESS(f"Gain : x{avant / apres:.1f}"))
+
+    def bench_utilisation(self, options):
+        date_fin = self.dates[-1]
+        appels = [(self.date_debut, date_fin)] * max(1, options['iterations'] // 500)
+
+        attendu = _utilisation_en_python(self.date_debut, date_fin)
+        obtenu = taux_utilisation('salle', self.date_debut, date_fin)
+        assert {ligne['id']: ligne['taux'] for ligne in obtenu['ressources']} == attendu['ressources']
+
+        avant = self.mesurer('Taux d\'utilisation (boucles Python)', _utilisation_en_python, appels)
+        apres = self.mesurer('Taux d\'utilisation (matrice NumPy)', lambda *periode: taux_utilisation('salle', *periode), appels)
+        self.stdout.write(self.style.SUCCESS(f"Gain : x{avant / apres:.1f}"))
+
+    def bench_connexion(self, options):
+        """Connexions soutenues par minute sur une table d'utilisateurs peuplée, et coût des tentatives bloquées"""
+        mot_de_passe = 'bench-mot-de-passe'
+        # Un seul hachage au réglage courant, partagé par tous les comptes générés
+        hachage = make_password(mot_de_passe)
+        User.objects.bulk_create([
+            User(username=f'bench.etu{i}', matricule=f'BET{i:08d}', email=f'bench.etu{i}@bench.local',
+                 user_type='etudiant', password=hachage)
+            for i in range(options['utilisateurs'])
+        ], batch_size=1000)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+        # Moitié emails, moitié matricules (pire cas de l'ancienne recherche : deux requêtes)
+        identifiants = [
+            (f'bench.etu{i}@bench.local' if i % 2 else f'BET{i:08d}',)
+            for i in (random.randrange(options['utilisateurs']) for _ in range(options['iterations']))
+        ]
+        for identifiant, in identifiants[:200]:
+            assert _utilisateur_sans_index(identifiant) == LoginSerializer.trouver_utilisateur(identifiant)
+
+        self.stdout.write(self.style.MIGRATE_HEADING(f"\nRecherche du compte ({User.objects.count()} utilisateurs)"))
+        with CaptureQueriesContext(connection) as requetes:
+            LoginSerializer.trouver_utilisateur(identifiants[0][0])
+        with connection.cursor() as cursor:
+            cursor.execute(f'{connection.ops.explain_query_prefix()} {requetes.captured_queries[0]["sql"]}')
+            for ligne in cursor.fetchall():
+                self.stdout.write(f"    {' '.join(str(colonne) for colonne in ligne)}")
+        avant = self.mesurer('Email puis matricule (2 requêtes)', _utilisateur_sans_index, identifiants)
+        apres = self.mesurer('Email ou matricule (1 requête)', LoginSerializer.trouver_utilisateur, identifiants)
+        self.stdout.write(self.style.SUCCESS(f"Gain : x{avant / apres:.1f}"))
+
+        # Connexions complètes : le hachage du mot de passe domine
+        self.stdout.write(self.style.MIGRATE_HEADING("\nPOST /api/login/"))
+        client = APIClient()
+        url = reverse('login')
+        connexions = identifiants[:max(1, options['iterations'] // 500)]
+        duree = self.mesurer(
+            'Connexions réussies',
+            lambda identifiant: client.post(url, {'identifier': identifiant, 'password': mot_de_passe}, format='json'),
+            connexions
+        )
+        self.stdout.write(self.style.SUCCESS(f"{len(connexions) * 60 / duree:.0f} connexions/minute soutenues "
+                                             f"(un processus)"))
+
+        # Identifiant bloqué après CONNEXION_ECHECS_MAX échecs : ni lecture ni hachage.
+        # Les réponses 400 et 429 ne sont pas journalisées pendant la mesure
+        logging.disable(logging.WARNING)
+        cible = identifiants[0][0]
+        for _ in range(settings.CONNEXION_ECHECS_MAX):
+            client.post(url, {'identifier': cible, 'password': 'faux'}, format='json')
+        assert client.post(url, {'identifier': cible, 'password': 'faux'}, format='json').status_code == 429
+        with CaptureQueriesContext(connection) as requetes:
+            client.post(url, {'identifier': cible, 'password': 'faux'}, format='json')
+        assert not requetes.captured_queries
+        duree = self.mesurer(
+            'Tentatives bloquées (429)',
+            lambda identifiant: client.post(url, {'identifier': identifiant, 'password': 'faux'}, format='json'),
+            [(cible,)] * max(1, options['iterations'] // 10)
+        )
+        logging.disable(logging.NOTSET)
+        self.stdout.write(self.style.SUCCESS(f"{max(1, options['iterations'] // 10) * 60 / duree:.0f} "
+                                             f"tentatives bloquées/minute"))
@@ -0,0 +1,42 @@
+import csv
+import time
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.exceptions import ValidationError
+from core.importation import lire_roster, importer_utilisateurs
+
+
+class Command(BaseCommand):
+    help = "Importe des comptes depuis un roster CSV (colonnes nom, prenom, email, username, type, mot_de_passe)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('fichier', help="Roster CSV, séparateur , ou ;")
+        parser.add_argument('--type', choices=['enseignant', 'etudiant'],
+                            help="Type des comptes dont la colonne 'type' est vide")
+        parser.add_argument('--sortie', help="CSV où écrire les matricules et les mots de passe générés")
+        parser.add_argument('--taille-lot', type=int,
+                            help="Comptes insérés par requête. Par défaut : IMPORT_UTILISATEURS_TAILLE_LOT")
+
+    def handle(self, *args, **options):
+        debut = time.perf_counter()
+        try:
+            with open(options['fichier'], encoding='utf-8-sig', newline='') as fichier:
+                lignes = lire_roster(fichier, options['type'])
+            if not options['sortie'] and not all(ligne['mot_de_passe'] for ligne in lignes):
+                raise CommandError("Des mots de passe seront générés : préciser --sortie pour les récupérer")
+            comptes = importer_utilisateurs(lignes, options['taille_lot'])
+        except OSError as e:
+            raise CommandError(f"Lecture impossible : {e}")
+        except ValidationError as e:
+            messages = [f"ligne {numero} : {', '.join(map(str, erreurs))}"
+                        for numero, erreurs in e.detail.get('lignes', {}).items()]
+            messages += [str(message) for message in e.detail.get('fichier', [])]
+            raise CommandError('\n  '.join(["Roster invalide"] + messages))
+
+        if options['sortie']:
+            with open(options['sortie'], 'w', encoding='utf-8', newline='') as sortie:
+                writer = csv.DictWriter(sortie, fieldnames=['ligne', 'matricule', 'username', 'mot_de_passe'])
+                writer.writeheader()
+                writer.writerows(comptes)
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(comptes)} compte(s) importé(s) en {time.perf_counter() - debut:.1f} s"
+        ))
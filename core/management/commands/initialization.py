@@ -9,7 +9,7 @@ from django.utils import timezone
 from datetime import datetime, time, date, timedelta
 from core.models import (
     Formation, Salle, TypeMateriel, Materiel, CreneauHoraire,
-    ReservationSalle, ReservationMateriel, RecapitulatifHoraire
+    ReservationSalle, ReservationMateriel, RecapitulatifHoraire, CompteurMatricule
 )
 
 
@@ -59,12 +59,7 @@ class Command(BaseCommand):
 
     def generate_matricule(self, prefix, user_type):
         """Génère un matricule unique sous forme PREFIX000000XX"""
-        count = User.objects.filter(user_type=user_type).count() + 1
-        while True:
-            matricule = f"{prefix}{count:08d}"
-            if not User.objects.filter(matricule=matricule).exists():
-                return matricule
-            count += 1
+        return CompteurMatricule.reserver(prefix, 1)[0]
 
     def clear_data(self):
         """Supprime toutes les données existantes"""
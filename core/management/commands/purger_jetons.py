@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand, CommandError
+from core.jetons import purger_jetons_expires
+
+
+class Command(BaseCommand):
+    help = "Supprime par lots les jetons JWT expirés (jetons émis et liste noire)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--taille-lot', type=int,
+                            help="Nombre de jetons supprimés par requête. Par défaut : JETONS_PURGE_TAILLE_LOT")
+
+    def handle(self, *args, **options):
+        if options['taille_lot'] is not None and options['taille_lot'] <= 0:
+            raise CommandError("--taille-lot doit être strictement positif")
+        nombre = purger_jetons_expires(options['taille_lot'])
+        self.stdout.write(self.style.SUCCESS(f"{nombre} jeton(s) expiré(s) supprimé(s)"))
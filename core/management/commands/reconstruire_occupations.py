@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+from core.rollups import reconstruire, verifier
+
+
+class Command(BaseCommand):
+    help = "Recalcule les agrégats d'occupation journaliers (salles, matériels, formations) depuis les réservations"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date-debut', help="Première date recalculée (YYYY-MM-DD). Par défaut : toute l'historique")
+        parser.add_argument('--date-fin', help="Dernière date recalculée (YYYY-MM-DD)")
+        parser.add_argument('--verifier', action='store_true',
+                            help="Compare les agrégats au recalcul sans rien modifier (code de sortie non nul en cas d'écart)")
+
+    def handle(self, *args, **options):
+        bornes = {}
+        for option in ('date_debut', 'date_fin'):
+            if options[option]:
+                bornes[option] = parse_date(options[option])
+                if bornes[option] is None:
+                    raise CommandError(f"Date invalide : {options[option]} (format attendu : YYYY-MM-DD)")
+
+        if options['verifier']:
+            ecarts = verifier(**bornes)
+            for agregat, nombre in ecarts.items():
+                self.stdout.write(f"{agregat:<22} {nombre} ligne(s) en écart")
+            if any(ecarts.values()):
+                raise CommandError("Agrégats désynchronisés : relancer la commande sans --verifier")
+            self.stdout.write(self.style.SUCCESS("Agrégats à jour"))
+            return
+
+        for agregat, nombre in reconstruire(**bornes).items():
+            self.stdout.write(f"{agregat:<22} {nombre} ligne(s)")
+        self.stdout.write(self.style.SUCCESS("Agrégats reconstruits"))
@@ -0,0 +1,22 @@
+from django.conf import settings
+from django.middleware.gzip import GZipMiddleware
+
+# Formats déjà compressés : les recompresser coûte du CPU sans réduire la taille
+TYPES_DEJA_COMPRESSES = ('application/pdf', 'application/zip', 'application/gzip')
+
+
+class CompressionMiddleware(GZipMiddleware):
+    """
+    Compression gzip négociée par Accept-Encoding, à partir de
+    COMPRESSION_MIN_LENGTH octets : en dessous, le gain ne compense pas le
+    coût CPU. Les réponses en flux (export CSV) sont compressées au fil de
+    l'eau, les PDF et images laissés tels quels.
+    """
+
+    def process_response(self, request, response):
+        if not response.streaming and len(response.content) < settings.COMPRESSION_MIN_LENGTH:
+            return response
+        type_contenu = response.get('Content-Type', '').split(';')[0].strip()
+        if type_contenu in TYPES_DEJA_COMPRESSES or type_contenu.startswith('image/'):
+            return response
+        return super().process_response(request, response)
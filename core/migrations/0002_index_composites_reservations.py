@@ -0,0 +1,87 @@
+# Generated by Django 4.2 on 2026-10-18 10:18
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='recapitulatifhoraire',
+            name='enseignant',
+            field=models.ForeignKey(db_index=False, limit_choices_to={'user_type': 'enseignant'}, on_delete=django.db.models.deletion.CASCADE, related_name='recapitulatifs', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='recapitulatifhoraire',
+            name='formation',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='recapitulatifs', to='core.formation'),
+        ),
+        migrations.AlterField(
+            model_name='reservationmateriel',
+            name='enseignant',
+            field=models.ForeignKey(db_index=False, limit_choices_to={'user_type': 'enseignant'}, on_delete=django.db.models.deletion.CASCADE, related_name='reservations_materiels', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='reservationmateriel',
+            name='formation',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='reservations_materiels', to='core.formation'),
+        ),
+        migrations.AlterField(
+            model_name='reservationmateriel',
+            name='materiel',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='reservations', to='core.materiel'),
+        ),
+        migrations.AlterField(
+            model_name='reservationsalle',
+            name='enseignant',
+            field=models.ForeignKey(db_index=False, limit_choices_to={'user_type': 'enseignant'}, on_delete=django.db.models.deletion.CASCADE, related_name='reservations_salles', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='reservationsalle',
+            name='formation',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='reservations_salles', to='core.formation'),
+        ),
+        migrations.AlterField(
+            model_name='reservationsalle',
+            name='salle',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='reservations', to='core.salle'),
+        ),
+        migrations.AddIndex(
+            model_name='recapitulatifhoraire',
+            index=models.Index(fields=['enseignant', 'date'], name='recap_ens_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recapitulatifhoraire',
+            index=models.Index(fields=['date', 'creneau'], name='recap_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reservationmateriel',
+            index=models.Index(fields=['date', 'creneau', 'materiel'], name='resa_mat_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reservationmateriel',
+            index=models.Index(fields=['enseignant', 'date'], name='resa_mat_ens_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reservationmateriel',
+            index=models.Index(fields=['formation', 'date'], name='resa_mat_form_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reservationsalle',
+            index=models.Index(fields=['date', 'creneau', 'salle'], name='resa_salle_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reservationsalle',
+            index=models.Index(fields=['enseignant', 'date'], name='resa_salle_ens_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reservationsalle',
+            index=models.Index(fields=['formation', 'date'], name='resa_salle_form_date_idx'),
+        ),
+    ]
@@ -0,0 +1,88 @@
+# Generated by Django 4.2 on 2026-10-18 10:26
+
+from django.db import migrations, models
+from django.db.models import Count
+import django.db.models.deletion
+
+
+def remplir_occupations(apps, schema_editor):
+    """Construit les agrégats à partir des réservations existantes (voir core/rollups.py)"""
+    sources = [
+        ('ReservationSalle', 'OccupationSalle', ('salle_id', 'date'), 'nombre'),
+        ('ReservationMateriel', 'OccupationMateriel', ('materiel_id', 'date'), 'nombre'),
+        ('ReservationSalle', 'OccupationFormation', ('formation_id', 'date', 'creneau_id'), 'reservations_salles'),
+        ('ReservationMateriel', 'OccupationFormation', ('formation_id', 'date', 'creneau_id'), 'reservations_materiels'),
+    ]
+    lignes = {}
+    for source, agregat, champs, compteur in sources:
+        comptes = apps.get_model('core', source).objects.order_by().values_list(*champs).annotate(n=Count('id'))
+        for *cle, nombre in comptes.iterator():
+            ligne = lignes.get((agregat, *cle))
+            if ligne is None:
+                ligne = lignes[(agregat, *cle)] = apps.get_model('core', agregat)(**dict(zip(champs, cle)))
+            setattr(ligne, compteur, nombre)
+
+    for agregat in ('OccupationSalle', 'OccupationMateriel', 'OccupationFormation'):
+        apps.get_model('core', agregat).objects.bulk_create(
+            [ligne for cle, ligne in lignes.items() if cle[0] == agregat], batch_size=1000
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_index_composites_reservations'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OccupationSalle',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('nombre', models.PositiveIntegerField(default=0)),
+                ('salle', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='occupations', to='core.salle')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='OccupationMateriel',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('nombre', models.PositiveIntegerField(default=0)),
+                ('materiel', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='occupations', to='core.materiel')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='OccupationFormation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('reservations_salles', models.PositiveIntegerField(default=0)),
+                ('reservations_materiels', models.PositiveIntegerField(default=0)),
+                ('creneau', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.creneauhoraire')),
+                ('formation', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='occupations', to='core.formation')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='occupationsalle',
+            index=models.Index(fields=['salle', 'nombre'], name='occ_salle_total_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='occupationsalle',
+            unique_together={('salle', 'date')},
+        ),
+        migrations.AddIndex(
+            model_name='occupationmateriel',
+            index=models.Index(fields=['materiel', 'nombre'], name='occ_mat_total_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='occupationmateriel',
+            unique_together={('materiel', 'date')},
+        ),
+        migrations.AlterUniqueTogether(
+            name='occupationformation',
+            unique_together={('formation', 'date', 'creneau')},
+        ),
+        migrations.RunPython(remplir_occupations, migrations.RunPython.noop),
+    ]
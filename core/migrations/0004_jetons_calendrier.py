@@ -0,0 +1,24 @@
+# Generated by Django 4.2 on 2026-10-18 10:50
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_occupations_journalieres'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='JetonCalendrier',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('empreinte', models.CharField(max_length=64, unique=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('utilisateur', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='jeton_calendrier', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
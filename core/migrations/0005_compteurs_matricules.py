@@ -0,0 +1,20 @@
+# Generated by Django 4.2 on 2026-10-18 11:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_jetons_calendrier'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CompteurMatricule',
+            fields=[
+                ('prefixe', models.CharField(max_length=3, primary_key=True, serialize=False)),
+                ('dernier', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+    ]
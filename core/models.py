@@ -1,4 +1,7 @@
-from django.db import models
+import hashlib
+import secrets
+from django.db import models, transaction
+from django.db.models import Max, Q
 from django.contrib.auth.models import AbstractUser
 from django.core.exceptions import ValidationError
 from django.utils import timezone
@@ -12,6 +15,8 @@ class User(AbstractUser):
     ]
     user_type = models.CharField(max_length=20, choices=USER_TYPE_CHOICES, default='enseignant')
     matricule = models.CharField(max_length=11, unique=True)
+    # Indexé : la connexion recherche le compte par email ou matricule
+    email = models.EmailField('email address', blank=True, db_index=True)
 
     def __str__(self):
         return f"{self.first_name} {self.last_name} ({self.username})"
@@ -93,9 +98,10 @@ class CreneauHoraire(models.Model):
 
 
 class ReservationSalle(models.Model):
-    enseignant = models.ForeignKey('User', on_delete=models.CASCADE, limit_choices_to={'user_type': 'enseignant'}, related_name='reservations_salles')
-    salle = models.ForeignKey('Salle', on_delete=models.CASCADE, related_name='reservations')
-    formation = models.ForeignKey('Formation', on_delete=models.CASCADE, related_name='reservations_salles')
+    # Les index simples des clés étrangères sont remplacés par les index composites de Meta
+    enseignant = models.ForeignKey('User', on_delete=models.CASCADE, limit_choices_to={'user_type': 'enseignant'}, related_name='reservations_salles', db_index=False)
+    salle = models.ForeignKey('Salle', on_delete=models.CASCADE, related_name='reservations', db_index=False)
+    formation = models.ForeignKey('Formation', on_delete=models.CASCADE, related_name='reservations_salles', db_index=False)
     creneau = models.ForeignKey('CreneauHoraire', on_delete=models.CASCADE)
     date = models.DateField()
     sujet = models.CharField(max_length=200, null=True, blank=True)
@@ -124,12 +130,21 @@ class ReservationSalle(models.Model):
     class Meta:
         unique_together = ['salle', 'date', 'creneau']
         ordering = ['-date', 'creneau__heure_debut']
+        indexes = [
+            # Plannings, filtre ?date et index d'occupation (couvrant pour ce dernier)
+            models.Index(fields=['date', 'creneau', 'salle'], name='resa_salle_date_idx'),
+            # Mes réservations, planning enseignant
+            models.Index(fields=['enseignant', 'date'], name='resa_salle_ens_date_idx'),
+            # Filtre ?formation
+            models.Index(fields=['formation', 'date'], name='resa_salle_form_date_idx'),
+        ]
 
 
 class ReservationMateriel(models.Model):
-    enseignant = models.ForeignKey('User', on_delete=models.CASCADE, limit_choices_to={'user_type': 'enseignant'}, related_name='reservations_materiels')
-    materiel = models.ForeignKey('Materiel', on_delete=models.CASCADE, related_name='reservations')
-    formation = models.ForeignKey('Formation', on_delete=models.CASCADE, related_name='reservations_materiels')
+    # Les index simples des clés étrangères sont remplacés par les index composites de Meta
+    enseignant = models.ForeignKey('User', on_delete=models.CASCADE, limit_choices_to={'user_type': 'enseignant'}, related_name='reservations_materiels', db_index=False)
+    materiel = models.ForeignKey('Materiel', on_delete=models.CASCADE, related_name='reservations', db_index=False)
+    formation = models.ForeignKey('Formation', on_delete=models.CASCADE, related_name='reservations_materiels', db_index=False)
     creneau = models.ForeignKey('CreneauHoraire', on_delete=models.CASCADE)
     date = models.DateField()
     commentaires = models.TextField(blank=True)
@@ -157,12 +172,18 @@ class ReservationMateriel(models.Model):
     class Meta:
         unique_together = ['materiel', 'date', 'creneau']
         ordering = ['-date', 'creneau__heure_debut']
+        indexes = [
+            models.Index(fields=['date', 'creneau', 'materiel'], name='resa_mat_date_idx'),
+            models.Index(fields=['enseignant', 'date'], name='resa_mat_ens_date_idx'),
+            models.Index(fields=['formation', 'date'], name='resa_mat_form_date_idx'),
+        ]
 
 
 class RecapitulatifHoraire(models.Model):
     """Récapitulatif personnalisé par formation et enseignant"""
-    formation = models.ForeignKey('Formation', on_delete=models.CASCADE, related_name='recapitulatifs')
-    enseignant = models.ForeignKey('User', on_delete=models.CASCADE, limit_choices_to={'user_type': 'enseignant'}, related_name='recapitulatifs')
+    # formation est en tête de unique_together, enseignant en tête d'un index composite
+    formation = models.ForeignKey('Formation', on_delete=models.CASCADE, related_name='recapitulatifs', db_index=False)
+    enseignant = models.ForeignKey('User', on_delete=models.CASCADE, limit_choices_to={'user_type': 'enseignant'}, related_name='recapitulatifs', db_index=False)
     date = models.DateField()
     creneau = models.ForeignKey('CreneauHoraire', on_delete=models.CASCADE)
     sujet = models.CharField(max_length=200, null=True, blank=True)
@@ -176,4 +197,142 @@ class RecapitulatifHoraire(models.Model):
 
     class Meta:
         unique_together = ['formation', 'enseignant', 'date', 'creneau']
-        ordering = ['formation', '-date', 'creneau__heure_debut']
\ No newline at end of file
+        ordering = ['formation', '-date', 'creneau__heure_debut']
+        indexes = [
+            models.Index(fields=['enseignant', 'date'], name='recap_ens_date_idx'),
+            models.Index(fields=['date', 'creneau'], name='recap_date_idx'),
+        ]
+
+
+class OccupationSalle(models.Model):
+    """
+    Agrégat journalier : nombre de créneaux réservés d'une salle (tenu à jour par core/rollups.py).
+    Le détail par créneau d'une salle est la réservation elle-même (au plus une par créneau) ;
+    la répartition par créneau est portée par OccupationFormation.
+    """
+    salle = models.ForeignKey('Salle', on_delete=models.CASCADE, related_name='occupations')
+    date = models.DateField()
+    nombre = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.salle_id} - {self.date} : {self.nombre}"
+
+    class Meta:
+        unique_together = ['salle', 'date']
+        indexes = [
+            # Couvrant pour les totaux par salle (GROUP BY salle_id, SUM(nombre))
+            models.Index(fields=['salle', 'nombre'], name='occ_salle_total_idx'),
+        ]
+
+
+class OccupationMateriel(models.Model):
+    """Agrégat journalier : nombre de créneaux réservés d'un matériel (tenu à jour par core/rollups.py)"""
+    materiel = models.ForeignKey('Materiel', on_delete=models.CASCADE, related_name='occupations')
+    date = models.DateField()
+    nombre = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.materiel_id} - {self.date} : {self.nombre}"
+
+    class Meta:
+        unique_together = ['materiel', 'date']
+        indexes = [
+            models.Index(fields=['materiel', 'nombre'], name='occ_mat_total_idx'),
+        ]
+
+
+class OccupationFormation(models.Model):
+    """Agrégat journalier par créneau : réservations de salles et de matériels d'une formation"""
+    formation = models.ForeignKey('Formation', on_delete=models.CASCADE, related_name='occupations')
+    date = models.DateField()
+    creneau = models.ForeignKey('CreneauHoraire', on_delete=models.CASCADE, related_name='+')
+    reservations_salles = models.PositiveIntegerField(default=0)
+    reservations_materiels = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.formation_id} - {self.date} {self.creneau_id} : {self.reservations_salles}/{self.reservations_materiels}"
+
+    class Meta:
+        unique_together = ['formation', 'date', 'creneau']
+
+
+class JetonCalendrier(models.Model):
+    """
+    Jeton longue durée des flux iCalendar d'un utilisateur. Les agendas ne
+    savent pas envoyer d'en-tête d'authentification : le jeton est passé dans
+    l'URL du flux, seul son condensat SHA-256 est conservé.
+    """
+    utilisateur = models.OneToOneField('User', on_delete=models.CASCADE, related_name='jeton_calendrier')
+    empreinte = models.CharField(max_length=64, unique=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Jeton calendrier de {self.utilisateur}"
+
+    @staticmethod
+    def condenser(jeton):
+        return hashlib.sha256(jeton.encode()).hexdigest()
+
+    @classmethod
+    def generer(cls, utilisateur):
+        """Crée ou remplace le jeton de l'utilisateur ; le jeton en clair n'est renvoyé qu'ici"""
+        jeton = secrets.token_urlsafe(32)
+        cls.objects.update_or_create(utilisateur=utilisateur, defaults={'empreinte': cls.condenser(jeton)})
+        return jeton
+
+
+class CompteurMatricule(models.Model):
+    """
+    Dernier numéro de matricule attribué par préfixe (ENS, ETU). Les
+    matricules sont réservés par plages : une écriture par lot d'inscriptions
+    au lieu d'un test d'existence par numéro essayé.
+    """
+    PREFIXES = {'enseignant': 'ENS', 'etudiant': 'ETU'}
+    CHIFFRES = 8
+
+    prefixe = models.CharField(max_length=3, primary_key=True)
+    dernier = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.prefixe} : {self.dernier}"
+
+    @classmethod
+    def formater(cls, prefixe, numero):
+        return f"{prefixe}{numero:0{cls.CHIFFRES}d}"
+
+    @classmethod
+    def plus_grand_numero(cls, prefixe):
+        """Numéro le plus élevé déjà utilisé, pour initialiser le compteur d'une base existante"""
+        maximum = User.objects.filter(
+            matricule__regex=rf'^{prefixe}[0-9]{{{cls.CHIFFRES}}}$'
+        ).aggregate(Max('matricule'))['matricule__max']
+        return int(maximum[len(prefixe):]) if maximum else 0
+
+    @classmethod
+    def reserver(cls, prefixe, nombre, exclure=()):
+        """
+        Réserve ``nombre`` numéros consécutifs (ligne du compteur verrouillée le
+        temps d'une mise à jour) et retourne les matricules correspondants. Les
+        numéros de la plage déjà pris comme matricule ou comme username (le
+        matricule sert de username par défaut), ou présents dans ``exclure``,
+        sont remplacés par une nouvelle réservation.
+        """
+        matricules = []
+        while len(matricules) < nombre:
+            manquants = nombre - len(matricules)
+            with transaction.atomic():
+                compteur, _ = cls.objects.select_for_update().get_or_create(
+                    prefixe=prefixe, defaults={'dernier': lambda: cls.plus_grand_numero(prefixe)}
+                )
+                debut = compteur.dernier + 1
+                compteur.dernier += manquants
+                compteur.save(update_fields=['dernier'])
+            candidats = [cls.formater(prefixe, numero) for numero in range(debut, debut + manquants)]
+            plage = (candidats[0], candidats[-1])
+            pris = set(exclure)
+            for matricule, username in User.objects.filter(
+                Q(matricule__range=plage) | Q(username__range=plage)
+            ).values_list('matricule', 'username'):
+                pris.update((matricule, username))
+            matricules.extend(matricule for matricule in candidats if matricule not in pris)
+        return matricules
@@ -0,0 +1,161 @@
+import threading
+import time
+from datetime import date as Date
+from django.conf import settings
+from core.models import ReservationSalle, ReservationMateriel
+
+
+class OccupancyIndex:
+    """
+    Index d'occupation en mémoire des salles et des matériels.
+
+    Pour chaque (ressource, date), un entier sert de masque de bits sur les
+    créneaux horaires : le bit ``creneau_id`` est à 1 si le créneau est réservé.
+    Les masques sont chargés paresseusement par fenêtres de dates (une requête
+    groupée par fenêtre manquante) puis tenus à jour par les signaux post_save /
+    post_delete des réservations (voir core/signals.py).
+
+    L'index est propre à chaque processus : une fenêtre est rechargée après
+    ``OCCUPANCY_INDEX_TTL`` secondes afin de borner l'écart avec les écritures
+    faites par d'autres processus. La contrainte unique_together reste la
+    garantie finale contre les doubles réservations.
+    """
+
+    SOURCES = {
+        'salle': (ReservationSalle, 'salle_id'),
+        'materiel': (ReservationMateriel, 'materiel_id'),
+    }
+
+    def __init__(self, window_days=None, ttl=None):
+        self.window_days = window_days or getattr(settings, 'OCCUPANCY_INDEX_WINDOW_DAYS', 14)
+        self.ttl = ttl if ttl is not None else getattr(settings, 'OCCUPANCY_INDEX_TTL', 60)
+        self._lock = threading.RLock()
+        # {type_ressource: {cle_fenetre: (charge_le, {(ressource_id, date): masque})}}
+        self._fenetres = {type_ressource: {} for type_ressource in self.SOURCES}
+
+    def _cle_fenetre(self, date):
+        return date.toordinal() // self.window_days
+
+    def _bornes_fenetre(self, cle):
+        debut = cle * self.window_days
+        return debut, debut + self.window_days - 1
+
+    def _est_valide(self, fenetre, maintenant):
+        return fenetre is not None and maintenant - fenetre[0] < self.ttl
+
+    def charger(self, type_ressource, date_debut, date_fin=None):
+        """Charge (en une seule requête) les fenêtres manquantes ou expirées couvrant la période"""
+        date_fin = date_fin or date_debut
+        fenetres = self._fenetres[type_ressource]
+        maintenant = time.monotonic()
+        cles = range(self._cle_fenetre(date_debut), self._cle_fenetre(date_fin) + 1)
+
+        with self._lock:
+            manquantes = [cle for cle in cles if not self._est_valide(fenetres.get(cle), maintenant)]
+            # Purger les fenêtres expirées pour que l'index ne grossisse pas indéfiniment
+            for cle in [cle for cle, fenetre in fenetres.items() if not self._est_valide(fenetre, maintenant)]:
+                del fenetres[cle]
+        if not manquantes:
+            return
+
+        premiere, derniere = min(manquantes), max(manquantes)
+        debut = Date.fromordinal(self._bornes_fenetre(premiere)[0])
+        fin = Date.fromordinal(self._bornes_fenetre(derniere)[1])
+
+        model, champ = self.SOURCES[type_ressource]
+        lignes = model.objects.filter(date__range=(debut, fin)).values_list(champ, 'date', 'creneau_id')
+
+        nouvelles = {cle: (maintenant, {}) for cle in range(premiere, derniere + 1)}
+        for ressource_id, date, creneau_id in lignes:
+            masques = nouvelles[self._cle_fenetre(date)][1]
+            masques[(ressource_id, date)] = masques.get((ressource_id, date), 0) | (1 << creneau_id)
+
+        with self._lock:
+            fenetres.update(nouvelles)
+
+    def masque(self, type_ressource, ressource_id, date):
+        """Retourne le masque des créneaux réservés d'une ressource pour une date"""
+        self.charger(type_ressource, date)
+        with self._lock:
+            fenetre = self._fenetres[type_ressource].get(self._cle_fenetre(date))
+            return fenetre[1].get((ressource_id, date), 0) if fenetre else 0
+
+    def est_disponible(self, type_ressource, ressource_id, date, creneau_id):
+        # Décaler le masque plutôt que construire 1 << creneau_id pour un identifiant arbitraire
+        return not (self.masque(type_ressource, ressource_id, date) >> creneau_id) & 1
+
+    def _modifier(self, type_ressource, ressource_id, date, creneau_id, reserve):
+        with self._lock:
+            fenetre = self._fenetres[type_ressource].get(self._cle_fenetre(date))
+            # Une fenêtre non chargée sera lue depuis la base au prochain accès
+            if fenetre is None:
+                return
+            masques = fenetre[1]
+            masque = masques.get((ressource_id, date), 0)
+            masque = masque | (1 << creneau_id) if reserve else masque & ~(1 << creneau_id)
+            if masque:
+                masques[(ressource_id, date)] = masque
+            else:
+                masques.pop((ressource_id, date), None)
+
+    def reserver(self, type_ressource, ressource_id, date, creneau_id):
+        self._modifier(type_ressource, ressource_id, date, creneau_id, True)
+
+    def liberer(self, type_ressource, ressource_id, date, creneau_id):
+        self._modifier(type_ressource, ressource_id, date, creneau_id, False)
+
+    def vider(self):
+        with self._lock:
+            for fenetres in self._fenetres.values():
+                fenetres.clear()
+
+
+occupancy_index = OccupancyIndex()
+
+
+def verifier_disponibilite(type_ressource, ressource_id, date, creneau_id):
+    """
+    Vérifie la disponibilité d'une ressource à partir de l'index.
+
+    Le cas « libre » ne touche pas la base une fois la fenêtre chargée ; le cas
+    « occupé » lit la réservation en conflit (une requête) pour construire le
+    message, et corrige l'index si la réservation a disparu entre-temps.
+    Retourne un tuple (disponible, conflit).
+    """
+    if occupancy_index.est_disponible(type_ressource, ressource_id, date, creneau_id):
+        return True, None
+
+    model, champ = OccupancyIndex.SOURCES[type_ressource]
+    conflit_reservation = model.objects.filter(
+        **{champ: ressource_id, 'date': date, 'creneau_id': creneau_id}
+    ).select_related('enseignant', 'formation').first()
+
+    if conflit_reservation is None:
+        occupancy_index.liberer(type_ressource, ressource_id, date, creneau_id)
+        return True, None
+
+    verbe = "Réservée" if type_ressource == 'salle' else "Réservé"
+    return False, f"{verbe} par {conflit_reservation.enseignant} pour {conflit_reservation.formation.nom}"
+
+
+def matrice_disponibilite(type_ressource, ressource_ids, dates, creneau_ids):
+    """
+    Construit la matrice de disponibilité de plusieurs ressources.
+
+    Les fenêtres couvrant toutes les dates sont chargées en une seule requête
+    groupée ; chaque cellule est ensuite lue dans l'index. Retourne
+    {ressource_id: ["1011", ...]} avec une chaîne par date et un caractère par
+    créneau (dans l'ordre de ``creneau_ids``) : '1' libre, '0' réservé.
+    """
+    if not ressource_ids or not dates:
+        return {}
+    occupancy_index.charger(type_ressource, min(dates), max(dates))
+
+    matrice = {}
+    for ressource_id in ressource_ids:
+        lignes = []
+        for date in dates:
+            masque = occupancy_index.masque(type_ressource, ressource_id, date)
+            lignes.append(''.join('0' if (masque >> creneau_id) & 1 else '1' for creneau_id in creneau_ids))
+        matrice[ressource_id] = lignes
+    return matrice
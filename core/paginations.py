@@ -1,4 +1,13 @@
-from rest_framework.pagination import PageNumberPagination
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import OrderedDict
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Q
+from drf_yasg import openapi
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 
 class StandardResultsSetPagination(PageNumberPagination):
     page_size = 20
@@ -8,4 +17,151 @@ class StandardResultsSetPagination(PageNumberPagination):
 class LargeResultsSetPagination(PageNumberPagination):
     page_size = 50
     page_size_query_param = 'page_size'
-    max_page_size = 200
\ No newline at end of file
+    max_page_size = 200
+
+
+class KeysetPagination(BasePagination):
+    """
+    Pagination par curseur sur un ordre composite (keyset).
+
+    Le curseur encode les valeurs de tri de la dernière ligne servie ; la page
+    suivante est lue par une comparaison lexicographique sur ces valeurs, sans
+    COUNT(*) ni OFFSET : le coût d'une page ne dépend pas de sa profondeur.
+    L'ordre doit être total, d'où l'identifiant en dernier critère.
+    """
+    ordering = ('-date', 'creneau__heure_debut', 'id')
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Curseur invalide'
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+            if page_size > 0:
+                return min(page_size, self.max_page_size)
+        except (KeyError, ValueError):
+            pass
+        return self.page_size
+
+    def encode_cursor(self, valeurs):
+        return urlsafe_b64encode(json.dumps(valeurs).encode()).decode()
+
+    @staticmethod
+    def champ_de_tri(model, champ):
+        """Champ de modèle désigné par un critère de tri, relations suivies (creneau__heure_debut)"""
+        *relations, nom = champ.lstrip('-').split('__')
+        for relation in relations:
+            model = model._meta.get_field(relation).related_model
+        return model._meta.get_field(nom)
+
+    def decode_cursor(self, request, model):
+        """Valeurs de tri du curseur, converties par leurs champs : un curseur altéré donne une 404"""
+        curseur = request.query_params.get(self.cursor_query_param)
+        if not curseur:
+            return None
+        try:
+            valeurs = json.loads(urlsafe_b64decode(curseur.encode()))
+            if not isinstance(valeurs, list) or len(valeurs) != len(self.ordering) or None in valeurs:
+                raise ValueError(curseur)
+            return [
+                self.champ_de_tri(model, champ).to_python(valeur) for champ, valeur in zip(self.ordering, valeurs)
+            ]
+        except (TypeError, ValueError, DjangoValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def filtre_apres(self, valeurs):
+        """(a, b, c) > (va, vb, vc) dans l'ordre de tri, développé en OR de préfixes égaux"""
+        filtre = Q()
+        egalites = {}
+        for champ, valeur in zip(self.ordering, valeurs):
+            nom = champ.lstrip('-')
+            comparaison = 'lt' if champ.startswith('-') else 'gt'
+            filtre |= Q(**egalites, **{f'{nom}__{comparaison}': valeur})
+            egalites[nom] = valeur
+        return filtre
+
+    def valeurs_position(self, instance):
+        valeurs = []
+        for champ in self.ordering:
+            valeur = instance
+            for attribut in champ.lstrip('-').split('__'):
+                valeur = getattr(valeur, attribut)
+            valeurs.append(valeur.isoformat() if hasattr(valeur, 'isoformat') else valeur)
+        return valeurs
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        page_size = self.get_page_size(request)
+        position = self.decode_cursor(request, queryset.model)
+
+        queryset = queryset.order_by(*self.ordering)
+        if position is not None:
+            queryset = queryset.filter(self.filtre_apres(position))
+
+        # Une ligne de plus pour savoir s'il existe une page suivante
+        lignes = list(queryset[:page_size + 1])
+        self.has_next = len(lignes) > page_size
+        self.page = lignes[:page_size]
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.valeurs_position(self.page[-1])))
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('results', data)
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+class ReservationPagination(LargeResultsSetPagination):
+    """
+    Pagination par numéro de page par défaut ; ?pagination=curseur (ou un
+    paramètre ?cursor=) bascule la requête sur KeysetPagination, adaptée au
+    défilement infini et aux synchronisations.
+    """
+    keyset_class = KeysetPagination
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = None
+        if request.query_params.get('pagination') == 'curseur' or self.keyset_class.cursor_query_param in request.query_params:
+            self.keyset = self.keyset_class()
+            return self.keyset.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+
+keyset_params = [
+    openapi.Parameter(
+        'pagination',
+        openapi.IN_QUERY,
+        description="'curseur' pour une pagination par curseur (sans COUNT ni OFFSET) au lieu des numéros de page",
+        type=openapi.TYPE_STRING,
+        enum=['curseur']
+    ),
+    openapi.Parameter(
+        'cursor',
+        openapi.IN_QUERY,
+        description="Curseur opaque renvoyé dans le lien 'next' d'une page précédente",
+        type=openapi.TYPE_STRING
+    ),
+]
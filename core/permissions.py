@@ -46,7 +46,7 @@ class IsOwnerOrReadOnly(permissions.BasePermission):
             return request.user and request.user.is_authenticated
 
         # Permissions d'écriture seulement pour le propriétaire
-        return obj.enseignant == request.user
+        return obj.enseignant_id == request.user.pk
 
 
 class IsResponsableFormationOrReadOnly(permissions.BasePermission):
@@ -72,11 +72,12 @@ class IsResponsableFormationOrReadOnly(permissions.BasePermission):
                     request.user.user_type == 'enseignant'
             )
 
-        # Écriture seulement pour le responsable de la formation
+        # Écriture seulement pour le responsable de la formation : responsable_id de la
+        # formation chargée avec l'objet (select_related), sans charger l'utilisateur
         return (
                 request.user and
                 request.user.is_authenticated and
-                obj.formation.responsable == request.user
+                obj.formation.responsable_id == request.user.pk
         )
 
 
@@ -121,5 +122,5 @@ class IsEnseignantOwner(permissions.BasePermission):
                 request.user and
                 request.user.is_authenticated and
                 request.user.user_type == 'enseignant' and
-                obj.enseignant == request.user
+                obj.enseignant_id == request.user.pk
         )
\ No newline at end of file
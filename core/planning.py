@@ -0,0 +1,183 @@
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from django.conf import settings
+from django.core.cache import cache
+from core.caching import version, incrementer_version, incrementer_compteur
+from core.conditionnel import etag
+from core.models import ReservationSalle, ReservationMateriel
+from core.referentiels import referentiel
+from core.serializers import ReservationSalleSerializer, ReservationMaterielSerializer
+from core.sideload import Inclusions, serialiser_a_plat
+
+MAX_JOURS_PLANNING = 31
+
+# Compteur incrémenté lorsque des données imbriquées dans tous les plannings changent
+VERSION_PLANNING = 'planning'
+# Compteur incrémenté à chaque enregistrement d'un utilisateur : les réponses qui
+# imbriquent enseignant_detail ou le nom d'un enseignant l'ajoutent à leur empreinte
+VERSION_UTILISATEURS = 'utilisateurs'
+CLE_HITS = 'planning:stats:hits'
+CLE_MISSES = 'planning:stats:misses'
+
+
+def construire_plannings(date_debut, date_fin, a_plat=False):
+    """
+    Construit le planning général de chaque jour de la période.
+
+    Une requête par modèle de réservation sur toute la période, un seul passage
+    de sérialisation, puis un regroupement en Python par (date, créneau) : le
+    nombre de requêtes ne dépend ni de la longueur de la période ni du nombre
+    de réservations. Retourne (instantanes, creneaux) où instantanes vaut
+    {date: {'planning': {nom_creneau: {'salle': [...], 'materiels': [...]}}}} ;
+    en mode à plat (sideload), chaque instantané porte aussi son ``included``.
+    """
+    # Salles, formations, créneaux et types viennent du cache des référentiels : pas de jointure
+    creneaux = list(referentiel('creneaux').values())
+
+    reservations_salles = list(ReservationSalle.objects.filter(
+        date__range=(date_debut, date_fin)
+    ).select_related('enseignant'))
+    reservations_materiels = list(ReservationMateriel.objects.filter(
+        date__range=(date_debut, date_fin)
+    ).select_related('materiel', 'enseignant'))
+
+    if a_plat:
+        donnees_salles = serialiser_a_plat(reservations_salles)
+        donnees_materiels = serialiser_a_plat(reservations_materiels)
+    else:
+        donnees_salles = ReservationSalleSerializer(reservations_salles, many=True).data
+        donnees_materiels = ReservationMaterielSerializer(reservations_materiels, many=True).data
+
+    cellules = defaultdict(lambda: {'salle': [], 'materiels': []})
+    reservations_par_jour = defaultdict(list)
+    for reservation, donnees in zip(reservations_salles, donnees_salles):
+        cellules[(reservation.date, reservation.creneau_id)]['salle'].append(donnees)
+        reservations_par_jour[reservation.date].append(reservation)
+    for reservation, donnees in zip(reservations_materiels, donnees_materiels):
+        cellules[(reservation.date, reservation.creneau_id)]['materiels'].append(donnees)
+        reservations_par_jour[reservation.date].append(reservation)
+
+    instantanes = {}
+    jour = date_debut
+    while jour <= date_fin:
+        instantanes[jour] = {'planning': {
+            creneau['nom']: cellules.get((jour, creneau['id']), {'salle': [], 'materiels': []})
+            for creneau in creneaux
+        }}
+        if a_plat:
+            # Objets déjà chargés (select_related) ou référentiels : aucune requête supplémentaire
+            inclusions = Inclusions()
+            inclusions.ajouter(reservations_par_jour.get(jour, []))
+            instantanes[jour]['included'] = inclusions.serialiser()
+        jour += timedelta(days=1)
+
+    return instantanes, creneaux
+
+
+def _cle_instantane(jour, generation, a_plat=False):
+    return f"planning:jour:{'plat' if a_plat else 'complet'}:{jour.isoformat()}:{generation}"
+
+
+def _cle_invalidation(jour):
+    # Marque de la dernière invalidation d'un jour, comparée avant et après une construction
+    return f"planning:invalidation:{jour.isoformat()}"
+
+
+def plannings_en_cache(date_debut, date_fin, a_plat=False):
+    """
+    Variante de construire_plannings servie depuis le cache Django.
+
+    Chaque jour est mis en cache séparément ; les jours absents sont
+    reconstruits ensemble (une seule construction, nombre de requêtes borné)
+    puis enregistrés. Les compteurs de hits/misses sont tenus par jour.
+    """
+    generation = version(VERSION_PLANNING)
+    jours = [date_debut + timedelta(days=i) for i in range((date_fin - date_debut).days + 1)]
+    cles = {jour: _cle_instantane(jour, generation, a_plat) for jour in jours}
+    cle_creneaux = f'planning:creneaux:{generation}'
+
+    trouves = cache.get_many(list(cles.values()) + [cle_creneaux])
+    instantanes = {jour: trouves[cle] for jour, cle in cles.items() if cle in trouves}
+    creneaux = trouves.get(cle_creneaux)
+    manquants = [jour for jour in jours if jour not in instantanes]
+
+    incrementer_compteur(CLE_HITS, len(instantanes))
+    incrementer_compteur(CLE_MISSES, len(manquants))
+
+    if manquants or creneaux is None:
+        debut, fin = (min(manquants), max(manquants)) if manquants else (date_debut, date_debut)
+        cles_invalidation = [_cle_invalidation(jour) for jour in manquants]
+        invalidations = cache.get_many(cles_invalidation)
+        construits, creneaux = construire_plannings(debut, fin, a_plat)
+
+        # Une écriture validée pendant la construction a pu invalider ce qui vient d'être lu :
+        # ne pas enregistrer ces jours (ni rien si tous les plannings ont été invalidés)
+        if version(VERSION_PLANNING) == generation:
+            invalides = {
+                cle for cle, valeur in cache.get_many(cles_invalidation).items() if invalidations.get(cle) != valeur
+            }
+            a_enregistrer = {
+                cles[jour]: construits[jour] for jour in manquants if _cle_invalidation(jour) not in invalides
+            }
+            a_enregistrer[cle_creneaux] = creneaux
+            cache.set_many(a_enregistrer, timeout=getattr(settings, 'PLANNING_CACHE_TIMEOUT', 3600))
+        instantanes.update((jour, construits[jour]) for jour in manquants)
+
+    return {jour: instantanes[jour] for jour in jours}, creneaux
+
+
+def _cle_revision(jour, generation):
+    return f"planning:revision:{jour.isoformat()}:{generation}"
+
+
+def validateurs_plannings(date_debut, date_fin):
+    """
+    ETag et Last-Modified du planning général de la période, sans requête SQL.
+
+    Chaque jour porte une révision (horodatage en nanosecondes) créée à la
+    première lecture et supprimée avec ses instantanés : tant qu'aucune
+    réservation du jour ne change, la révision, donc l'ETag, reste la même.
+    Retourne (etag, last_modified).
+    """
+    generation = version(VERSION_PLANNING)
+    jours = [date_debut + timedelta(days=i) for i in range((date_fin - date_debut).days + 1)]
+    cles = [_cle_revision(jour, generation) for jour in jours]
+    revisions = cache.get_many(cles)
+    manquantes = [cle for cle in cles if cle not in revisions]
+    if manquantes:
+        maintenant = time.time_ns()
+        for cle in manquantes:
+            cache.add(cle, maintenant, timeout=getattr(settings, 'PLANNING_CACHE_TIMEOUT', 3600))
+        # Relire : un autre processus a pu créer la révision entre-temps
+        revisions.update(cache.get_many(manquantes))
+    valeurs = [revisions.get(cle, 0) for cle in cles]
+    dernier = datetime.fromtimestamp(max(valeurs) / 1e9, tz=timezone.utc)
+    return etag(generation, date_debut, date_fin, *valeurs), dernier
+
+
+def invalider_plannings(*jours):
+    """Supprime les instantanés des jours donnés (réservation créée, modifiée ou supprimée)"""
+    generation = version(VERSION_PLANNING)
+    jours = {jour for jour in jours if jour}
+    cache.set_many({_cle_invalidation(jour): time.time_ns() for jour in jours},
+                   timeout=getattr(settings, 'PLANNING_CACHE_TIMEOUT', 3600))
+    cache.delete_many([
+        _cle_instantane(jour, generation, a_plat)
+        for jour in jours for a_plat in (False, True)
+    ] + [_cle_revision(jour, generation) for jour in jours])
+
+
+def invalider_tous_les_plannings():
+    """Rend obsolètes tous les instantanés (salle, matériel, créneau... modifié)"""
+    incrementer_version(VERSION_PLANNING)
+
+
+def statistiques_cache_plannings():
+    valeurs = cache.get_many([CLE_HITS, CLE_MISSES])
+    hits, misses = valeurs.get(CLE_HITS, 0), valeurs.get(CLE_MISSES, 0)
+    return {
+        'hits': hits,
+        'misses': misses,
+        'ratio': round(hits / (hits + misses), 4) if hits + misses else None
+    }
@@ -0,0 +1,123 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.module_loading import import_string
+from rest_framework import serializers
+from rest_framework.response import Response
+from core.caching import version, incrementer_version
+from core.models import Salle, CreneauHoraire, TypeMateriel, Formation
+from core.utils import annoter_comptes_materiels
+
+# Référentiel -> (queryset, serializer de sa représentation imbriquée). Les
+# serializers sont résolus à la construction : core.serializers utilise
+# ReferentielField et ne peut pas être importé ici.
+REFERENTIELS = {
+    'salles': (lambda: Salle.objects.all(), 'core.serializers.SalleSerializer'),
+    'creneaux': (lambda: CreneauHoraire.objects.all(), 'core.serializers.CreneauHoraireSerializer'),
+    'types_materiel': (lambda: annoter_comptes_materiels(TypeMateriel.objects.order_by('nom')),
+                       'core.serializers.TypeMaterielSerializer'),
+    'formations': (lambda: Formation.objects.select_related('responsable'), 'core.serializers.FormationSerializer'),
+}
+
+# Copie locale au processus : {référentiel: (version, données)}
+_l1 = {}
+
+
+def _nom_version(nom):
+    return f'referentiel:{nom}'
+
+
+def construire_referentiel(nom):
+    """{pk: représentation sérialisée}, dans l'ordre par défaut du modèle"""
+    queryset, serializer = REFERENTIELS[nom]
+    instances = list(queryset())
+    return {
+        instance.pk: donnees
+        for instance, donnees in zip(instances, import_string(serializer)(instances, many=True).data)
+    }
+
+
+def referentiel(nom):
+    """
+    Données d'un référentiel ({pk: représentation}).
+
+    Trois niveaux : la copie locale au processus tant que la version n'a pas
+    changé (une lecture du compteur, aucune désérialisation), puis le cache
+    Django partagé entre processus, puis la base. Le compteur est incrémenté
+    par les signaux à chaque écriture sur le modèle (voir core/signals.py) ;
+    les versions abandonnées expirent après REFERENTIELS_CACHE_TIMEOUT secondes.
+    """
+    generation = version(_nom_version(nom))
+    local = _l1.get(nom)
+    if local is not None and local[0] == generation:
+        return local[1]
+
+    cle = f'referentiel:{nom}:{generation}'
+    donnees = cache.get(cle)
+    if donnees is None:
+        donnees = construire_referentiel(nom)
+        cache.set(cle, donnees, timeout=getattr(settings, 'REFERENTIELS_CACHE_TIMEOUT', 60 * 60))
+    _l1[nom] = (generation, donnees)
+    return donnees
+
+
+def invalider_referentiel(nom):
+    incrementer_version(_nom_version(nom))
+    _l1.pop(nom, None)
+
+
+def detail_referentiel(nom, pk):
+    """
+    Représentation d'un objet. Un objet absent du référentiel (créé dans la
+    transaction en cours, ou par une écriture sans signal) est lu et
+    sérialisé seul, sans toucher au cache partagé : une ligne non validée
+    n'est jamais publiée aux autres processus.
+    """
+    donnees = referentiel(nom)
+    if pk in donnees:
+        return donnees[pk]
+    queryset, serializer = REFERENTIELS[nom]
+    instance = queryset().filter(pk=pk).first()
+    return None if instance is None else import_string(serializer)(instance).data
+
+
+class ReferentielField(serializers.Field):
+    """
+    Détail imbriqué en lecture seule d'un objet de référence, lu dans le
+    cache des référentiels à partir de la clé étrangère : aucune jointure
+    ni sérialisation par ligne. ``source`` désigne l'identifiant
+    (``salle_id``...).
+    """
+
+    def __init__(self, nom, **kwargs):
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+        self.nom = nom
+
+    def to_representation(self, pk):
+        # Une lecture du référentiel par serializer, partagée par toutes les lignes (many=True)
+        donnees = getattr(self, '_donnees', None)
+        if donnees is None or pk not in donnees:
+            self._donnees = donnees = referentiel(self.nom)
+            if pk not in donnees:
+                return detail_referentiel(self.nom, pk)
+        return donnees[pk]
+
+
+class ListeReferentielMixin:
+    """
+    Sert l'action ``list`` d'un viewset depuis le cache des référentiels :
+    aucune requête SQL tant que le référentiel n'a pas changé. La pagination
+    éventuelle s'applique à la liste en mémoire. Les autres actions passent
+    par le queryset.
+    """
+    nom_referentiel = None
+
+    def filtrer_referentiel(self, donnees):
+        return donnees
+
+    def list(self, request, *args, **kwargs):
+        donnees = self.filtrer_referentiel(list(referentiel(self.nom_referentiel).values()))
+        page = self.paginate_queryset(donnees)
+        if page is not None:
+            return self.get_paginated_response(page)
+        return Response(donnees)
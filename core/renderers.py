@@ -0,0 +1,59 @@
+import io
+import orjson
+from django.conf import settings
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+# Les dates, heures et types inconnus d'orjson (Decimal, chaînes paresseuses,
+# tableaux NumPy...) passent par l'encodeur de DRF : même représentation
+OPTIONS_ORJSON = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer sérialisé par orjson, au même format que celui de DRF (JSON
+    compact, UTF-8). Les rendus indentés (API navigable,
+    ``Accept: application/json; indent=4``), les réglages UNICODE_JSON /
+    COMPACT_JSON désactivés et les valeurs refusées par orjson (entiers de
+    plus de 64 bits) sont délégués à DRF.
+
+    Les octets sont identiques sauf pour les flottants, absents des modèles :
+    exposant sans signe ni zéro de tête (``1e16``, ``1e-7`` au lieu de
+    ``1e+16``, ``1e-07``, même valeur une fois décodée) et NaN ou infinis
+    rendus ``null`` là où DRF lève ValueError. Les détecter imposerait de
+    parcourir chaque réponse, ce qui annule le gain du rendu.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+
+        if (self.ensure_ascii or not self.compact
+                or self.get_indent(accepted_media_type, renderer_context or {}) is not None):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            contenu = orjson.dumps(data, default=self.encoder_class().default, option=OPTIONS_ORJSON)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        # Comme DRF : U+2028 et U+2029 échappés pour rester un sous-ensemble strict de JavaScript
+        if b'\xe2\x80\xa8' in contenu or b'\xe2\x80\xa9' in contenu:
+            contenu = contenu.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return contenu
+
+
+class ORJSONParser(JSONParser):
+    """JSONParser décodé par orjson ; les corps invalides sont confiés à DRF pour un message d'erreur identique"""
+    renderer_class = ORJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        contenu = stream.read()
+        try:
+            if encoding.lower().replace('-', '') != 'utf8':
+                return orjson.loads(contenu.decode(encoding))
+            return orjson.loads(contenu)
+        except (orjson.JSONDecodeError, UnicodeDecodeError):
+            return super().parse(io.BytesIO(contenu), media_type, parser_context)
@@ -0,0 +1,142 @@
+from collections import Counter, defaultdict
+from functools import reduce
+from operator import or_
+from django.db import transaction
+from django.db.models import Case, Count, F, Q, Value, When
+from core.models import (
+    ReservationSalle, ReservationMateriel,
+    OccupationSalle, OccupationMateriel, OccupationFormation
+)
+
+# Modèle de réservation -> [(agrégat, champs de la clé de l'agrégat, compteur)]
+AGREGATS = {
+    ReservationSalle: [
+        (OccupationSalle, ('salle_id', 'date'), 'nombre'),
+        (OccupationFormation, ('formation_id', 'date', 'creneau_id'), 'reservations_salles'),
+    ],
+    ReservationMateriel: [
+        (OccupationMateriel, ('materiel_id', 'date'), 'nombre'),
+        (OccupationFormation, ('formation_id', 'date', 'creneau_id'), 'reservations_materiels'),
+    ],
+}
+
+# Agrégat -> champs de sa clé, et -> compteurs qu'il porte
+CLES = {}
+COMPTEURS = defaultdict(list)
+for _agregats in AGREGATS.values():
+    for _agregat, _champs, _compteur in _agregats:
+        CLES[_agregat] = _champs
+        COMPTEURS[_agregat].append(_compteur)
+
+
+# Clés par requête d'incrément (borne le nombre de paramètres et la profondeur du WHERE)
+TAILLE_LOT_AGREGATS = 250
+
+
+def _incrementer(agregat, compteur, cles, delta):
+    """
+    Ajoute ``delta`` au compteur des lignes ``cles`` par un UPDATE ... SET
+    compteur = compteur + delta, sûr face aux écritures concurrentes. Les
+    lignes manquantes sont d'abord créées à zéro (INSERT ignorant les
+    conflits) ; une ligne unique déjà présente ne coûte qu'une requête. Un
+    décrément ne descend pas sous zéro, même sur une ligne qui a dérivé, et
+    n'est pas appliqué à une ligne absente.
+    """
+    champs = CLES[agregat]
+    if delta < 0:
+        # Borné à zéro sans GREATEST(compteur - n, 0) : un entier non signé (MySQL) ne passe pas par le négatif
+        valeur = Case(When(**{f'{compteur}__gte': -delta}, then=F(compteur) + delta), default=Value(0))
+    else:
+        valeur = F(compteur) + delta
+    for debut in range(0, len(cles), TAILLE_LOT_AGREGATS):
+        lot = cles[debut:debut + TAILLE_LOT_AGREGATS]
+        lignes = agregat.objects.filter(reduce(or_, (Q(**dict(zip(champs, cle))) for cle in lot)))
+        if delta < 0:
+            lignes.update(**{compteur: valeur})
+        elif len(lot) > 1 or not lignes.update(**{compteur: valeur}):
+            agregat.objects.bulk_create([agregat(**dict(zip(champs, cle))) for cle in lot], ignore_conflicts=True)
+            lignes.update(**{compteur: valeur})
+
+
+def ajuster(model, variations):
+    """
+    Répercute des ajouts (delta=1) et retraits (delta=-1) de réservations sur
+    leurs agrégats, dans la transaction de l'écriture. ``variations`` est une
+    liste de (valeurs, delta), où ``valeurs`` porte les identifiants de la
+    réservation (ressource, formation_id, date, creneau_id). Les deltas sont
+    sommés par ligne puis appliqués par valeur de delta (voir _incrementer).
+    """
+    for agregat, champs, compteur in AGREGATS[model]:
+        deltas = Counter()
+        for valeurs, delta in variations:
+            deltas[tuple(valeurs[champ] for champ in champs)] += delta
+
+        par_delta = defaultdict(list)
+        for cle, delta in deltas.items():
+            if delta:
+                par_delta[delta].append(cle)
+        for delta, cles in par_delta.items():
+            _incrementer(agregat, compteur, cles, delta)
+
+
+def ajouter_en_masse(model, instances):
+    """Version groupée de ajuster pour un lot de réservations créées (une requête par table d'agrégat)"""
+    champs = {champ for _, cle, _ in AGREGATS[model] for champ in cle}
+    ajuster(model, [({champ: getattr(instance, champ) for champ in champs}, 1) for instance in instances])
+
+
+def _periode(date_debut, date_fin):
+    periode = {}
+    if date_debut:
+        periode['date__gte'] = date_debut
+    if date_fin:
+        periode['date__lte'] = date_fin
+    return periode
+
+
+def calculer(date_debut=None, date_fin=None):
+    """
+    Calcule les agrégats attendus depuis les tables de réservations, en une
+    requête GROUP BY par agrégat. Retourne {agrégat: {clé: {compteur: valeur}}}.
+    """
+    periode = _periode(date_debut, date_fin)
+    attendus = {agregat: {} for agregat in CLES}
+    for model, agregats in AGREGATS.items():
+        for agregat, champs, compteur in agregats:
+            comptes = model.objects.filter(**periode).order_by().values_list(*champs).annotate(n=Count('id'))
+            for *cle, nombre in comptes.iterator():
+                attendus[agregat].setdefault(tuple(cle), {})[compteur] = nombre
+    return attendus
+
+
+def reconstruire(date_debut=None, date_fin=None, batch_size=1000):
+    """
+    Remplace les agrégats de la période (toute l'historique par défaut) par
+    leur recalcul. Retourne le nombre de lignes écrites par agrégat.
+    """
+    periode = _periode(date_debut, date_fin)
+    attendus = calculer(date_debut, date_fin)
+    with transaction.atomic():
+        for agregat, lignes in attendus.items():
+            agregat.objects.filter(**periode).delete()
+            agregat.objects.bulk_create([
+                agregat(**dict(zip(CLES[agregat], cle)), **compteurs) for cle, compteurs in lignes.items()
+            ], batch_size=batch_size)
+    return {agregat.__name__: len(lignes) for agregat, lignes in attendus.items()}
+
+
+def verifier(date_debut=None, date_fin=None):
+    """Compte, par agrégat, les lignes qui s'écartent du recalcul (les compteurs à zéro sont ignorés)"""
+    periode = _periode(date_debut, date_fin)
+    ecarts = {}
+    for agregat, attendues in calculer(date_debut, date_fin).items():
+        champs, compteurs = CLES[agregat], COMPTEURS[agregat]
+        actuelles = {}
+        for ligne in agregat.objects.filter(**periode).values_list(*champs, *compteurs).iterator():
+            valeurs = {compteur: valeur for compteur, valeur in zip(compteurs, ligne[len(champs):]) if valeur}
+            if valeurs:
+                actuelles[tuple(ligne[:len(champs)])] = valeurs
+        ecarts[agregat.__name__] = sum(
+            1 for cle in attendues.keys() | actuelles.keys() if attendues.get(cle) != actuelles.get(cle)
+        )
+    return ecarts
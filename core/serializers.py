@@ -1,11 +1,19 @@
 from rest_framework import serializers
+from rest_framework.exceptions import Throttled
+from rest_framework.throttling import BaseThrottle
 from django.contrib.auth import get_user_model
+from django.db import IntegrityError, transaction
+from django.db.models import Q
 from django.utils import timezone
+from datetime import timedelta
 from django.contrib.auth.password_validation import validate_password
 from .models import (
     Formation, Salle, TypeMateriel, Materiel, CreneauHoraire,
     ReservationSalle, ReservationMateriel, RecapitulatifHoraire
 )
+from .authentication import connexion_bloquee, enregistrer_echec_connexion, reinitialiser_echecs_connexion
+from .exceptions import ConflitReservation
+from .referentiels import ReferentielField
 
 User = get_user_model()
 
@@ -33,14 +41,31 @@ class LoginSerializer(serializers.Serializer):
     identifier = serializers.CharField()
     password = serializers.CharField()
 
+    @staticmethod
+    def trouver_utilisateur(identifier):
+        """Compte désigné par son email ou son matricule, en une requête sur les deux index ; l'email l'emporte"""
+        candidats = User.objects.filter(Q(email=identifier) | Q(matricule=identifier))
+        return min(candidats, key=lambda candidat: (candidat.email != identifier, candidat.pk), default=None)
+
     def validate(self, data):
         identifier = data.get('identifier')
         password = data.get('password')
-
-        user = User.objects.filter(email=identifier).first() or User.objects.filter(matricule=identifier).first()
-
-        if user and user.check_password(password):
+        # Adresse du client telle que la voient les throttles de DRF (NUM_PROXIES)
+        request = self.context.get('request')
+        adresse = BaseThrottle().get_ident(request) if request is not None else None
+
+        # Identifiant bloqué depuis cette adresse : refus sans lecture ni hachage
+        if connexion_bloquee(identifier, adresse):
+            raise Throttled(detail="Trop de tentatives de connexion échouées, réessayez plus tard")
+
+        user = self.trouver_utilisateur(identifier)
+        if user is None:
+            # Hachage à perte : un identifiant inconnu répond dans le même délai qu'un mot de passe faux
+            User().set_password(password)
+        elif user.check_password(password):
+            reinitialiser_echecs_connexion(identifier, adresse)
             return user
+        enregistrer_echec_connexion(identifier, adresse)
         raise serializers.ValidationError("Identifiants invalides")
 
 class PasswordResetSerializer(serializers.Serializer):
@@ -52,6 +77,13 @@ class PasswordResetSerializer(serializers.Serializer):
         return value
 
 
+class ImportUtilisateursSerializer(serializers.Serializer):
+    """Roster CSV à importer (voir core/importation.py)"""
+    fichier = serializers.FileField()
+    user_type = serializers.ChoiceField(choices=User.USER_TYPE_CHOICES, required=False,
+                                        help_text="Type des comptes dont la colonne 'type' est vide")
+
+
 class FormationSerializer(serializers.ModelSerializer):
     responsable_detail = UserSerializer(source='responsable', read_only=True)
 
@@ -61,6 +93,14 @@ class FormationSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at']
 
 
+class FormationFlatSerializer(FormationSerializer):
+    """Formation sans responsable imbriqué (mode sideload)"""
+    responsable_detail = None
+
+    class Meta(FormationSerializer.Meta):
+        fields = ['id', 'nom', 'description', 'responsable', 'created_at']
+
+
 class SalleSerializer(serializers.ModelSerializer):
     class Meta:
         model = Salle
@@ -68,6 +108,41 @@ class SalleSerializer(serializers.ModelSerializer):
         read_only_fields = ['id']
 
 
+class SalleLibreSerializer(SalleSerializer):
+    ecart_capacite = serializers.IntegerField(read_only=True)
+
+    class Meta(SalleSerializer.Meta):
+        fields = SalleSerializer.Meta.fields + ['ecart_capacite']
+
+
+class RechercheSalleLibreSerializer(serializers.Serializer):
+    """Paramètres de recherche des salles libres"""
+    MAX_JOURS = 31
+
+    capacite = serializers.IntegerField(min_value=0, required=False, default=0)
+    equipements = serializers.CharField(required=False, allow_blank=True, default='')
+    date_debut = serializers.DateField()
+    date_fin = serializers.DateField(required=False)
+    creneaux = serializers.CharField(required=False, allow_blank=True, default='')
+
+    def validate_equipements(self, value):
+        return [mot.strip() for mot in value.split(',') if mot.strip()]
+
+    def validate_creneaux(self, value):
+        try:
+            return [int(creneau) for creneau in value.split(',') if creneau.strip()]
+        except ValueError:
+            raise serializers.ValidationError("Liste d'identifiants de créneaux invalide (ex: 1,2)")
+
+    def validate(self, data):
+        data['date_fin'] = data.get('date_fin') or data['date_debut']
+        if data['date_fin'] < data['date_debut']:
+            raise serializers.ValidationError("date_debut doit précéder date_fin")
+        if (data['date_fin'] - data['date_debut']).days >= self.MAX_JOURS:
+            raise serializers.ValidationError({'date_fin': f"La période ne peut pas dépasser {self.MAX_JOURS} jours"})
+        return data
+
+
 class TypeMaterielSerializer(serializers.ModelSerializer):
     materiels_count = serializers.SerializerMethodField()
 
@@ -77,11 +152,14 @@ class TypeMaterielSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'materiels_count']
 
     def get_materiels_count(self, obj):
+        # Compte annoté par le queryset (TypeMaterielViewSet, référentiel des types)
+        if hasattr(obj, 'materiels_actifs'):
+            return obj.materiels_actifs
         return obj.materiels.filter(active=True).count()
 
 
 class MaterielSerializer(serializers.ModelSerializer):
-    type_materiel_detail = TypeMaterielSerializer(source='type_materiel', read_only=True)
+    type_materiel_detail = ReferentielField('types_materiel', source='type_materiel_id')
 
     class Meta:
         model = Materiel
@@ -89,6 +167,14 @@ class MaterielSerializer(serializers.ModelSerializer):
         read_only_fields = ['id']
 
 
+class MaterielFlatSerializer(MaterielSerializer):
+    """Matériel sans type imbriqué (mode sideload)"""
+    type_materiel_detail = None
+
+    class Meta(MaterielSerializer.Meta):
+        fields = ['id', 'nom', 'type_materiel', 'numero_serie', 'active']
+
+
 class CreneauHoraireSerializer(serializers.ModelSerializer):
     class Meta:
         model = CreneauHoraire
@@ -96,11 +182,65 @@ class CreneauHoraireSerializer(serializers.ModelSerializer):
         read_only_fields = ['id']
 
 
-class ReservationSalleSerializer(serializers.ModelSerializer):
+class EcritureReservationMixin:
+    """
+    Écriture d'une réservation arbitrée par la contrainte unique_together.
+
+    Ni vérification préalable ni UniqueTogetherValidator : l'insertion est
+    tentée dans un bloc atomique et une violation d'unicité devient une
+    ConflitReservation (409) décrivant la réservation en place. Deux demandes
+    simultanées pour la même cellule ne peuvent donc pas passer toutes les deux.
+    """
+    champ_ressource = None
+    message_conflit = "La ressource {} est déjà réservée pour ce créneau"
+
+    def create(self, validated_data):
+        try:
+            with transaction.atomic():
+                return super().create(validated_data)
+        except IntegrityError:
+            conflit = self.conflit(validated_data)
+            if conflit is None:
+                raise
+            raise conflit
+
+    def update(self, instance, validated_data):
+        cellule = {champ: getattr(instance, champ) for champ in (self.champ_ressource, 'date', 'creneau')}
+        try:
+            with transaction.atomic():
+                return super().update(instance, validated_data)
+        except IntegrityError:
+            conflit = self.conflit({**cellule, **validated_data}, exclure=instance.pk)
+            if conflit is None:
+                raise
+            raise conflit
+
+    def conflit(self, donnees, exclure=None):
+        """Décrit la réservation qui occupe la cellule, ou None si la violation vient d'une autre contrainte"""
+        ressource = donnees[self.champ_ressource]
+        reservation = self.Meta.model.objects.filter(
+            **{self.champ_ressource: ressource, 'date': donnees['date'], 'creneau': donnees['creneau']}
+        ).exclude(pk=exclure).select_related('enseignant', 'formation').first()
+        if reservation is None:
+            return None
+        return ConflitReservation(self.message_conflit.format(ressource.nom), conflit={
+            'id': reservation.pk,
+            'enseignant': str(reservation.enseignant),
+            'formation': reservation.formation.nom,
+            'date': reservation.date,
+            'creneau': reservation.creneau_id,
+        })
+
+
+class ReservationSalleSerializer(EcritureReservationMixin, serializers.ModelSerializer):
+    formation = serializers.PrimaryKeyRelatedField(queryset=Formation.objects.all())
     enseignant_detail = UserSerializer(source='enseignant', read_only=True)
-    salle_detail = SalleSerializer(source='salle', read_only=True)
-    formation_detail = FormationSerializer(source='formation', read_only=True)
-    creneau_detail = CreneauHoraireSerializer(source='creneau', read_only=True)
+    salle_detail = ReferentielField('salles', source='salle_id')
+    formation_detail = ReferentielField('formations', source='formation_id')
+    creneau_detail = ReferentielField('creneaux', source='creneau_id')
+
+    champ_ressource = 'salle'
+    message_conflit = "La salle {} est déjà réservée pour ce créneau"
 
     class Meta:
         model = ReservationSalle
@@ -110,41 +250,25 @@ class ReservationSalleSerializer(serializers.ModelSerializer):
             'date', 'sujet', 'commentaires', 'created_at', 'updated_at'
         ]
         read_only_fields = ['id', 'created_at', 'updated_at']
+        # L'unicité (salle, date, créneau) est garantie par la base, voir EcritureReservationMixin
+        validators = []
 
     def validate_date(self, value):
         if value < timezone.now().date():
             raise serializers.ValidationError("Impossible de réserver une salle pour une date passée")
         return value
 
-    def validate(self, data):
-        # Vérifier les conflits de réservation
-        salle = data.get('salle')
-        date = data.get('date')
-        creneau = data.get('creneau')
-
-        if salle and date and creneau:
-            conflits = ReservationSalle.objects.filter(
-                salle=salle,
-                date=date,
-                creneau=creneau
-            )
-
-            # Exclure l'instance actuelle lors de la mise à jour
-            if self.instance:
-                conflits = conflits.exclude(pk=self.instance.pk)
-
-            if conflits.exists():
-                raise serializers.ValidationError({
-                    'non_field_errors': [f"La salle {salle.nom} est déjà réservée pour ce créneau"]
-                })
-        return data
-
 
-class ReservationMaterielSerializer(serializers.ModelSerializer):
+class ReservationMaterielSerializer(EcritureReservationMixin, serializers.ModelSerializer):
+    materiel = serializers.PrimaryKeyRelatedField(queryset=Materiel.objects.all())
+    formation = serializers.PrimaryKeyRelatedField(queryset=Formation.objects.all())
     enseignant_detail = UserSerializer(source='enseignant', read_only=True)
     materiel_detail = MaterielSerializer(source='materiel', read_only=True)
-    formation_detail = FormationSerializer(source='formation', read_only=True)
-    creneau_detail = CreneauHoraireSerializer(source='creneau', read_only=True)
+    formation_detail = ReferentielField('formations', source='formation_id')
+    creneau_detail = ReferentielField('creneaux', source='creneau_id')
+
+    champ_ressource = 'materiel'
+    message_conflit = "Le matériel {} est déjà réservé pour ce créneau"
 
     class Meta:
         model = ReservationMateriel
@@ -154,42 +278,87 @@ class ReservationMaterielSerializer(serializers.ModelSerializer):
             'date', 'commentaires', 'created_at', 'updated_at'
         ]
         read_only_fields = ['id', 'created_at', 'updated_at']
+        # L'unicité (matériel, date, créneau) est garantie par la base, voir EcritureReservationMixin
+        validators = []
 
     def validate_date(self, value):
         if value < timezone.now().date():
             raise serializers.ValidationError("Impossible de réserver du matériel pour une date passée")
         return value
 
-    def validate(self, data):
-        # Vérifier les conflits de réservation
-        materiel = data.get('materiel')
-        date = data.get('date')
-        creneau = data.get('creneau')
-
-        if materiel and date and creneau:
-            conflits = ReservationMateriel.objects.filter(
-                materiel=materiel,
-                date=date,
-                creneau=creneau
-            )
-
-            # Exclure l'instance actuelle lors de la mise à jour
-            if self.instance:
-                conflits = conflits.exclude(pk=self.instance.pk)
-
-            if conflits.exists():
-                raise serializers.ValidationError({
-                    'non_field_errors': [f"Le matériel {materiel.nom} est déjà réservé pour ce créneau"]
-                })
 
-        return data
+class ReservationSalleFlatSerializer(ReservationSalleSerializer):
+    """Réservation de salle ne portant que les identifiants des objets liés (mode sideload)"""
+    enseignant_detail = None
+    salle_detail = None
+    formation_detail = None
+    creneau_detail = None
+
+    class Meta(ReservationSalleSerializer.Meta):
+        fields = [
+            'id', 'enseignant', 'salle', 'formation', 'creneau',
+            'date', 'sujet', 'commentaires', 'created_at', 'updated_at'
+        ]
+
+
+class ReservationMaterielFlatSerializer(ReservationMaterielSerializer):
+    """Réservation de matériel ne portant que les identifiants des objets liés (mode sideload)"""
+    enseignant_detail = None
+    materiel_detail = None
+    formation_detail = None
+    creneau_detail = None
+
+    class Meta(ReservationMaterielSerializer.Meta):
+        fields = [
+            'id', 'enseignant', 'materiel', 'formation', 'creneau',
+            'date', 'commentaires', 'created_at', 'updated_at'
+        ]
+
+
+class ReservationSalleEnMasseSerializer(serializers.Serializer):
+    """Élément d'une création de réservations de salles en masse (identifiants résolus par lot)"""
+    salle = serializers.IntegerField(min_value=1)
+    formation = serializers.IntegerField(min_value=1)
+    creneau = serializers.IntegerField(min_value=1)
+    date = serializers.DateField()
+    sujet = serializers.CharField(max_length=200, required=False, allow_null=True, allow_blank=True)
+    commentaires = serializers.CharField(required=False, allow_null=True, allow_blank=True)
+
+    def validate_date(self, value):
+        if value < timezone.now().date():
+            raise serializers.ValidationError("Impossible de réserver une salle pour une date passée")
+        return value
+
+
+class ReservationMaterielEnMasseSerializer(serializers.Serializer):
+    """Élément d'une création de réservations de matériels en masse (identifiants résolus par lot)"""
+    materiel = serializers.IntegerField(min_value=1)
+    formation = serializers.IntegerField(min_value=1)
+    creneau = serializers.IntegerField(min_value=1)
+    date = serializers.DateField()
+    commentaires = serializers.CharField(required=False, allow_blank=True)
+
+    def validate_date(self, value):
+        if value < timezone.now().date():
+            raise serializers.ValidationError("Impossible de réserver du matériel pour une date passée")
+        return value
+
+
+class ReservationsEnMasseSerializer(serializers.Serializer):
+    """Enveloppe d'une création en masse : chaque élément est validé séparément par la vue"""
+    MAX_ELEMENTS = 1000
+
+    mode = serializers.ChoiceField(choices=['tout_ou_rien', 'partiel'], default='tout_ou_rien')
+    reservations = serializers.ListField(
+        child=serializers.DictField(), min_length=1, max_length=MAX_ELEMENTS
+    )
 
 
 class RecapitulatifHoraireSerializer(serializers.ModelSerializer):
-    formation_detail = FormationSerializer(source='formation', read_only=True)
+    formation_detail = ReferentielField('formations', source='formation_id')
     enseignant_detail = UserSerializer(source='enseignant', read_only=True)
-    creneau_detail = CreneauHoraireSerializer(source='creneau', read_only=True)
-    salle_prevue_detail = SalleSerializer(source='salle_prevue', read_only=True)
+    creneau_detail = ReferentielField('creneaux', source='creneau_id')
+    salle_prevue_detail = ReferentielField('salles', source='salle_prevue_id')
 
     class Meta:
         model = RecapitulatifHoraire
@@ -201,6 +370,20 @@ class RecapitulatifHoraireSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at', 'updated_at']
 
 
+class RecapitulatifHoraireFlatSerializer(RecapitulatifHoraireSerializer):
+    """Récapitulatif ne portant que les identifiants des objets liés (mode sideload)"""
+    formation_detail = None
+    enseignant_detail = None
+    creneau_detail = None
+    salle_prevue_detail = None
+
+    class Meta(RecapitulatifHoraireSerializer.Meta):
+        fields = [
+            'id', 'formation', 'enseignant', 'date', 'creneau', 'sujet', 'salle_prevue',
+            'commentaires', 'created_at', 'updated_at'
+        ]
+
+
 # Serializers pour les statistiques et rapports
 class StatistiquesSerializer(serializers.Serializer):
     total_reservations_salles = serializers.IntegerField()
@@ -217,8 +400,64 @@ class PlanningJournalierSerializer(serializers.Serializer):
 class DisponibiliteSerializer(serializers.Serializer):
     """Serializer pour vérifier la disponibilité d'une salle ou d'un matériel"""
     type_ressource = serializers.ChoiceField(choices=['salle', 'materiel'])
-    ressource_id = serializers.IntegerField()
+    ressource_id = serializers.IntegerField(min_value=1)
     date = serializers.DateField()
-    creneau_id = serializers.IntegerField()
+    creneau_id = serializers.IntegerField(min_value=1)
     disponible = serializers.BooleanField(read_only=True)
-    conflit = serializers.CharField(read_only=True, required=False)
\ No newline at end of file
+    conflit = serializers.CharField(read_only=True, required=False)
+
+class DisponibiliteBatchSerializer(serializers.Serializer):
+    """Serializer pour vérifier en un appel la disponibilité de plusieurs ressources"""
+    MAX_JOURS = 92
+    MAX_RESSOURCES = 500
+
+    salles = serializers.ListField(child=serializers.IntegerField(min_value=1), required=False, default=list)
+    materiels = serializers.ListField(child=serializers.IntegerField(min_value=1), required=False, default=list)
+    dates = serializers.ListField(child=serializers.DateField(), required=False)
+    date_debut = serializers.DateField(required=False)
+    date_fin = serializers.DateField(required=False)
+    creneaux = serializers.ListField(child=serializers.IntegerField(min_value=1), required=False)
+
+    def validate(self, data):
+        if not data['salles'] and not data['materiels']:
+            raise serializers.ValidationError("Indiquez au moins une salle ou un matériel")
+        if len(data['salles']) + len(data['materiels']) > self.MAX_RESSOURCES:
+            raise serializers.ValidationError(f"Au plus {self.MAX_RESSOURCES} ressources par appel")
+
+        if data.get('dates'):
+            dates = sorted(set(data['dates']))
+        elif data.get('date_debut') and data.get('date_fin'):
+            if data['date_debut'] > data['date_fin']:
+                raise serializers.ValidationError("date_debut doit précéder date_fin")
+            nb_jours = (data['date_fin'] - data['date_debut']).days + 1
+            dates = [data['date_debut'] + timedelta(days=i) for i in range(min(nb_jours, self.MAX_JOURS + 1))]
+        else:
+            raise serializers.ValidationError("Indiquez une liste de dates ou date_debut et date_fin")
+
+        if (dates[-1] - dates[0]).days >= self.MAX_JOURS:
+            raise serializers.ValidationError(f"La période ne peut pas dépasser {self.MAX_JOURS} jours")
+
+        data['dates'] = dates
+        data['salles'] = list(dict.fromkeys(data['salles']))
+        data['materiels'] = list(dict.fromkeys(data['materiels']))
+
+        # Une requête in_bulk par type : un identifiant inconnu serait sinon signalé libre
+        erreurs = {}
+        for champ, model in (('salles', Salle), ('materiels', Materiel), ('creneaux', CreneauHoraire)):
+            ids = data.get(champ)
+            if not ids:
+                continue
+            existants = model.objects.only('id').in_bulk(ids)
+            inconnus = [pk for pk in ids if pk not in existants]
+            if inconnus:
+                erreurs[champ] = [f"Identifiants inconnus : {', '.join(map(str, inconnus))}"]
+        if erreurs:
+            raise serializers.ValidationError(erreurs)
+        return data
+
+
+class EmploiDuTempsSerializer(serializers.Serializer):
+    """Serializer pour demander l'emploi du temps PDF d'une salle, d'une formation ou d'un enseignant"""
+    type = serializers.ChoiceField(choices=['salle', 'formation', 'enseignant'])
+    id = serializers.IntegerField(min_value=1)
+    semaine = serializers.DateField(required=False, help_text="Un jour de la semaine voulue (semaine courante par défaut)")
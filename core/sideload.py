@@ -0,0 +1,178 @@
+from collections import defaultdict
+from django.contrib.auth import get_user_model
+from rest_framework.response import Response
+from drf_yasg import openapi
+from core.models import (
+    Formation, Salle, TypeMateriel, Materiel, CreneauHoraire,
+    ReservationSalle, ReservationMateriel, RecapitulatifHoraire
+)
+from core.referentiels import REFERENTIELS, referentiel, detail_referentiel
+from core.serializers import (
+    UserSerializer, SalleSerializer, TypeMaterielSerializer, CreneauHoraireSerializer,
+    FormationFlatSerializer, MaterielFlatSerializer, ReservationSalleFlatSerializer,
+    ReservationMaterielFlatSerializer, RecapitulatifHoraireFlatSerializer
+)
+
+User = get_user_model()
+
+# Type inclus -> (modèle, serializer sans objets imbriqués)
+INCLUSIONS = {
+    'utilisateurs': (User, UserSerializer),
+    'formations': (Formation, FormationFlatSerializer),
+    'salles': (Salle, SalleSerializer),
+    'materiels': (Materiel, MaterielFlatSerializer),
+    'types_materiel': (TypeMateriel, TypeMaterielSerializer),
+    'creneaux': (CreneauHoraire, CreneauHoraireSerializer),
+}
+
+# Modèle -> [(clé étrangère, type inclus)]
+RELATIONS = {
+    ReservationSalle: [('enseignant', 'utilisateurs'), ('salle', 'salles'), ('formation', 'formations'),
+                       ('creneau', 'creneaux')],
+    ReservationMateriel: [('enseignant', 'utilisateurs'), ('materiel', 'materiels'), ('formation', 'formations'),
+                          ('creneau', 'creneaux')],
+    RecapitulatifHoraire: [('enseignant', 'utilisateurs'), ('formation', 'formations'), ('creneau', 'creneaux'),
+                           ('salle_prevue', 'salles')],
+    Materiel: [('type_materiel', 'types_materiel')],
+}
+
+SERIALIZERS_A_PLAT = {
+    ReservationSalle: ReservationSalleFlatSerializer,
+    ReservationMateriel: ReservationMaterielFlatSerializer,
+    RecapitulatifHoraire: RecapitulatifHoraireFlatSerializer,
+}
+
+
+sideload_param = openapi.Parameter(
+    'sideload',
+    openapi.IN_QUERY,
+    description="1 pour ne renvoyer que les identifiants des objets liés, décrits une seule fois dans 'included'",
+    type=openapi.TYPE_BOOLEAN
+)
+
+
+def sideload_demande(request):
+    """Le mode « à plat » est activé par ?sideload=1 (ou true)"""
+    return request.query_params.get('sideload', '').lower() in ('1', 'true', 'oui')
+
+
+class Inclusions:
+    """
+    Collecte dédupliquée des objets liés d'un ensemble de lignes.
+
+    Les objets de référence (salles, créneaux, types, formations) ne sont
+    notés que par leur identifiant et décrits depuis le cache des
+    référentiels. Pour les autres, les objets déjà chargés (select_related)
+    sont réutilisés et le reste est lu en une requête par type ; les objets
+    inclus sont eux-mêmes parcourus (type d'un matériel).
+    """
+
+    def __init__(self):
+        self.objets = defaultdict(dict)
+
+    def ajouter(self, instances):
+        a_parcourir = list(instances)
+        while a_parcourir:
+            a_charger = defaultdict(set)
+            nouveaux = []
+            for instance in a_parcourir:
+                for champ, type_inclus in RELATIONS.get(type(instance), []):
+                    pk = getattr(instance, f'{champ}_id')
+                    if pk is None or pk in self.objets[type_inclus]:
+                        continue
+                    if type_inclus in REFERENTIELS:
+                        self.objets[type_inclus][pk] = None
+                    elif instance._meta.get_field(champ).is_cached(instance):
+                        self.objets[type_inclus][pk] = getattr(instance, champ)
+                        nouveaux.append(getattr(instance, champ))
+                    else:
+                        a_charger[type_inclus].add(pk)
+
+            for type_inclus, pks in a_charger.items():
+                pks -= self.objets[type_inclus].keys()
+                charges = INCLUSIONS[type_inclus][0].objects.in_bulk(pks)
+                self.objets[type_inclus].update(charges)
+                nouveaux.extend(charges.values())
+            a_parcourir = nouveaux
+
+    def serialiser(self, context=None):
+        included = {
+            type_inclus: {
+                str(pk): donnees
+                for pk, donnees in zip(objets, INCLUSIONS[type_inclus][1](objets.values(), many=True, context=context).data)
+            }
+            for type_inclus, objets in self.objets.items() if objets and type_inclus not in REFERENTIELS
+        }
+        for type_inclus, objets in self.objets.items():
+            if objets and type_inclus in REFERENTIELS:
+                included[type_inclus] = self._serialiser_referentiel(type_inclus, objets, included)
+        return included
+
+    @staticmethod
+    def _serialiser_referentiel(type_inclus, objets, included):
+        donnees_referentiel = referentiel(type_inclus)
+        resultat = {}
+        for pk in objets:
+            donnees = donnees_referentiel.get(pk) or detail_referentiel(type_inclus, pk)
+            if donnees is None:
+                continue
+            if type_inclus == 'formations':
+                # Le responsable imbriqué dans le référentiel rejoint les utilisateurs inclus
+                donnees = dict(donnees)
+                responsable = donnees.pop('responsable_detail')
+                if responsable is not None:
+                    included.setdefault('utilisateurs', {}).setdefault(str(responsable['id']), responsable)
+            resultat[str(pk)] = donnees
+        return resultat
+
+
+def fusionner_inclusions(dictionnaires):
+    """Fusionne plusieurs dictionnaires ``included`` (un par jour de planning, par exemple)"""
+    fusion = defaultdict(dict)
+    for included in dictionnaires:
+        for type_inclus, objets in included.items():
+            fusion[type_inclus].update(objets)
+    return dict(fusion)
+
+
+def serialiser_a_plat(instances, inclusions=None, context=None):
+    """Sérialise des réservations/récapitulatifs sans objets imbriqués (identifiants uniquement)"""
+    instances = list(instances)
+    if inclusions is not None:
+        inclusions.ajouter(instances)
+    if not instances:
+        return []
+    return SERIALIZERS_A_PLAT[type(instances[0])](instances, many=True, context=context).data
+
+
+class SideloadMixin:
+    """
+    Ajoute le mode ?sideload=1 aux actions list/retrieve d'un viewset : les
+    lignes ne portent que les identifiants des objets liés, décrits une seule
+    fois dans le dictionnaire ``included``.
+    """
+
+    def list(self, request, *args, **kwargs):
+        if not sideload_demande(request):
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        inclusions = Inclusions()
+        lignes = serialiser_a_plat(page if page is not None else queryset, inclusions, self.get_serializer_context())
+
+        if page is not None:
+            response = self.get_paginated_response(lignes)
+        else:
+            response = Response({'results': lignes})
+        response.data['included'] = inclusions.serialiser()
+        return response
+
+    def retrieve(self, request, *args, **kwargs):
+        if not sideload_demande(request):
+            return super().retrieve(request, *args, **kwargs)
+
+        inclusions = Inclusions()
+        ligne = serialiser_a_plat([self.get_object()], inclusions, self.get_serializer_context())[0]
+        return Response({**ligne, 'included': inclusions.serialiser()})
+
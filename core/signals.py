@@ -0,0 +1,219 @@
+from functools import partial
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_init, post_save, post_delete
+from django.dispatch import receiver
+from core.models import (
+    Formation, Salle, TypeMateriel, Materiel, CreneauHoraire,
+    ReservationSalle, ReservationMateriel
+)
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+from core.authentication import invalider_utilisateur
+from core.jetons import memoriser_liste_noire
+from core.occupancy import occupancy_index
+from core.rollups import ajuster
+from core.caching import incrementer_version
+from core.planning import invalider_plannings, invalider_tous_les_plannings, VERSION_UTILISATEURS
+from core.referentiels import invalider_referentiel
+from core.tendances import debut_periodes_ouvertes, invalider_tendances
+
+RESSOURCES_RESERVEES = {
+    ReservationSalle: ('salle', 'salle_id'),
+    ReservationMateriel: ('materiel', 'materiel_id'),
+}
+
+# Champs d'un utilisateur repris dans les représentations imbriquées (UserSerializer)
+CHAMPS_UTILISATEUR_AFFICHES = ('username', 'first_name', 'last_name', 'email', 'matricule', 'user_type')
+
+# Modèle -> référentiels dont la représentation en dépend (voir core/referentiels.py)
+REFERENTIELS_MODELES = {
+    Salle: ('salles',),
+    CreneauHoraire: ('creneaux',),
+    TypeMateriel: ('types_materiel',),
+    Materiel: ('types_materiel',),  # nombre de matériels actifs par type
+    Formation: ('formations',),
+}
+
+
+def _cellule(instance):
+    """Retourne (ressource_id, date, creneau_id) sans déclencher le chargement des champs différés"""
+    champ = RESSOURCES_RESERVEES[type(instance)][1]
+    valeurs = instance.__dict__
+    return valeurs.get(champ), valeurs.get('date'), valeurs.get('creneau_id')
+
+
+def _valeurs_agregats(instance):
+    """Identifiants qui déterminent les lignes d'agrégats d'une réservation (voir core/rollups.py)"""
+    valeurs = instance.__dict__
+    champs = (RESSOURCES_RESERVEES[type(instance)][1], 'formation_id', 'date', 'creneau_id')
+    return {champ: valeurs.get(champ) for champ in champs}
+
+
+def _affichage_utilisateur(instance):
+    """Champs d'un utilisateur imbriqués dans les formations et les plannings (enseignant_detail...)"""
+    valeurs = instance.__dict__
+    return tuple(valeurs.get(champ) for champ in CHAMPS_UTILISATEUR_AFFICHES)
+
+
+@receiver(post_init, sender=ReservationSalle)
+@receiver(post_init, sender=ReservationMateriel)
+def memoriser_cellule_reservation(sender, instance, **kwargs):
+    # Conserver la cellule d'origine pour savoir quoi libérer si la réservation est déplacée
+    instance._cellule_origine = _cellule(instance) if instance.pk else None
+    instance._agregats_origine = _valeurs_agregats(instance) if instance.pk else None
+
+
+@receiver(post_save, sender=ReservationSalle)
+@receiver(post_save, sender=ReservationMateriel)
+@receiver(post_delete, sender=ReservationSalle)
+@receiver(post_delete, sender=ReservationMateriel)
+def reservation_passee_modifiee(sender, instance, **kwargs):
+    # Les statistiques des semaines et mois révolus sont en cache pour longtemps.
+    # Connecté avant agreger_reservation, qui remplace _agregats_origine
+    origine = getattr(instance, '_agregats_origine', None) or {}
+    dates = {instance.__dict__.get('date'), origine.get('date')} - {None}
+    if any(jour < debut_periodes_ouvertes() for jour in dates):
+        transaction.on_commit(invalider_tendances)
+
+
+@receiver(post_save, sender=ReservationSalle)
+@receiver(post_save, sender=ReservationMateriel)
+def reservation_enregistree(sender, instance, **kwargs):
+    type_ressource = RESSOURCES_RESERVEES[sender][0]
+    origine = getattr(instance, '_cellule_origine', None)
+    cellule = _cellule(instance)
+    instance._cellule_origine = cellule
+
+    def mettre_a_jour():
+        if origine and origine != cellule:
+            occupancy_index.liberer(type_ressource, *origine)
+        occupancy_index.reserver(type_ressource, *cellule)
+        invalider_plannings(cellule[1], origine[1] if origine else None)
+
+    transaction.on_commit(mettre_a_jour)
+
+
+@receiver(post_save, sender=ReservationSalle)
+@receiver(post_save, sender=ReservationMateriel)
+def agreger_reservation(sender, instance, **kwargs):
+    origine = getattr(instance, '_agregats_origine', None)
+    valeurs = _valeurs_agregats(instance)
+    instance._agregats_origine = valeurs
+    if origine == valeurs:
+        return
+    # Dans la transaction de l'écriture, comme les lots : réservation et agrégats sont validés ensemble
+    ajuster(sender, [(valeurs, 1)] + ([(origine, -1)] if origine else []))
+
+
+def reservations_creees_en_masse(sender, instances):
+    """
+    Équivalent groupé des récepteurs post_save pour un lot inséré par
+    bulk_create (core/bulk.py), qui n'émet pas de signal : un seul rappel
+    après la validation met à jour l'index d'occupation en mémoire et
+    invalide les plannings (et les tendances d'une date passée) une fois
+    pour l'ensemble des dates du lot. Les agrégats sont ajustés dans la
+    transaction par ajouter_en_masse.
+    """
+    type_ressource = RESSOURCES_RESERVEES[sender][0]
+    cellules = []
+    for instance in instances:
+        instance._cellule_origine = _cellule(instance)
+        instance._agregats_origine = _valeurs_agregats(instance)
+        cellules.append(instance._cellule_origine)
+    dates = {cellule[1] for cellule in cellules}
+
+    def mettre_a_jour():
+        for cellule in cellules:
+            occupancy_index.reserver(type_ressource, *cellule)
+        invalider_plannings(*dates)
+        if dates and min(dates) < debut_periodes_ouvertes():
+            invalider_tendances()
+
+    transaction.on_commit(mettre_a_jour)
+
+
+@receiver(post_delete, sender=ReservationSalle)
+@receiver(post_delete, sender=ReservationMateriel)
+def reservation_supprimee(sender, instance, **kwargs):
+    type_ressource = RESSOURCES_RESERVEES[sender][0]
+    cellule = getattr(instance, '_cellule_origine', None) or _cellule(instance)
+
+    def mettre_a_jour():
+        occupancy_index.liberer(type_ressource, *cellule)
+        invalider_plannings(cellule[1])
+
+    transaction.on_commit(mettre_a_jour)
+
+
+@receiver(post_save, sender=Salle)
+@receiver(post_delete, sender=Salle)
+@receiver(post_save, sender=Materiel)
+@receiver(post_delete, sender=Materiel)
+@receiver(post_save, sender=TypeMateriel)
+@receiver(post_delete, sender=TypeMateriel)
+@receiver(post_save, sender=CreneauHoraire)
+@receiver(post_delete, sender=CreneauHoraire)
+@receiver(post_save, sender=Formation)
+@receiver(post_delete, sender=Formation)
+def referentiel_modifie(sender, **kwargs):
+    # Ces données sont imbriquées dans les plannings de tous les jours
+    transaction.on_commit(invalider_tous_les_plannings)
+    for nom in REFERENTIELS_MODELES[sender]:
+        transaction.on_commit(partial(invalider_referentiel, nom))
+
+
+@receiver(post_save, sender=get_user_model())
+@receiver(post_delete, sender=get_user_model())
+def utilisateur_authentifie_modifie(sender, instance, **kwargs):
+    # Utilisateur mis en cache par CachedJWTAuthentication (mot de passe, is_active, user_type...)
+    transaction.on_commit(partial(invalider_utilisateur, instance.pk))
+
+
+@receiver(post_init, sender=get_user_model())
+def memoriser_utilisateur_affiche(sender, instance, **kwargs):
+    instance._affichage_origine = _affichage_utilisateur(instance) if instance.pk else None
+
+
+@receiver(post_save, sender=get_user_model())
+def utilisateur_modifie(sender, instance, created, **kwargs):
+    # Les formations imbriquent leur responsable et les plannings l'enseignant de chaque
+    # réservation. Un compte créé n'y figure pas encore ; un mot de passe changé, une
+    # connexion (last_login) ou une désactivation n'y changent rien
+    origine = getattr(instance, '_affichage_origine', None)
+    instance._affichage_origine = _affichage_utilisateur(instance)
+    if created or origine == instance._affichage_origine:
+        return
+    transaction.on_commit(partial(invalider_referentiel, 'formations'))
+    transaction.on_commit(invalider_tous_les_plannings)
+    transaction.on_commit(partial(incrementer_version, VERSION_UTILISATEURS))
+
+
+@receiver(post_delete, sender=ReservationSalle)
+@receiver(post_delete, sender=ReservationMateriel)
+def desagreger_reservation(sender, instance, **kwargs):
+    valeurs = getattr(instance, '_agregats_origine', None) or _valeurs_agregats(instance)
+    ajuster(sender, [(valeurs, -1)])
+
+
+@receiver(post_init, sender=Materiel)
+def memoriser_type_materiel(sender, instance, **kwargs):
+    instance._type_materiel_origine = instance.__dict__.get('type_materiel_id') if instance.pk else None
+
+
+@receiver(post_save, sender=Materiel)
+def materiel_modifie(sender, instance, created, **kwargs):
+    # Un changement de type modifie la ventilation par type des périodes révolues ;
+    # un matériel créé n'a pas encore de réservation
+    origine = getattr(instance, '_type_materiel_origine', None)
+    instance._type_materiel_origine = instance.__dict__.get('type_materiel_id')
+    if not created and origine != instance._type_materiel_origine:
+        transaction.on_commit(invalider_tendances)
+
+
+@receiver(post_save, sender=BlacklistedToken)
+def jeton_mis_sur_liste_noire(sender, instance, created, **kwargs):
+    # Immédiatement, sans attendre la validation : un jeton révoqué est refusé au plus tôt.
+    # Pas de récepteur post_delete, qui empêcherait la purge par lots de supprimer en une requête
+    if created:
+        jeton = instance.token
+        memoriser_liste_noire(jeton.jti, jeton.expires_at.timestamp())
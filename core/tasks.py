@@ -0,0 +1,34 @@
+from datetime import date
+from celery import shared_task
+from core.emplois_du_temps import (
+    generer_emploi_du_temps, enregistrer_erreur, enregistrer_remplacement, purger_emplois_du_temps
+)
+from core.jetons import purger_jetons_expires
+
+
+@shared_task
+def generer_emploi_du_temps_pdf(type_emploi, pk, debut, cle):
+    """
+    Génère l'emploi du temps PDF demandé sous la clé ``cle`` (``debut`` au
+    format ISO). L'état est suivi dans le cache, interrogé par la vue de statut.
+    """
+    try:
+        nouvelle_cle = generer_emploi_du_temps(type_emploi, pk, date.fromisoformat(debut))
+    except Exception as e:
+        enregistrer_erreur(cle, str(e))
+        raise
+    if nouvelle_cle != cle:
+        enregistrer_remplacement(cle, nouvelle_cle)
+    return nouvelle_cle
+
+
+@shared_task
+def purger_jetons():
+    """Purge planifiée des jetons JWT expirés (CELERY_BEAT_SCHEDULE)"""
+    return purger_jetons_expires()
+
+
+@shared_task
+def purger_emplois_du_temps_pdf():
+    """Purge planifiée des emplois du temps PDF des semaines passées (CELERY_BEAT_SCHEDULE)"""
+    return purger_emplois_du_temps()
@@ -0,0 +1,155 @@
+from datetime import timedelta
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db.models import Count
+from django.db.models.functions import TruncMonth, TruncWeek
+from django.utils import timezone
+from core.caching import version, incrementer_version
+from core.models import Formation, TypeMateriel, ReservationSalle, ReservationMateriel
+
+User = get_user_model()
+
+MAX_PERIODES_TENDANCES = 104
+
+# Compteur incrémenté lorsqu'une période close peut avoir changé
+VERSION_TENDANCES = 'tendances'
+
+TRONCATURES = {'semaine': TruncWeek, 'mois': TruncMonth}
+
+SOURCES = {'salles': ReservationSalle, 'materiels': ReservationMateriel}
+
+# Axe de ventilation -> (modèle de l'axe, champ de regroupement, sources concernées)
+DIMENSIONS = {
+    'formation': (Formation, 'formation_id', ('salles', 'materiels')),
+    'enseignant': (User, 'enseignant_id', ('salles', 'materiels')),
+    'type_materiel': (TypeMateriel, 'materiel__type_materiel_id', ('materiels',)),
+}
+
+
+def debut_periode(jour, periode):
+    """Premier jour de la semaine (lundi) ou du mois contenant ``jour``"""
+    if periode == 'semaine':
+        return jour - timedelta(days=jour.weekday())
+    return jour.replace(day=1)
+
+
+def periode_suivante(debut, periode):
+    if periode == 'semaine':
+        return debut + timedelta(days=7)
+    return (debut.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def periodes(date_debut, date_fin, periode):
+    """Débuts des semaines ou mois couvrant [date_debut, date_fin]"""
+    debuts = []
+    debut = debut_periode(date_debut, periode)
+    while debut <= date_fin:
+        debuts.append(debut)
+        debut = periode_suivante(debut, periode)
+    return debuts
+
+
+def debut_periodes_ouvertes():
+    """
+    Les réservations datées d'avant ce jour appartiennent à des semaines et des
+    mois révolus, dont les statistiques sont mises en cache pour longtemps.
+    """
+    aujourd_hui = timezone.now().date()
+    return max(debut_periode(aujourd_hui, periode) for periode in TRONCATURES)
+
+
+def construire_tendances(debuts, periode, par, filtres):
+    """
+    Compte les réservations de chaque période (semaine ou mois commençant aux
+    dates ``debuts``), ventilées selon l'axe ``par``.
+
+    La troncature de la date et le regroupement sont faits par la base : une
+    requête GROUP BY par source, quelle que soit la longueur de la période.
+    Retourne {debut: {'debut', 'fin', <source>: total, 'groupes': {id: {<source>: n}}}}.
+    """
+    _, champ, sources = DIMENSIONS[par]
+    fin = periode_suivante(max(debuts), periode) - timedelta(days=1)
+    resultats = {
+        debut: {
+            'debut': debut, 'fin': periode_suivante(debut, periode) - timedelta(days=1),
+            **{source: 0 for source in sources}, 'groupes': {}
+        }
+        for debut in debuts
+    }
+
+    for source in sources:
+        comptes = SOURCES[source].objects.filter(
+            date__range=(min(debuts), fin), **filtres
+        ).annotate(
+            periode=TRONCATURES[periode]('date')
+        ).order_by().values_list('periode', champ).annotate(nombre=Count('id'))
+
+        for debut, groupe, nombre in comptes:
+            if debut not in resultats:
+                continue
+            resultats[debut][source] += nombre
+            resultats[debut]['groupes'].setdefault(groupe, {s: 0 for s in sources})[source] = nombre
+
+    return resultats
+
+
+def _cle_tendance(debut, periode, par, filtres, generation):
+    filtre = ':'.join(f'{nom}={filtres[nom]}' for nom in sorted(filtres))
+    return f'tendances:{periode}:{par}:{filtre}:{debut.isoformat()}:{generation}'
+
+
+def tendances_en_cache(date_debut, date_fin, periode, par, filtres=None):
+    """
+    Variante de construire_tendances servie depuis le cache Django.
+
+    Chaque période est mise en cache séparément, par (période, axe, filtres) :
+    TENDANCES_REVOLUES_CACHE_TIMEOUT secondes si elle est révolue (les clés
+    d'une génération abandonnée finissent ainsi par expirer),
+    TENDANCES_CACHE_TIMEOUT secondes si elle est en cours ou à venir. Les
+    périodes absentes sont recalculées ensemble ; rien n'est enregistré si les
+    tendances ont été invalidées pendant le calcul. Les noms des éléments de
+    l'axe ne sont pas mis en cache.
+    """
+    filtres = filtres or {}
+    generation = version(VERSION_TENDANCES)
+    debuts = periodes(date_debut, date_fin, periode)
+    cles = {debut: _cle_tendance(debut, periode, par, filtres, generation) for debut in debuts}
+
+    trouves = cache.get_many(list(cles.values()))
+    series = {debut: trouves[cle] for debut, cle in cles.items() if cle in trouves}
+    manquants = [debut for debut in debuts if debut not in series]
+
+    if manquants:
+        construits = construire_tendances(manquants, periode, par, filtres)
+        aujourd_hui = timezone.now().date()
+        revolues = {cles[debut]: construits[debut] for debut in manquants if construits[debut]['fin'] < aujourd_hui}
+        en_cours = {cles[debut]: construits[debut] for debut in manquants if construits[debut]['fin'] >= aujourd_hui}
+        # Une réservation passée validée pendant le calcul a pu le rendre obsolète
+        if version(VERSION_TENDANCES) == generation:
+            cache.set_many(revolues, timeout=getattr(settings, 'TENDANCES_REVOLUES_CACHE_TIMEOUT', 7 * 24 * 3600))
+            cache.set_many(en_cours, timeout=getattr(settings, 'TENDANCES_CACHE_TIMEOUT', 60))
+        series.update(construits)
+
+    return [series[debut] for debut in debuts]
+
+
+def nommer_groupes(series, par):
+    """Remplace les identifiants de l'axe par {'id', 'nom', ...} (une requête pour toute la série)"""
+    modele, _, sources = DIMENSIONS[par]
+    objets = modele.objects.in_bulk({groupe for serie in series for groupe in serie['groupes'] if groupe is not None})
+    return [
+        {
+            **{cle: valeur for cle, valeur in serie.items() if cle != 'groupes'},
+            'groupes': sorted((
+                {'id': groupe, 'nom': str(objets[groupe]) if groupe in objets else None, **comptes}
+                for groupe, comptes in serie['groupes'].items()
+            ), key=lambda ligne: -sum(ligne[source] for source in sources))
+        }
+        for serie in series
+    ]
+
+
+def invalider_tendances():
+    """Rend obsolètes toutes les périodes en cache, y compris les périodes révolues"""
+    incrementer_version(VERSION_TENDANCES)
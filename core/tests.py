@@ -1,3 +1,1370 @@
-from django.test import TestCase
+import csv
+import io
+import json
+import os
+import tempfile
+import threading
+import uuid
+import time as time_module
+from base64 import urlsafe_b64encode
+from contextlib import contextmanager
+from decimal import Decimal
+from unittest import mock
+from datetime import date, time, timedelta
+import numpy as np
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.contrib import admin
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, connection, connections
+from django.test import RequestFactory, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory, APITestCase
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.settings import api_settings as jwt_api_settings
+from rest_framework_simplejwt.tokens import AccessToken
+from .admin import RecapitulatifHoraireAdmin
+from .authentication import CachedJWTAuthentication
+from .permissions import IsOwnerOrReadOnly, IsResponsableFormationOrReadOnly, IsEnseignantOwner
+from . import planning, tendances
+from .caching import version
+from .occupancy import occupancy_index, verifier_disponibilite
+from .emplois_du_temps import purger_emplois_du_temps
+from .jetons import RefreshToken, est_sur_liste_noire, purger_jetons_expires
+from .planning import statistiques_cache_plannings
+from .tendances import VERSION_TENDANCES, invalider_tendances, tendances_en_cache
+from .tasks import generer_emploi_du_temps_pdf
+from .utilisation import matrice_occupation, taux_utilisation
+from .referentiels import REFERENTIELS, detail_referentiel, referentiel
+from .renderers import ORJSONRenderer
+from .rollups import verifier
+from .serializers import RechercheSalleLibreSerializer
+from .models import (
+    Formation, Salle, TypeMateriel, Materiel, CreneauHoraire,
+    ReservationSalle, ReservationMateriel, RecapitulatifHoraire, OccupationSalle
+)
 
-# Create your tests here.
+User = get_user_model()
+
+
+def charger_referentiels():
+    """Met les référentiels en cache, comme sur un serveur qui tourne déjà"""
+    for nom in REFERENTIELS:
+        referentiel(nom)
+
+
+class DonneesReservationMixin:
+    """Jeu de données minimal partagé par les tests"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.creneaux = [
+            CreneauHoraire.objects.create(nom=nom, heure_debut=debut, heure_fin=fin)
+            for nom, debut, fin in [
+                ('08:00-10:00', time(8, 0), time(10, 0)),
+                ('10:15-12:15', time(10, 15), time(12, 15)),
+                ('13:30-15:30', time(13, 30), time(15, 30)),
+                ('15:45-17:45', time(15, 45), time(17, 45)),
+            ]
+        ]
+        cls.enseignants = [
+            User.objects.create_user(
+                username=f'prof{i}', matricule=f'ENS{i:08d}', password='password123', user_type='enseignant'
+            )
+            for i in range(3)
+        ]
+        cls.etudiant = User.objects.create_user(
+            username='etudiant', matricule='ETU00000001', password='password123', user_type='etudiant'
+        )
+        cls.formations = [
+            Formation.objects.create(nom=f'Formation {i}', code=f'FORM{i:07d}', responsable=cls.enseignants[i])
+            for i in range(3)
+        ]
+        cls.salles = [Salle.objects.create(nom=f'A10{i}', capacite=20 + 10 * i) for i in range(4)]
+        cls.types_materiel = [TypeMateriel.objects.create(nom=f'Type {i}') for i in range(2)]
+        cls.materiels = [
+            Materiel.objects.create(nom=f'Matériel {i}', type_materiel=cls.types_materiel[i % 2], numero_serie=f'SN{i}')
+            for i in range(4)
+        ]
+        cls.demain = date.today() + timedelta(days=1)
+
+    def reserver(self, jours):
+        """Réserve toutes les salles et tous les matériels sur chaque créneau des jours donnés"""
+        for jour in range(jours):
+            for i, creneau in enumerate(self.creneaux):
+                for salle in self.salles:
+                    ReservationSalle.objects.create(
+                        enseignant=self.enseignants[i % 3], salle=salle, formation=self.formations[i % 3],
+                        creneau=creneau, date=self.demain + timedelta(days=jour)
+                    )
+                for materiel in self.materiels:
+                    ReservationMateriel.objects.create(
+                        enseignant=self.enseignants[i % 3], materiel=materiel, formation=self.formations[i % 3],
+                        creneau=creneau, date=self.demain + timedelta(days=jour)
+                    )
+
+
+class PlanningGeneralViewTests(DonneesReservationMixin, APITestCase):
+    # réservations de salles + réservations de matériels (référentiels déjà en cache)
+    REQUETES_PLANNING = 2
+
+    def setUp(self):
+        cache.clear()
+        charger_referentiels()
+        self.client.force_authenticate(self.etudiant)
+        self.url = reverse('planning-general')
+
+    def test_planning_journalier_conserve_son_format(self):
+        self.reserver(1)
+        reponse = self.client.get(self.url, {'date': self.demain.isoformat()})
+        self.assertEqual(reponse.status_code, 200)
+        self.assertEqual(set(reponse.data['planning']), {creneau.nom for creneau in self.creneaux})
+        cellule = reponse.data['planning'][self.creneaux[0].nom]
+        self.assertEqual(len(cellule['salle']), len(self.salles))
+        self.assertEqual(len(cellule['materiels']), len(self.materiels))
+
+    def test_nombre_de_requetes_constant_pour_une_journee(self):
+        self.reserver(1)
+        with self.assertNumQueries(self.REQUETES_PLANNING):
+            self.client.get(self.url, {'date': self.demain.isoformat()})
+
+    def test_nombre_de_requetes_constant_quelle_que_soit_la_periode(self):
+        self.reserver(7)
+        for jours in (1, 7, 31):
+            cache.clear()
+            charger_referentiels()
+            date_fin = self.demain + timedelta(days=jours - 1)
+            with self.assertNumQueries(self.REQUETES_PLANNING):
+                reponse = self.client.get(self.url, {
+                    'date_debut': self.demain.isoformat(), 'date_fin': date_fin.isoformat()
+                })
+            self.assertEqual(reponse.status_code, 200)
+            self.assertEqual(len(reponse.data['plannings']), jours)
+
+    def test_regroupement_par_jour_et_par_creneau(self):
+        self.reserver(2)
+        reponse = self.client.get(self.url, {
+            'date_debut': self.demain.isoformat(),
+            'date_fin': (self.demain + timedelta(days=2)).isoformat()
+        })
+        plannings = reponse.data['plannings']
+        for jour, attendu in ((0, len(self.salles)), (1, len(self.salles)), (2, 0)):
+            cle = (self.demain + timedelta(days=jour)).isoformat()
+            for creneau in self.creneaux:
+                cellule = plannings[cle][creneau.nom]
+                self.assertEqual(len(cellule['salle']), attendu)
+                self.assertTrue(all(ligne['date'] == cle for ligne in cellule['salle']))
+                self.assertTrue(all(ligne['creneau'] == creneau.pk for ligne in cellule['materiels']))
+
+    def test_periode_trop_longue_refusee(self):
+        reponse = self.client.get(self.url, {
+            'date_debut': self.demain.isoformat(),
+            'date_fin': (self.demain + timedelta(days=60)).isoformat()
+        })
+        self.assertEqual(reponse.status_code, 400)
+
+    def test_date_invalide_refusee(self):
+        self.assertEqual(self.client.get(self.url, {'date': '15/01/2024'}).status_code, 400)
+
+    def test_renommage_d_un_enseignant_invalide_les_plannings(self):
+        self.reserver(1)
+        parametres = {'date': self.demain.isoformat()}
+        self.client.get(self.url, parametres)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.enseignants[0].last_name = 'Renommé'
+            self.enseignants[0].save()
+        reponse = self.client.get(self.url, parametres)
+        noms = {ligne['enseignant_detail']['last_name'] for ligne in reponse.data['planning'][self.creneaux[0].nom]['salle']}
+        self.assertIn('Renommé', noms)
+
+    def test_compte_cree_ou_mot_de_passe_change_n_invalide_rien(self):
+        versions = lambda: (
+            version(planning.VERSION_PLANNING), version(planning.VERSION_UTILISATEURS), version('referentiel:formations')
+        )
+        avant = versions()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('register'), {
+                'username': 'nouveau', 'matricule': 'ENS00000099', 'password': 'motdepasse-solide-42',
+                'user_type': 'enseignant'
+            })
+            enseignant = User.objects.get(pk=self.enseignants[1].pk)
+            enseignant.set_password('autre-mot-de-passe-42')
+            enseignant.is_active = False
+            enseignant.save()
+        self.assertTrue(User.objects.filter(username='nouveau').exists())
+        self.assertEqual(versions(), avant)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            enseignant.email = 'prof1@example.com'
+            enseignant.save()
+        self.assertTrue(all(apres != valeur for apres, valeur in zip(versions(), avant)))
+
+    def test_renommage_d_un_enseignant_change_l_etag_du_planning_de_salle(self):
+        self.reserver(1)
+        url = reverse('salle-planning', args=[self.salles[0].pk])
+        etag = self.client.get(url).headers['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.enseignants[0].last_name = 'Renommé'
+            self.enseignants[0].save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_construction_concurrente_d_une_invalidation_non_enregistree(self):
+        self.reserver(1)
+        construire = planning.construire_plannings
+
+        def construire_pendant_une_ecriture(*args, **kwargs):
+            resultat = construire(*args, **kwargs)
+            # Réservation validée par un autre processus après la lecture des réservations
+            planning.invalider_plannings(self.demain)
+            return resultat
+
+        with mock.patch('core.planning.construire_plannings', construire_pendant_une_ecriture):
+            planning.plannings_en_cache(self.demain, self.demain)
+        planning.plannings_en_cache(self.demain, self.demain)
+        self.assertEqual(statistiques_cache_plannings()['misses'], 2)
+
+    def test_instantane_servi_depuis_le_cache(self):
+        self.reserver(1)
+        parametres = {'date': self.demain.isoformat()}
+        premiere = self.client.get(self.url, parametres)
+        with self.assertNumQueries(0):
+            seconde = self.client.get(self.url, parametres)
+        self.assertEqual(premiere.data, seconde.data)
+
+        statistiques = statistiques_cache_plannings()
+        self.assertEqual((statistiques['hits'], statistiques['misses']), (1, 1))
+
+    def test_periode_reconstruit_seulement_les_jours_manquants(self):
+        self.reserver(2)
+        self.client.get(self.url, {'date': self.demain.isoformat()})
+        self.client.get(self.url, {
+            'date_debut': self.demain.isoformat(),
+            'date_fin': (self.demain + timedelta(days=2)).isoformat()
+        })
+        statistiques = statistiques_cache_plannings()
+        self.assertEqual((statistiques['hits'], statistiques['misses']), (1, 3))
+
+    def test_reservation_invalide_le_jour_concerne(self):
+        parametres = {'date': self.demain.isoformat()}
+        self.client.get(self.url, parametres)
+        with self.captureOnCommitCallbacks(execute=True):
+            ReservationSalle.objects.create(
+                enseignant=self.enseignants[0], salle=self.salles[0], formation=self.formations[0],
+                creneau=self.creneaux[0], date=self.demain
+            )
+        reponse = self.client.get(self.url, parametres)
+        self.assertEqual(len(reponse.data['planning'][self.creneaux[0].nom]['salle']), 1)
+
+    def test_modification_d_une_salle_invalide_tous_les_jours(self):
+        self.reserver(1)
+        parametres = {'date': self.demain.isoformat()}
+        self.client.get(self.url, parametres)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.salles[0].nom = 'Z999'
+            self.salles[0].save()
+        reponse = self.client.get(self.url, parametres)
+        noms = {ligne['salle_detail']['nom'] for ligne in reponse.data['planning'][self.creneaux[0].nom]['salle']}
+        self.assertIn('Z999', noms)
+
+
+class EcritureReservationTests(DonneesReservationMixin, APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        charger_referentiels()
+        self.client.force_authenticate(self.enseignants[0])
+        self.url = reverse('reservationsalle-list')
+        self.donnees = {
+            'enseignant': self.enseignants[0].pk, 'salle': self.salles[0].pk, 'formation': self.formations[0].pk,
+            'creneau': self.creneaux[0].pk, 'date': self.demain.isoformat()
+        }
+
+    def test_creation_sans_verification_prealable(self):
+        # enseignant + salle + formation + créneau, puis l'insertion encadrée d'un savepoint
+        # (détails imbriqués lus dans les référentiels en cache) ; dans le savepoint, les
+        # agrégats (core/rollups.py) : lignes absentes créées à zéro puis incrémentées
+        with self.assertNumQueries(13):
+            reponse = self.client.post(self.url, self.donnees)
+        self.assertEqual(reponse.status_code, 201)
+        self.assertEqual(reponse.data['enseignant'], self.enseignants[0].pk)
+        self.assertFalse(any(verifier().values()))
+
+        # Lignes d'agrégats déjà présentes : un UPDATE par table
+        ReservationSalle.objects.all().delete()
+        with self.assertNumQueries(9):
+            reponse = self.client.post(self.url, self.donnees)
+        self.assertEqual(reponse.status_code, 201)
+        self.assertFalse(any(verifier().values()))
+
+    def test_agregat_derive_ne_bloque_pas_l_ecriture(self):
+        reponse = self.client.post(self.url, self.donnees)
+        # Compteur remis à zéro hors des signaux (import, correction manuelle...)
+        OccupationSalle.objects.update(nombre=0)
+        reponse = self.client.delete(reverse('reservationsalle-detail', args=[reponse.data['id']]))
+        self.assertEqual(reponse.status_code, 204)
+        self.assertEqual(OccupationSalle.objects.get(salle=self.salles[0]).nombre, 0)
+        self.assertEqual(self.client.post(self.url, self.donnees).status_code, 201)
+        self.assertFalse(any(verifier().values()))
+
+    def test_agregats_suivent_deplacement_et_suppression(self):
+        reponse = self.client.post(self.url, self.donnees)
+        url = reverse('reservationsalle-detail', args=[reponse.data['id']])
+        self.client.patch(url, {'salle': self.salles[1].pk})
+        self.assertFalse(any(verifier().values()))
+        self.assertEqual(OccupationSalle.objects.get(salle=self.salles[0]).nombre, 0)
+        self.client.delete(url)
+        self.assertFalse(any(verifier().values()))
+
+    def test_conflit_renvoie_409_avec_details(self):
+        premiere = self.client.post(self.url, self.donnees)
+        self.client.force_authenticate(self.enseignants[1])
+        reponse = self.client.post(self.url, self.donnees)
+        self.assertEqual(reponse.status_code, 409)
+        self.assertEqual(reponse.data['conflit']['id'], premiere.data['id'])
+        self.assertEqual(reponse.data['conflit']['formation'], self.formations[0].nom)
+        self.assertEqual(ReservationSalle.objects.count(), 1)
+
+    def test_deplacement_vers_une_cellule_prise_renvoie_409(self):
+        self.client.post(self.url, self.donnees)
+        autre = self.client.post(self.url, {**self.donnees, 'creneau': self.creneaux[1].pk})
+        reponse = self.client.patch(
+            reverse('reservationsalle-detail', args=[autre.data['id']]), {'creneau': self.creneaux[0].pk}
+        )
+        self.assertEqual(reponse.status_code, 409)
+        self.assertEqual(ReservationSalle.objects.get(pk=autre.data['id']).creneau, self.creneaux[1])
+
+
+class ReservationsEnMasseTests(DonneesReservationMixin, APITestCase):
+    """Création de réservations en masse (core/bulk.py)"""
+
+    def setUp(self):
+        cache.clear()
+        charger_referentiels()
+        self.client.force_authenticate(self.enseignants[0])
+        self.url = reverse('reservationsalle-en-masse')
+        ReservationSalle.objects.create(
+            enseignant=self.enseignants[1], salle=self.salles[0], formation=self.formations[1],
+            creneau=self.creneaux[0], date=self.demain
+        )
+
+    def element(self, salle=0, creneau=1, jours=0):
+        return {
+            'salle': self.salles[salle].pk, 'formation': self.formations[0].pk,
+            'creneau': self.creneaux[creneau].pk, 'date': (self.demain + timedelta(days=jours)).isoformat()
+        }
+
+    def lot(self, mode):
+        return {'mode': mode, 'reservations': [
+            self.element(jours=0), self.element(jours=1), self.element(jours=2),
+            self.element(creneau=0),  # occupée en base
+            self.element(jours=1),  # même cellule que l'élément 1
+            {**self.element(), 'salle': 999999},  # salle inconnue
+            {**self.element(), 'date': '2000-01-01'},  # date passée
+        ]}
+
+    def test_tout_ou_rien(self):
+        reponse = self.client.post(self.url, self.lot('tout_ou_rien'), format='json')
+        self.assertEqual(reponse.status_code, 400)
+        self.assertEqual(reponse.data['crees'], [])
+        self.assertEqual([erreur['index'] for erreur in reponse.data['erreurs']], [3, 4, 5, 6])
+        self.assertEqual(ReservationSalle.objects.count(), 1)
+
+    def test_partiel_invalide_une_fois_par_lot(self):
+        with mock.patch('core.signals.invalider_plannings') as invalider:
+            with self.captureOnCommitCallbacks(execute=True) as rappels:
+                reponse = self.client.post(self.url, self.lot('partiel'), format='json')
+        self.assertEqual(reponse.status_code, 201)
+        self.assertEqual(len(reponse.data['crees']), 3)
+        self.assertEqual([erreur['index'] for erreur in reponse.data['erreurs']], [3, 4, 5, 6])
+        self.assertEqual(
+            reponse.data['erreurs'][1]['erreurs'], {'non_field_errors': ["Même créneau que l'élément 1 du lot"]}
+        )
+        self.assertEqual(ReservationSalle.objects.count(), 4)
+        self.assertFalse(any(verifier().values()))
+        # Un rappel après la validation pour tout le lot, une invalidation sur l'ensemble des dates
+        self.assertEqual(len(rappels), 1)
+        invalider.assert_called_once()
+        self.assertEqual(set(invalider.call_args.args), {self.demain + timedelta(days=jour) for jour in range(3)})
+        self.assertFalse(occupancy_index.est_disponible('salle', self.salles[0].pk, self.demain, self.creneaux[1].pk))
+
+    def test_conflit_a_l_insertion_renvoie_409(self):
+        with mock.patch.object(ReservationSalle.objects, 'bulk_create', side_effect=IntegrityError):
+            reponse = self.client.post(
+                self.url, {'reservations': [self.element(), self.element(jours=1)]}, format='json'
+            )
+        self.assertEqual(reponse.status_code, 409)
+        self.assertEqual(ReservationSalle.objects.count(), 1)
+        self.assertFalse(any(verifier().values()))
+
+
+class DisponibiliteTests(DonneesReservationMixin, APITestCase):
+    """Index d'occupation (core/occupancy.py) et vérifications de disponibilité"""
+
+    def setUp(self):
+        occupancy_index.vider()
+        self.client.force_authenticate(self.enseignants[0])
+        self.reservation = ReservationSalle.objects.create(
+            enseignant=self.enseignants[0], salle=self.salles[0], formation=self.formations[0],
+            creneau=self.creneaux[1], date=self.demain
+        )
+
+    def test_index_suit_les_ecritures(self):
+        self.assertFalse(occupancy_index.est_disponible('salle', self.salles[0].pk, self.demain, self.creneaux[1].pk))
+        self.assertTrue(occupancy_index.est_disponible('salle', self.salles[0].pk, self.demain, self.creneaux[0].pk))
+        self.assertTrue(occupancy_index.est_disponible('salle', self.salles[1].pk, self.demain, self.creneaux[1].pk))
+
+        # Fenêtre chargée : les lectures suivantes ne touchent plus la base
+        with self.assertNumQueries(0):
+            self.assertTrue(occupancy_index.est_disponible(
+                'salle', self.salles[0].pk, self.demain + timedelta(days=1), self.creneaux[1].pk
+            ))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.reservation.delete()
+        self.assertTrue(occupancy_index.est_disponible('salle', self.salles[0].pk, self.demain, self.creneaux[1].pk))
+
+    def test_index_perime_corrige_par_la_verification(self):
+        occupancy_index.charger('salle', self.demain)
+        # Suppression sans signal : l'index croit encore le créneau réservé
+        ReservationSalle.objects.filter(pk=self.reservation.pk).delete()
+        self.assertFalse(occupancy_index.est_disponible('salle', self.salles[0].pk, self.demain, self.creneaux[1].pk))
+        self.assertEqual(
+            verifier_disponibilite('salle', self.salles[0].pk, self.demain, self.creneaux[1].pk), (True, None)
+        )
+        self.assertTrue(occupancy_index.est_disponible('salle', self.salles[0].pk, self.demain, self.creneaux[1].pk))
+
+    def test_verification_unitaire(self):
+        reponse = self.client.post(reverse('disponibilite'), {
+            'type_ressource': 'salle', 'ressource_id': self.salles[0].pk,
+            'date': self.demain.isoformat(), 'creneau_id': self.creneaux[1].pk
+        }, format='json')
+        self.assertEqual(reponse.status_code, 200)
+        self.assertFalse(reponse.data['disponible'])
+        self.assertIn(self.formations[0].nom, reponse.data['conflit'])
+
+    def test_matrice_en_lot(self):
+        reponse = self.client.post(reverse('disponibilite-batch'), {
+            'salles': [self.salles[0].pk, self.salles[1].pk],
+            'materiels': [self.materiels[0].pk],
+            'dates': [self.demain.isoformat()],
+            'creneaux': [self.creneaux[0].pk, self.creneaux[1].pk],
+        }, format='json')
+        self.assertEqual(reponse.status_code, 200)
+        self.assertEqual(reponse.data['salles'], {str(self.salles[0].pk): ['10'], str(self.salles[1].pk): ['11']})
+        self.assertEqual(reponse.data['materiels'], {str(self.materiels[0].pk): ['11']})
+
+    def test_identifiants_inconnus_refuses(self):
+        inconnu = Salle.objects.order_by('-pk').values_list('pk', flat=True).first() + 100
+        reponse = self.client.post(reverse('disponibilite-batch'), {
+            'salles': [self.salles[0].pk, inconnu],
+            'materiels': [inconnu],
+            'creneaux': [inconnu],
+            'dates': [self.demain.isoformat()],
+        }, format='json')
+        self.assertEqual(reponse.status_code, 400)
+        self.assertEqual(set(reponse.data), {'salles', 'materiels', 'creneaux'})
+        self.assertIn(str(inconnu), reponse.data['salles'][0])
+
+
+class SallesLibresTests(DonneesReservationMixin, APITestCase):
+    """Recherche des salles libres par anti-jointure (SalleViewSet.libres)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        Salle.objects.filter(pk=cls.salles[2].pk).update(equipements='Vidéoprojecteur')
+        Salle.objects.filter(pk=cls.salles[3].pk).update(equipements='Vidéoprojecteur, audio')
+        Salle.objects.create(nom='Z999', capacite=100, equipements='Vidéoprojecteur', active=False)
+
+    def setUp(self):
+        self.client.force_authenticate(self.etudiant)
+        self.url = reverse('salle-libres')
+        ReservationSalle.objects.create(
+            enseignant=self.enseignants[0], salle=self.salles[2], formation=self.formations[0],
+            creneau=self.creneaux[1], date=self.demain
+        )
+
+    def rechercher(self, **params):
+        params.setdefault('date_debut', self.demain.isoformat())
+        return self.client.get(self.url, {'capacite': 25, 'equipements': 'vidéoprojecteur', **params})
+
+    def test_anti_jointure_en_une_requete(self):
+        with self.assertNumQueries(1):
+            reponse = self.rechercher(creneaux=f'{self.creneaux[0].pk}')
+        self.assertEqual(reponse.status_code, 200)
+        self.assertEqual(
+            [(salle['nom'], salle['ecart_capacite']) for salle in reponse.data['salles']],
+            [('A102', 15), ('A103', 25)]
+        )
+        self.assertEqual(reponse.data['count'], 2)
+
+    def test_salle_reservee_exclue(self):
+        for params in ({'creneaux': f'{self.creneaux[0].pk},{self.creneaux[1].pk}'}, {}):
+            reponse = self.rechercher(**params)
+            self.assertEqual([salle['nom'] for salle in reponse.data['salles']], ['A103'])
+        # La réservation est hors de la période demandée
+        reponse = self.rechercher(date_debut=(self.demain + timedelta(days=1)).isoformat())
+        self.assertEqual([salle['nom'] for salle in reponse.data['salles']], ['A102', 'A103'])
+
+    def test_equipements_cumules(self):
+        reponse = self.rechercher(equipements='vidéoprojecteur,audio', capacite=0,
+                                  date_debut=(self.demain + timedelta(days=1)).isoformat())
+        self.assertEqual([salle['nom'] for salle in reponse.data['salles']], ['A103'])
+
+    def test_periode_bornee(self):
+        date_fin = self.demain + timedelta(days=RechercheSalleLibreSerializer.MAX_JOURS)
+        reponse = self.rechercher(date_fin=date_fin.isoformat())
+        self.assertEqual(reponse.status_code, 400)
+        self.assertIn('date_fin', reponse.data)
+        reponse = self.rechercher(date_fin=(date_fin - timedelta(days=1)).isoformat())
+        self.assertEqual(reponse.status_code, 200)
+        self.assertEqual(self.rechercher(date_fin=date.today().isoformat()).status_code, 400)
+
+
+class TauxUtilisationTests(DonneesReservationMixin, APITestCase):
+    """Taux d'utilisation (core/utilisation.py) comparés à une matrice calculée à la main"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        # Créé en dernier mais premier par heure de début : les identifiants de créneaux ne sont pas triés
+        cls.matin = CreneauHoraire.objects.create(nom='07:00-08:00', heure_debut=time(7, 0), heure_fin=time(8, 0))
+        cls.inactive = Salle.objects.create(nom='Z999', capacite=10, active=False)
+        cls.lundi = cls.demain + timedelta(days=(7 - cls.demain.weekday()) % 7)
+        mardi = cls.lundi + timedelta(days=1)
+        c0, c1, c3 = cls.creneaux[0], cls.creneaux[1], cls.creneaux[3]
+        s0, s1, s3 = cls.salles[0], cls.salles[1], cls.salles[3]
+        for salle, jour, creneau in [
+            (s0, cls.lundi, cls.matin), (s0, cls.lundi, c0), (s0, mardi, c0), (s0, mardi, c1),
+            (s1, cls.lundi, c0),
+            (s3, cls.lundi, c0), (s3, cls.lundi, c3),
+            # Ignorées : salle inactive, jour hors période
+            (cls.inactive, cls.lundi, c0), (s1, mardi + timedelta(days=1), c0),
+        ]:
+            ReservationSalle.objects.create(
+                enseignant=cls.enseignants[0], salle=salle, formation=cls.formations[0], creneau=creneau, date=jour
+            )
+        ReservationMateriel.objects.create(
+            enseignant=cls.enseignants[0], materiel=cls.materiels[1], formation=cls.formations[0],
+            creneau=c0, date=cls.lundi
+        )
+
+    def calculer(self, type_ressource='salle', top=3):
+        return taux_utilisation(type_ressource, self.lundi, self.lundi + timedelta(days=1), top=top)
+
+    def test_matrice_et_agregats_salles(self):
+        # Ressources, créneaux, puis triplets de la période
+        with self.assertNumQueries(3):
+            resultat = self.calculer()
+
+        # 4 salles actives x 2 jours x 5 créneaux, 7 cellules réservées
+        self.assertEqual(resultat['global'], 17.5)
+        self.assertEqual(
+            [(ligne['nom'], ligne['reserves'], ligne['disponibles'], ligne['taux']) for ligne in resultat['ressources']],
+            [('A100', 4, 10, 40.0), ('A103', 2, 10, 20.0), ('A101', 1, 10, 10.0), ('A102', 0, 10, 0.0)]
+        )
+        # Percentiles (interpolation linéaire) de [0, 10, 20, 40]
+        self.assertEqual(resultat['percentiles'], {'p50': 15.0, 'p75': 25.0, 'p90': 34.0, 'p95': 37.0})
+        self.assertEqual(
+            [(ligne['creneau'], ligne['taux']) for ligne in resultat['par_creneau']],
+            [(self.matin.pk, 12.5), (self.creneaux[0].pk, 50.0), (self.creneaux[1].pk, 12.5),
+             (self.creneaux[2].pk, 0.0), (self.creneaux[3].pk, 12.5)]
+        )
+        jours = {ligne['jour']: ligne['taux'] for ligne in resultat['jours_semaine']}
+        self.assertEqual((jours['lundi'], jours['mardi'], jours['mercredi']), (25.0, 10.0, 0.0))
+        # Pic : lundi sur le premier créneau de cours (3 salles sur 4) ; égalités dans l'ordre (jour, créneau)
+        self.assertEqual(
+            [(ligne['jour'], ligne['creneau'], ligne['taux']) for ligne in resultat['pics']],
+            [('lundi', self.creneaux[0].pk, 75.0), ('lundi', self.matin.pk, 25.0), ('lundi', self.creneaux[3].pk, 25.0)]
+        )
+
+    def test_matrice_occupation_indices(self):
+        salle_ids = np.array([self.salles[3].pk, self.salles[0].pk], dtype=np.int64)
+        creneau_ids = np.array([self.creneaux[0].pk, self.matin.pk], dtype=np.int64)
+        matrice = matrice_occupation('salle', salle_ids, self.lundi, 2, creneau_ids)
+        self.assertEqual(matrice.tolist(), [
+            [[True, False], [False, False]],
+            [[True, True], [True, False]],
+        ])
+
+    def test_types_materiel(self):
+        resultat = self.calculer('materiel')
+        self.assertEqual(resultat['global'], 2.5)
+        self.assertEqual(
+            [(ligne['id'], ligne['materiels'], ligne['taux']) for ligne in resultat['types_materiel']],
+            [(self.types_materiel[1].pk, 2, 5.0), (self.types_materiel[0].pk, 2, 0.0)]
+        )
+
+
+class InventaireMaterielTests(DonneesReservationMixin, APITestCase):
+    """Inventaire par type de matériel (TypeMaterielViewSet.inventaire)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.aujourd_hui = timezone.localdate()
+        demain = cls.aujourd_hui + timedelta(days=1)
+        inactif = Materiel.objects.create(
+            nom='Matériel HS', type_materiel=cls.types_materiel[0], numero_serie='SN-HS', active=False
+        )
+        for materiel, jour, creneau in [
+            (cls.materiels[0], cls.aujourd_hui, cls.creneaux[0]),
+            (cls.materiels[0], cls.aujourd_hui, cls.creneaux[1]),
+            (cls.materiels[1], cls.aujourd_hui, cls.creneaux[2]),
+            (cls.materiels[2], demain, cls.creneaux[0]),
+            # Ignorée : matériel inactif
+            (inactif, cls.aujourd_hui, cls.creneaux[1]),
+        ]:
+            ReservationMateriel.objects.create(
+                enseignant=cls.enseignants[0], materiel=materiel, formation=cls.formations[0], creneau=creneau, date=jour
+            )
+
+    def setUp(self):
+        self.client.force_authenticate(self.etudiant)
+
+    def inventaire(self, heure):
+        maintenant = timezone.localtime().replace(hour=heure, minute=0, second=0, microsecond=0)
+        horloge = mock.Mock(localtime=mock.Mock(return_value=maintenant))
+        with mock.patch('core.api_views.type_materiel_api_views.timezone', horloge):
+            with self.assertNumQueries(3):
+                reponse = self.client.get(reverse('typemateriel-inventaire'))
+        self.assertEqual(reponse.status_code, 200)
+        return reponse.data
+
+    def comptes(self, donnees):
+        return [
+            (ligne['nom'], ligne['actifs'], ligne['inactifs'], ligne['reserves_aujourd_hui'],
+             ligne['libres_prochain_creneau'])
+            for ligne in donnees['types']
+        ]
+
+    def test_prochain_creneau_du_jour(self):
+        donnees = self.inventaire(9)
+        self.assertEqual(donnees['prochain_creneau']['id'], self.creneaux[1].pk)
+        self.assertEqual(donnees['prochain_creneau']['date'], self.aujourd_hui)
+        self.assertEqual(self.comptes(donnees), [('Type 0', 2, 1, 1, 1), ('Type 1', 2, 0, 1, 2)])
+        self.assertEqual(
+            donnees['totaux'],
+            {'actifs': 4, 'inactifs': 1, 'reserves_aujourd_hui': 2, 'libres_prochain_creneau': 3}
+        )
+
+    def test_prochain_creneau_le_lendemain(self):
+        donnees = self.inventaire(20)
+        self.assertEqual(donnees['prochain_creneau']['id'], self.creneaux[0].pk)
+        self.assertEqual(donnees['prochain_creneau']['date'], self.aujourd_hui + timedelta(days=1))
+        self.assertEqual(self.comptes(donnees), [('Type 0', 2, 1, 1, 1), ('Type 1', 2, 0, 1, 2)])
+
+
+class PaginationCurseurTests(DonneesReservationMixin, APITestCase):
+
+    def setUp(self):
+        self.client.force_authenticate(self.enseignants[0])
+        self.url = reverse('reservationsalle-list')
+
+    @staticmethod
+    def curseur(valeurs):
+        return urlsafe_b64encode(json.dumps(valeurs).encode()).decode()
+
+    def test_parcours_complet_par_curseur(self):
+        self.reserver(1)
+        ids, parametres = [], {'pagination': 'curseur', 'page_size': 3}
+        url = self.url
+        while url:
+            reponse = self.client.get(url, parametres)
+            ids.extend(ligne['id'] for ligne in reponse.data['results'])
+            url, parametres = reponse.data['next'], {}
+        self.assertEqual(sorted(ids), sorted(ReservationSalle.objects.values_list('id', flat=True)))
+
+    def test_curseur_altere_renvoie_404(self):
+        for curseur in (
+            self.curseur(['2024-01-01', 'zz', 1]),
+            self.curseur(['2024-01-01', '08:00', 'abc']),
+            self.curseur(['2024-13-45', '08:00', 1]),
+            self.curseur(['2024-01-01', '08:00', None]),
+            self.curseur(['2024-01-01', '08:00']),
+            self.curseur({'date': '2024-01-01'}),
+            'pas-du-base64!',
+        ):
+            with self.subTest(curseur=curseur):
+                self.assertEqual(self.client.get(self.url, {'cursor': curseur}).status_code, 404)
+
+
+class SideloadTests(DonneesReservationMixin, APITestCase):
+    """Mode ?sideload=1 : identifiants dans les lignes, objets liés décrits une fois dans `included`"""
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_authenticate(self.enseignants[0])
+        self.reserver(2)
+
+    def test_liste_a_plat_dedupliquee(self):
+        url = reverse('reservationsalle-list')
+        complet = self.client.get(url, {'page_size': 100})
+        reponse = self.client.get(url, {'page_size': 100, 'sideload': 1})
+        self.assertEqual(reponse.status_code, 200)
+        lignes = reponse.data['results']
+        self.assertEqual(len(lignes), len(complet.data['results']))
+        self.assertEqual(len(lignes), 2 * len(self.creneaux) * len(self.salles))
+        self.assertNotIn('salle_detail', lignes[0])
+        self.assertIn('salle_detail', complet.data['results'][0])
+
+        # Chaque objet lié n'apparaît qu'une fois, quel que soit le nombre de lignes qui le citent
+        included = reponse.data['included']
+        self.assertEqual(set(included['salles']), {str(salle.pk) for salle in self.salles})
+        self.assertEqual(set(included['creneaux']), {str(creneau.pk) for creneau in self.creneaux})
+        self.assertEqual(set(included['formations']), {str(formation.pk) for formation in self.formations})
+        self.assertEqual(set(included['utilisateurs']), {str(enseignant.pk) for enseignant in self.enseignants})
+        # Le responsable imbriqué des formations rejoint les utilisateurs inclus
+        self.assertNotIn('responsable_detail', included['formations'][str(self.formations[0].pk)])
+
+        for ligne, detail in zip(lignes, complet.data['results']):
+            self.assertEqual(ligne['salle'], detail['salle'])
+            self.assertEqual(included['salles'][str(ligne['salle'])], detail['salle_detail'])
+
+    def test_detail_et_materiels_inclus(self):
+        reservation = ReservationMateriel.objects.filter(materiel=self.materiels[1]).first()
+        reponse = self.client.get(reverse('reservationmateriel-detail', args=[reservation.pk]), {'sideload': 'true'})
+        self.assertEqual(reponse.status_code, 200)
+        self.assertEqual(reponse.data['materiel'], self.materiels[1].pk)
+        # Les objets inclus sont parcourus à leur tour : le type du matériel est inclus
+        self.assertEqual(set(reponse.data['included']['materiels']), {str(self.materiels[1].pk)})
+        self.assertEqual(set(reponse.data['included']['types_materiel']), {str(self.types_materiel[1].pk)})
+
+    def test_planning_general_fusionne_les_jours(self):
+        reponse = self.client.get(reverse('planning-general'), {
+            'date_debut': self.demain.isoformat(),
+            'date_fin': (self.demain + timedelta(days=1)).isoformat(),
+            'sideload': 1
+        })
+        self.assertEqual(reponse.status_code, 200)
+        self.assertEqual(set(reponse.data['included']['salles']), {str(salle.pk) for salle in self.salles})
+        self.assertEqual(set(reponse.data['included']['materiels']), {str(materiel.pk) for materiel in self.materiels})
+
+
+class ExportCSVTests(DonneesReservationMixin, APITestCase):
+
+    def test_formules_neutralisees(self):
+        RecapitulatifHoraire.objects.create(
+            formation=self.formations[0], enseignant=self.enseignants[0], date=self.demain,
+            creneau=self.creneaux[0], sujet='=HYPERLINK("http://exemple.invalid")', commentaires='@SUM(A1:A2)'
+        )
+        self.client.force_authenticate(self.enseignants[0])
+        reponse = self.client.get(reverse('recapitulatifhoraire-export'))
+        self.assertEqual(reponse.status_code, 200)
+        lignes = list(csv.DictReader(b''.join(reponse.streaming_content).decode('utf-8-sig').splitlines()))
+        self.assertEqual(lignes[0]['sujet'], '\'=HYPERLINK("http://exemple.invalid")')
+        self.assertEqual(lignes[0]['commentaires'], "'@SUM(A1:A2)")
+        self.assertEqual(lignes[0]['date'], self.demain.isoformat())
+
+
+class RenduJSONTests(DonneesReservationMixin, APITestCase):
+    """ORJSONRenderer comparé au JSONRenderer de DRF (core/renderers.py)"""
+
+    def test_memes_octets_que_drf(self):
+        self.reserver(1)
+        self.client.force_authenticate(self.enseignants[0])
+        planning_general = self.client.get(reverse('planning-general'), {'date_debut': self.demain.isoformat()}).data
+        charges = [
+            planning_general,
+            {
+                'date': date(2024, 1, 1), 'heure': time(8, 30), 'montant': Decimal('12.50'),
+                'identifiant': uuid.UUID(int=1), 'texte': 'Amphi « Curie » \u2028 😀', 'vide': None,
+                'drapeaux': [True, False], 'entiers': [0, -1, 2 ** 63 - 1, 2 ** 70], 'ratio': 0.25,
+                'imbrique': {1: ('a', 'b')},
+            },
+            [],
+        ]
+        for donnees in charges:
+            with self.subTest(donnees=type(donnees).__name__):
+                self.assertEqual(ORJSONRenderer().render(donnees), JSONRenderer().render(donnees))
+
+    def test_differences_documentees_sur_les_flottants(self):
+        # Exposant : même valeur une fois décodée
+        for valeur, attendu in ((1e16, b'1e16'), (1e-7, b'1e-7')):
+            with self.subTest(valeur=valeur):
+                rapide, drf = ORJSONRenderer().render([valeur]), JSONRenderer().render([valeur])
+                self.assertEqual(rapide, b'[' + attendu + b']')
+                self.assertNotEqual(rapide, drf)
+                self.assertEqual(json.loads(rapide), json.loads(drf))
+        # Non finis : null au lieu de ValueError
+        for valeur in (float('nan'), float('inf'), float('-inf')):
+            with self.subTest(valeur=valeur):
+                with self.assertRaises(ValueError):
+                    JSONRenderer().render([valeur])
+                self.assertEqual(ORJSONRenderer().render([valeur]), b'[null]')
+
+
+class TendancesTests(DonneesReservationMixin, APITestCase):
+    """Cache des semaines et mois révolus (core/tendances.py)"""
+
+    def setUp(self):
+        cache.clear()
+        self.passe = date.today() - timedelta(days=21)
+        self.debut = self.passe - timedelta(days=self.passe.weekday())
+        ReservationMateriel.objects.create(
+            enseignant=self.enseignants[0], materiel=self.materiels[0], formation=self.formations[0],
+            creneau=self.creneaux[0], date=self.passe
+        )
+
+    def tendances(self):
+        return tendances_en_cache(self.passe, self.passe, 'semaine', 'type_materiel')
+
+    def test_periode_revolue_en_cache_avec_expiration(self):
+        with mock.patch.object(cache, 'set_many', wraps=cache.set_many) as set_many:
+            serie, = self.tendances()
+        self.assertEqual((serie['debut'], serie['materiels']), (self.debut, 1))
+        self.assertEqual(serie['groupes'], {self.types_materiel[0].pk: {'materiels': 1}})
+        self.assertEqual(set_many.call_args_list[0].kwargs['timeout'], settings.TENDANCES_REVOLUES_CACHE_TIMEOUT)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.tendances(), [serie])
+
+    def test_calcul_invalide_pendant_la_construction_non_enregistre(self):
+        construire = tendances.construire_tendances
+
+        def construire_pendant_une_ecriture(*args):
+            resultats = construire(*args)
+            invalider_tendances()
+            return resultats
+
+        with mock.patch('core.tendances.construire_tendances', side_effect=construire_pendant_une_ecriture):
+            self.tendances()
+        with CaptureQueriesContext(connection) as requetes:
+            self.tendances()
+        self.assertTrue(requetes.captured_queries)
+
+    def test_invalidation_par_les_signaux(self):
+        generation = version(VERSION_TENDANCES)
+        materiel = Materiel.objects.get(pk=self.materiels[0].pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            Materiel.objects.create(nom='Nouveau', type_materiel=self.types_materiel[0], numero_serie='SN99')
+            materiel.nom = 'Renommé'
+            materiel.save()
+        self.assertEqual(version(VERSION_TENDANCES), generation)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            materiel.type_materiel = self.types_materiel[1]
+            materiel.save()
+        self.assertNotEqual(version(VERSION_TENDANCES), generation)
+
+        generation = version(VERSION_TENDANCES)
+        with self.captureOnCommitCallbacks(execute=True):
+            ReservationMateriel.objects.get().delete()
+        self.assertNotEqual(version(VERSION_TENDANCES), generation)
+
+
+class ReferentielsTests(DonneesReservationMixin, APITestCase):
+    """Cache des référentiels (core/referentiels.py)"""
+
+    def setUp(self):
+        cache.clear()
+        charger_referentiels()
+
+    def test_versions_mises_en_cache_avec_expiration(self):
+        cache.clear()
+        with mock.patch.object(cache, 'set', wraps=cache.set) as cache_set:
+            referentiel('salles')
+        cle = f"referentiel:salles:{version('referentiel:salles')}"
+        self.assertIn(mock.call(cle, mock.ANY, timeout=settings.REFERENTIELS_CACHE_TIMEOUT), cache_set.call_args_list)
+
+    def test_objet_absent_lu_sans_publier_la_ligne(self):
+        generation = version('referentiel:salles')
+        # Dans la transaction du test : le signal n'invalide qu'à la validation
+        salle = Salle.objects.create(nom='B201', capacite=40)
+        with self.assertNumQueries(1):
+            self.assertEqual(detail_referentiel('salles', salle.pk)['nom'], 'B201')
+        self.assertEqual(version('referentiel:salles'), generation)
+        self.assertNotIn(salle.pk, cache.get(f'referentiel:salles:{generation}'))
+        self.assertIsNone(detail_referentiel('salles', 0))
+
+
+class PermissionsObjetTests(DonneesReservationMixin, APITestCase):
+    """Les contrôles par objet comparent des identifiants : aucune requête sur les objets chargés par les vues"""
+
+    def setUp(self):
+        cache.clear()
+        charger_referentiels()
+        ReservationSalle.objects.create(
+            enseignant=self.enseignants[0], salle=self.salles[0], formation=self.formations[1],
+            creneau=self.creneaux[0], date=self.demain
+        )
+        RecapitulatifHoraire.objects.create(
+            formation=self.formations[0], enseignant=self.enseignants[1], date=self.demain, creneau=self.creneaux[0]
+        )
+        self.reservation = ReservationSalle.objects.get()
+        # Comme la vue et l'admin : formation chargée avec le récapitulatif
+        self.recapitulatif = RecapitulatifHoraire.objects.select_related('formation').get()
+
+    def requete(self, utilisateur, methode='patch'):
+        requete = Request(getattr(APIRequestFactory(), methode)('/'))
+        requete.user = utilisateur
+        return requete
+
+    def test_proprietaire_de_la_reservation(self):
+        with self.assertNumQueries(0):
+            for permission in (IsOwnerOrReadOnly(), IsEnseignantOwner()):
+                self.assertTrue(permission.has_object_permission(
+                    self.requete(self.enseignants[0]), None, self.reservation
+                ))
+                self.assertFalse(permission.has_object_permission(
+                    self.requete(self.enseignants[1]), None, self.reservation
+                ))
+
+    def test_responsable_de_la_formation(self):
+        permission = IsResponsableFormationOrReadOnly()
+        with self.assertNumQueries(0):
+            self.assertTrue(permission.has_object_permission(
+                self.requete(self.enseignants[0]), None, self.recapitulatif
+            ))
+            # L'auteur du récapitulatif n'est pas responsable de la formation
+            self.assertFalse(permission.has_object_permission(
+                self.requete(self.enseignants[1]), None, self.recapitulatif
+            ))
+            self.assertTrue(permission.has_object_permission(
+                self.requete(self.enseignants[1], 'get'), None, self.recapitulatif
+            ))
+
+    def test_admin_des_recapitulatifs(self):
+        modele_admin = RecapitulatifHoraireAdmin(RecapitulatifHoraire, admin.site)
+        requete = RequestFactory().get('/')
+        with self.assertNumQueries(0):
+            requete.user = self.enseignants[0]
+            self.assertTrue(modele_admin.has_change_permission(requete, self.recapitulatif))
+            self.assertTrue(modele_admin.has_delete_permission(requete, self.recapitulatif))
+            requete.user = self.enseignants[1]
+            self.assertFalse(modele_admin.has_change_permission(requete, self.recapitulatif))
+
+    def test_modification_reservee_au_responsable(self):
+        url = reverse('recapitulatifhoraire-detail', args=[self.recapitulatif.pk])
+        self.client.force_authenticate(self.enseignants[1])
+        self.assertEqual(self.client.patch(url, {'sujet': 'Révisions'}).status_code, 403)
+        self.client.force_authenticate(self.enseignants[0])
+        self.assertEqual(self.client.patch(url, {'sujet': 'Révisions'}).status_code, 200)
+
+    def test_changement_de_responsable_sans_signal(self):
+        url = reverse('recapitulatifhoraire-detail', args=[self.recapitulatif.pk])
+        self.client.force_authenticate(self.enseignants[0])
+        self.assertEqual(self.client.patch(url, {'sujet': 'Révisions'}).status_code, 200)
+        # update() n'émet pas post_save : le référentiel des formations en cache n'est pas invalidé
+        Formation.objects.filter(pk=self.formations[0].pk).update(responsable=self.enseignants[1])
+        self.assertEqual(self.client.patch(url, {'sujet': 'Révisions'}).status_code, 403)
+        self.client.force_authenticate(self.enseignants[1])
+        self.assertEqual(self.client.patch(url, {'sujet': 'Révisions'}).status_code, 200)
+
+
+class CalendrierTests(DonneesReservationMixin, APITestCase):
+    """Flux iCalendar authentifiés par le jeton ?token= (core/api_views/calendrier_views.py)"""
+
+    def setUp(self):
+        cache.clear()
+        ReservationSalle.objects.create(
+            enseignant=self.enseignants[0], salle=self.salles[0], formation=self.formations[0],
+            creneau=self.creneaux[0], date=self.demain
+        )
+        self.client.force_authenticate(self.enseignants[0])
+        self.jeton = self.client.post(reverse('calendrier-jeton')).data['jeton']
+        self.client.force_authenticate(None)
+        self.url = reverse('calendrier-enseignant', args=[self.enseignants[0].pk])
+
+    def test_jeton_valide_et_reponse_304(self):
+        reponse = self.client.get(self.url, {'token': self.jeton})
+        self.assertEqual(reponse.status_code, 200)
+        self.assertTrue(reponse['Content-Type'].startswith('text/calendar'))
+        self.assertIn(b'BEGIN:VCALENDAR', reponse.content)
+        self.assertIn(self.salles[0].nom.encode(), reponse.content)
+        salle = self.client.get(reverse('calendrier-salle', args=[self.salles[0].pk]), {'token': self.jeton})
+        self.assertEqual(salle.status_code, 200)
+
+        non_modifie = self.client.get(self.url, {'token': self.jeton}, HTTP_IF_NONE_MATCH=reponse['ETag'])
+        self.assertEqual(non_modifie.status_code, 304)
+        self.assertEqual(non_modifie.content, b'')
+
+    def test_jeton_invalide_ou_absent(self):
+        self.assertEqual(self.client.get(self.url, {'token': 'inconnu'}).status_code, 401)
+        self.assertEqual(self.client.get(self.url).status_code, 401)
+
+    def test_jeton_revoque_ou_remplace(self):
+        self.client.force_authenticate(self.enseignants[0])
+        nouveau = self.client.post(reverse('calendrier-jeton')).data['jeton']
+        self.client.force_authenticate(None)
+        self.assertEqual(self.client.get(self.url, {'token': self.jeton}).status_code, 401)
+        self.assertEqual(self.client.get(self.url, {'token': nouveau}).status_code, 200)
+
+        self.client.force_authenticate(self.enseignants[0])
+        self.assertEqual(self.client.delete(reverse('calendrier-jeton')).status_code, 204)
+        self.client.force_authenticate(None)
+        self.assertEqual(self.client.get(self.url, {'token': nouveau}).status_code, 401)
+
+    def test_utilisateur_inactif_refuse(self):
+        User.objects.filter(pk=self.enseignants[0].pk).update(is_active=False)
+        self.assertEqual(self.client.get(self.url, {'token': self.jeton}).status_code, 401)
+
+    def test_flux_enseignant_refuse_aux_etudiants(self):
+        self.client.force_authenticate(self.etudiant)
+        jeton = self.client.post(reverse('calendrier-jeton')).data['jeton']
+        self.client.force_authenticate(None)
+        self.assertEqual(self.client.get(self.url, {'token': jeton}).status_code, 403)
+
+
+class EmploiDuTempsTests(DonneesReservationMixin, APITestCase):
+    """Génération des emplois du temps PDF (core/emplois_du_temps.py, core/tasks.py)"""
+
+    def setUp(self):
+        cache.clear()
+        self.dossier = self.enterContext(tempfile.TemporaryDirectory())
+        self.enterContext(override_settings(EMPLOIS_DU_TEMPS_ROOT=self.dossier))
+        self.client.force_authenticate(self.enseignants[0])
+        self.url = reverse('emploi-du-temps')
+        self.donnees = {'type': 'salle', 'id': self.salles[0].pk, 'semaine': self.demain.isoformat()}
+        ReservationSalle.objects.create(
+            enseignant=self.enseignants[0], salle=self.salles[0], formation=self.formations[0],
+            creneau=self.creneaux[0], date=self.demain
+        )
+
+    def test_generation_en_tache_de_fond(self):
+        with mock.patch('core.api_views.emploi_du_temps_views.generer_emploi_du_temps_pdf.delay') as delay:
+            reponse = self.client.post(self.url, self.donnees)
+        self.assertEqual(reponse.status_code, 202)
+        cle = reponse.data['cle']
+        url_statut = reverse('emploi-du-temps-statut', args=[cle])
+        self.assertEqual(self.client.get(url_statut).data['statut'], 'en_cours')
+
+        # Exécution de la tâche par le worker
+        self.assertEqual(generer_emploi_du_temps_pdf(*delay.call_args.args), cle)
+        statut = self.client.get(url_statut).data
+        self.assertEqual(statut['statut'], 'pret')
+        fichier = self.client.get(reverse('emploi-du-temps-fichier', args=[cle]))
+        self.assertEqual(fichier.status_code, 200)
+        self.assertIn('immutable', fichier['Cache-Control'])
+        self.assertTrue(b''.join(fichier.streaming_content).startswith(b'%PDF'))
+
+        # Fichier à jour : servi immédiatement
+        reponse = self.client.post(self.url, self.donnees)
+        self.assertEqual((reponse.status_code, reponse.data['cle']), (200, cle))
+
+    def test_erreur_de_generation_signalee(self):
+        with mock.patch('core.api_views.emploi_du_temps_views.generer_emploi_du_temps_pdf.delay') as delay:
+            cle = self.client.post(self.url, self.donnees).data['cle']
+        with mock.patch('core.tasks.generer_emploi_du_temps', side_effect=RuntimeError('PDF illisible')):
+            with self.assertRaises(RuntimeError):
+                generer_emploi_du_temps_pdf(*delay.call_args.args)
+        statut = self.client.get(reverse('emploi-du-temps-statut', args=[cle])).data
+        self.assertEqual((statut['statut'], statut['erreur']), ('erreur', 'PDF illisible'))
+
+    def test_renommage_d_un_enseignant_change_le_fichier(self):
+        premiere = self.client.post(self.url, self.donnees)
+        self.assertEqual(premiere.status_code, 200)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.enseignants[0].last_name = 'Renommé'
+            self.enseignants[0].save()
+        seconde = self.client.post(self.url, self.donnees)
+        self.assertEqual(seconde.status_code, 200)
+        self.assertNotEqual(seconde.data['cle'], premiere.data['cle'])
+        self.assertEqual(len(os.listdir(self.dossier)), 1)
+
+    def test_purge_des_semaines_passees(self):
+        aujourd_hui = date(2026, 10, 19)
+        for nom in ('salle-1-2026-08-03-0123456789abcdef.pdf', 'salle-1-2026-10-12-0123456789abcdef.pdf',
+                    'abandonne.tmp', 'recent.tmp'):
+            open(os.path.join(self.dossier, nom), 'wb').close()
+        ancien = time_module.time() - 2 * 24 * 3600
+        os.utime(os.path.join(self.dossier, 'abandonne.tmp'), (ancien, ancien))
+        self.assertEqual(purger_emplois_du_temps(aujourd_hui), 2)
+        self.assertEqual(sorted(os.listdir(self.dossier)), ['recent.tmp', 'salle-1-2026-10-12-0123456789abcdef.pdf'])
+
+
+@override_settings(CONNEXION_ECHECS_MAX=3)
+class ConnexionTests(APITestCase):
+    """Limitation des échecs de connexion (core/authentication.py)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.utilisateur = User.objects.create_user(
+            username='prof', matricule='ENS00000001', email='prof@example.com', password='password123',
+            user_type='enseignant'
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.url = reverse('login')
+
+    def connecter(self, mot_de_passe, adresse='10.0.0.1'):
+        return self.client.post(self.url, {'identifier': 'prof@example.com', 'password': mot_de_passe},
+                                format='json', REMOTE_ADDR=adresse)
+
+    def test_blocage_apres_echecs_depuis_une_adresse(self):
+        for _ in range(3):
+            self.assertEqual(self.connecter('faux').status_code, 400)
+        # Bloqué depuis cette adresse, même avec le bon mot de passe, sans requête SQL
+        with self.assertNumQueries(0):
+            self.assertEqual(self.connecter('password123').status_code, 429)
+        # Le titulaire du compte se connecte depuis une autre adresse
+        self.assertEqual(self.connecter('password123', adresse='10.0.0.2').status_code, 200)
+
+    def test_succes_remet_le_compteur_a_zero(self):
+        for _ in range(2):
+            self.connecter('faux')
+        self.assertEqual(self.connecter('password123').status_code, 200)
+        for _ in range(2):
+            self.assertEqual(self.connecter('faux').status_code, 400)
+        self.assertEqual(self.connecter('faux').status_code, 400)
+        self.assertEqual(self.connecter('faux').status_code, 429)
+
+
+class JetonsJWTTests(APITestCase):
+    """Liste noire en cache et purge des jetons expirés (core/jetons.py)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.utilisateur = User.objects.create_user(
+            username='prof', matricule='ENS00000001', password='password123', user_type='enseignant'
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.url = reverse('token-refresh')
+
+    def jeton(self):
+        return self.client.post(reverse('login'), {'identifier': 'ENS00000001', 'password': 'password123'}).data['refresh']
+
+    def test_jeton_rafraichi_puis_rejoue_refuse(self):
+        ancien = self.jeton()
+        self.assertEqual(self.client.post(self.url, {'refresh': ancien}).status_code, 200)
+        self.assertEqual(self.client.post(self.url, {'refresh': ancien}).status_code, 401)
+        # Refus en cache : aucune lecture de la table
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.post(self.url, {'refresh': ancien}).status_code, 401)
+        cache.clear()
+        self.assertEqual(self.client.post(self.url, {'refresh': ancien}).status_code, 401)
+
+    def test_revocation_par_un_autre_processus(self):
+        jeton = RefreshToken(self.jeton())
+        jti, exp = jeton['jti'], jeton['exp']
+        self.assertFalse(est_sur_liste_noire(jti, exp))
+        # Mise sur liste noire dont ce processus ne voit pas l'écriture en cache (cache non partagé)
+        with mock.patch('core.signals.memoriser_liste_noire'):
+            BlacklistedToken.objects.create(token=OutstandingToken.objects.get(jti=jti))
+        self.assertTrue(est_sur_liste_noire(jti, exp))
+        self.assertEqual(self.client.post(self.url, {'refresh': str(jeton)}).status_code, 401)
+
+    def test_purge_des_jetons_expires(self):
+        maintenant = timezone.now()
+        jetons = [
+            OutstandingToken.objects.create(
+                user=self.utilisateur, jti=f'jti{i}', token=f'jeton{i}',
+                expires_at=maintenant + timedelta(days=-1 if i < 5 else 1)
+            )
+            for i in range(7)
+        ]
+        for jeton in (jetons[0], jetons[3], jetons[6]):
+            BlacklistedToken.objects.create(token=jeton)
+        self.assertEqual(purger_jetons_expires(taille_lot=2), 5)
+        self.assertEqual(set(OutstandingToken.objects.values_list('jti', flat=True)), {'jti5', 'jti6'})
+        self.assertEqual(list(BlacklistedToken.objects.values_list('token__jti', flat=True)), ['jti6'])
+
+
+class AuthentificationJWTTests(APITestCase):
+    """Utilisateur des jetons d'accès gardé en cache (core/authentication.py)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.utilisateur = User.objects.create_user(
+            username='prof', matricule='ENS00000001', password='password123', user_type='enseignant'
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.url = reverse('current-user')
+
+    def connecter(self, mot_de_passe='password123'):
+        self.client.credentials()
+        reponse = self.client.post(reverse('login'), {'identifier': 'ENS00000001', 'password': mot_de_passe})
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {reponse.data['access']}")
+        return reponse.data['access']
+
+    def test_utilisateur_en_cache_sans_hachage(self):
+        acces = AccessToken(self.connecter())
+        authentification = CachedJWTAuthentication()
+        authentification.get_user(acces)
+        with self.assertNumQueries(0):
+            utilisateur = authentification.get_user(acces)
+        self.assertEqual((utilisateur.pk, utilisateur.user_type), (self.utilisateur.pk, 'enseignant'))
+        entree = cache.get(f"utilisateur:{self.utilisateur.pk}:{version(f'utilisateur:{self.utilisateur.pk}')}")
+        self.assertNotIn('password', entree[0])
+        self.assertNotIn(self.utilisateur.password, repr(entree))
+        self.assertEqual(self.client.get(self.url).data['matricule'], 'ENS00000001')
+
+    def test_desactivation_refuse_le_jeton(self):
+        self.connecter()
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+        with self.captureOnCommitCallbacks(execute=True):
+            utilisateur = User.objects.get(pk=self.utilisateur.pk)
+            utilisateur.is_active = False
+            utilisateur.save()
+        self.assertEqual(self.client.get(self.url).status_code, 401)
+
+    def test_changement_de_mot_de_passe(self):
+        # Réglage lu par simplejwt sur son objet api_settings, que override_settings ne remplace pas en place
+        with mock.patch.object(jwt_api_settings, 'CHECK_REVOKE_TOKEN', True):
+            self.connecter()
+            self.assertEqual(self.client.get(self.url).status_code, 200)
+            # Utilisateur servi depuis le cache : le mot de passe est lu à la demande
+            with self.captureOnCommitCallbacks(execute=True):
+                reponse = self.client.post(reverse('reset-password'), {
+                    'old_password': 'password123', 'new_password': 'nouveau-mot-de-passe-42'
+                })
+            self.assertEqual(reponse.status_code, 200)
+            self.assertEqual(self.client.get(self.url).status_code, 401)
+            self.connecter('nouveau-mot-de-passe-42')
+            self.assertEqual(self.client.get(self.url).status_code, 200)
+
+
+class ImportUtilisateursTests(APITestCase):
+    """Import de rosters CSV (core/importation.py) par l'API et par la commande"""
+
+    def setUp(self):
+        self.admin = User.objects.create_user(
+            username='admin', matricule='ADM00000001', email='admin@exemple.org', password='password123', is_staff=True
+        )
+        self.client.force_authenticate(self.admin)
+        self.url = reverse('user-importer')
+
+    def importer(self, contenu, **donnees):
+        fichier = SimpleUploadedFile('roster.csv', contenu.encode(), content_type='text/csv')
+        return self.client.post(self.url, {'fichier': fichier, **donnees}, format='multipart')
+
+    def test_comptes_crees_avec_matricules_et_mots_de_passe(self):
+        reponse = self.importer("nom;prenom;email;type\nDupont;Jean;jean@exemple.org;etudiant\nMartin;Léa;;enseignant\n")
+        self.assertEqual(reponse.status_code, 201)
+        self.assertEqual(reponse.data['crees'], 2)
+        etudiant, enseignant = reponse.data['utilisateurs']
+        self.assertTrue(etudiant['matricule'].startswith('ETU'))
+        self.assertTrue(enseignant['matricule'].startswith('ENS'))
+        compte = User.objects.get(matricule=etudiant['matricule'])
+        self.assertEqual((compte.username, compte.email), (etudiant['matricule'], 'jean@exemple.org'))
+        self.assertTrue(compte.check_password(etudiant['mot_de_passe']))
+
+    def test_erreurs_signalees_par_ligne_sans_rien_creer(self):
+        reponse = self.importer(
+            "nom,prenom,email,username,type\n"
+            "Dupont,Jean,jean@exemple.org,,etudiant\n"
+            "Durand,Paul,jean@exemple.org,,etudiant\n"
+            "Martin,Léa,admin@exemple.org,,etudiant\n"
+            "Petit,Zoé,,admin,etudiant\n"
+            "Roux,Max,pas-un-email,,inconnu\n"
+        )
+        self.assertEqual(reponse.status_code, 400)
+        erreurs = reponse.data['lignes']
+        self.assertEqual(sorted(erreurs), [3, 4, 5, 6])
+        self.assertIn('email en double (ligne 2)', erreurs[3])
+        self.assertIn('email déjà utilisé : admin@exemple.org', erreurs[4])
+        self.assertIn('username déjà utilisé : admin', erreurs[5])
+        self.assertEqual(len(erreurs[6]), 2)
+        self.assertEqual(User.objects.count(), 1)
+
+    def test_matricules_generes_evitent_les_usernames_pris(self):
+        # Username existant et username du roster qui coïncident avec les prochains matricules
+        User.objects.create_user(username='ETU00000001', matricule='ADM00000002', password='password123')
+        reponse = self.importer("nom,prenom,username\nDupont,Jean,\nMartin,Léa,ETU00000002\n", user_type='etudiant')
+        self.assertEqual(reponse.status_code, 201)
+        self.assertEqual([compte['username'] for compte in reponse.data['utilisateurs']], ['ETU00000003', 'ETU00000002'])
+
+    def test_reserve_aux_administrateurs(self):
+        self.client.force_authenticate(User.objects.create_user(
+            username='prof', matricule='ENS00000001', password='password123'
+        ))
+        self.assertEqual(self.importer("nom,prenom\nDupont,Jean\n", user_type='etudiant').status_code, 403)
+
+    def test_commande(self):
+        with tempfile.TemporaryDirectory() as dossier:
+            roster, sortie = os.path.join(dossier, 'roster.csv'), os.path.join(dossier, 'identifiants.csv')
+            with open(roster, 'w', encoding='utf-8') as fichier:
+                fichier.write("nom,prenom,email\nDupont,Jean,jean@exemple.org\nMartin,Léa,\n")
+            call_command('importer_utilisateurs', roster, '--type', 'enseignant', '--sortie', sortie, stdout=io.StringIO())
+            with open(sortie, encoding='utf-8') as fichier:
+                comptes = list(csv.DictReader(fichier))
+            self.assertEqual(len(comptes), 2)
+            for compte in comptes:
+                self.assertTrue(User.objects.get(matricule=compte['matricule']).check_password(compte['mot_de_passe']))
+
+            # Roster invalide : erreurs par ligne, aucun compte créé
+            with open(roster, 'w', encoding='utf-8') as fichier:
+                fichier.write("nom,prenom,email\nDurand,Paul,jean@exemple.org\n")
+            with self.assertRaisesMessage(CommandError, 'ligne 2 : email déjà utilisé : jean@exemple.org'):
+                call_command('importer_utilisateurs', roster, '--type', 'enseignant', '--sortie', sortie)
+            self.assertEqual(User.objects.count(), 3)
+
+
+class ReservationConcurrenteTests(TransactionTestCase):
+    """Plusieurs enseignants réservent la même cellule au même instant : une seule réservation passe"""
+    NB_THREADS = 8
+
+    @classmethod
+    def setUpClass(cls):
+        # Threads simultanés : en mémoire, SQLite refuse l'écriture concurrente (table verrouillée)
+        # au lieu d'attendre le verrou. Cette classe utilise donc sa propre base de test sur
+        # fichier, migrée pour elle ; les connexions des threads sont créées depuis ces réglages
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            dossier = cls.enterClassContext(tempfile.TemporaryDirectory())
+            cls.enterClassContext(cls.base_sur_fichier(os.path.join(dossier, 'concurrence.sqlite3')))
+        super().setUpClass()
+
+    @staticmethod
+    @contextmanager
+    def base_sur_fichier(nom):
+        reglages, en_memoire = connections.settings[DEFAULT_DB_ALIAS], connections[DEFAULT_DB_ALIAS]
+        connections.settings[DEFAULT_DB_ALIAS] = {**reglages, 'NAME': nom}
+        connections[DEFAULT_DB_ALIAS] = connections.create_connection(DEFAULT_DB_ALIAS)
+        try:
+            call_command('migrate', verbosity=0, interactive=False)
+            yield
+        finally:
+            connections[DEFAULT_DB_ALIAS].close()
+            connections.settings[DEFAULT_DB_ALIAS] = reglages
+            connections[DEFAULT_DB_ALIAS] = en_memoire
+
+    def setUp(self):
+        self.creneau = CreneauHoraire.objects.create(nom='08:00-10:00', heure_debut=time(8, 0), heure_fin=time(10, 0))
+        self.salle = Salle.objects.create(nom='A101', capacite=30)
+        self.enseignants = [
+            User.objects.create_user(
+                username=f'prof{i}', matricule=f'ENS{i:08d}', password='password123', user_type='enseignant'
+            )
+            for i in range(self.NB_THREADS)
+        ]
+        self.formation = Formation.objects.create(nom='Formation', code='FORM0000001', responsable=self.enseignants[0])
+
+    def test_une_seule_reservation_gagne(self):
+        depart = threading.Barrier(self.NB_THREADS)
+        statuts = []
+        donnees = {
+            'salle': self.salle.pk, 'formation': self.formation.pk, 'creneau': self.creneau.pk,
+            'date': (date.today() + timedelta(days=1)).isoformat()
+        }
+
+        def reserver(enseignant):
+            client = APIClient()
+            client.force_authenticate(enseignant)
+            try:
+                depart.wait()
+                statuts.append(client.post(
+                    reverse('reservationsalle-list'), {**donnees, 'enseignant': enseignant.pk}
+                ).status_code)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=reserver, args=(enseignant,)) for enseignant in self.enseignants]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(sorted(statuts), [201] + [409] * (self.NB_THREADS - 1))
+        self.assertEqual(ReservationSalle.objects.count(), 1)
@@ -2,19 +2,21 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from core.api_views.materiel_api_views import MaterielViewSet
-from core.api_views.authentication_views import UserViewSet, RegisterView, LoginView, PasswordResetView, CurrentUserView
-from core.api_views.disponibilite_views import DisponibiliteView
+from core.api_views.authentication_views import UserViewSet, RegisterView, LoginView, RefreshView, PasswordResetView, CurrentUserView
+from core.api_views.disponibilite_views import DisponibiliteView, DisponibiliteBatchView
 from core.api_views.formations_api_views import FormationViewSet
 from core.api_views.planning_enseignant_views import PlanningEnseignantView
-from core.api_views.planning_global_views import PlanningGeneralView
+from core.api_views.planning_global_views import PlanningGeneralView, PlanningCacheStatsView
 from core.api_views.recapitulatif_horaire_api_views import RecapitulatifHoraireViewSet
 from core.api_views.reservation_salle_api_views import ReservationSalleViewSet
 from core.api_views.reservation_materiel_api_views import ReservationMaterielViewSet
 from core.api_views.reservations_enseignant_views import MesReservationsView
 from core.api_views.salle_api_views import SalleViewSet
-from core.api_views.statistique_views import StatistiquesView
+from core.api_views.statistique_views import StatistiquesView, UtilisationView, TendancesView
 from core.api_views.type_materiel_api_views import TypeMaterielViewSet
 from core.api_views.creneau_api_views import CreneauHoraireViewSet
+from core.api_views.calendrier_views import CalendrierEnseignantView, CalendrierSalleView, JetonCalendrierView
+from core.api_views.emploi_du_temps_views import EmploiDuTempsView, EmploiDuTempsStatutView, EmploiDuTempsFichierView
 
 
 router = DefaultRouter()
@@ -31,12 +33,23 @@ router.register(r'recapitulatifs', RecapitulatifHoraireViewSet, basename='recapi
 urlpatterns = [
     path('', include(router.urls)),
     path('planning/', PlanningGeneralView.as_view(), name='planning-general'),
+    path('planning/cache/', PlanningCacheStatsView.as_view(), name='planning-cache'),
     path('statistiques/', StatistiquesView.as_view(), name='statistiques'),
+    path('statistiques/utilisation/', UtilisationView.as_view(), name='statistiques-utilisation'),
+    path('statistiques/tendances/', TendancesView.as_view(), name='statistiques-tendances'),
     path('disponibilite/', DisponibiliteView.as_view(), name='disponibilite'),
+    path('disponibilite/batch/', DisponibiliteBatchView.as_view(), name='disponibilite-batch'),
     path('mes-reservations/', MesReservationsView.as_view(), name='mes-reservations'),
     path('planning-enseignant/<int:enseignant_id>/', PlanningEnseignantView.as_view(), name='planning-enseignant'),
+    path('calendrier/jeton/', JetonCalendrierView.as_view(), name='calendrier-jeton'),
+    path('calendrier/enseignants/<int:enseignant_id>.ics', CalendrierEnseignantView.as_view(), name='calendrier-enseignant'),
+    path('calendrier/salles/<int:salle_id>.ics', CalendrierSalleView.as_view(), name='calendrier-salle'),
+    path('emplois-du-temps/', EmploiDuTempsView.as_view(), name='emploi-du-temps'),
+    path('emplois-du-temps/<slug:cle>/', EmploiDuTempsStatutView.as_view(), name='emploi-du-temps-statut'),
+    path('emplois-du-temps/<slug:cle>.pdf', EmploiDuTempsFichierView.as_view(), name='emploi-du-temps-fichier'),
     path('register/', RegisterView.as_view(), name='register'),
     path('login/', LoginView.as_view(), name='login'),
+    path('token/refresh/', RefreshView.as_view(), name='token-refresh'),
     path('reset-password/', PasswordResetView.as_view(), name='reset-password'),
     path('me/', CurrentUserView.as_view(), name='current-user'),
 ]
@@ -0,0 +1,148 @@
+from datetime import timedelta
+import numpy as np
+from django.db.models import CharField
+from django.db.models.functions import Cast
+from core.models import Salle, Materiel, CreneauHoraire, ReservationSalle, ReservationMateriel
+
+JOURS_SEMAINE = ['lundi', 'mardi', 'mercredi', 'jeudi', 'vendredi', 'samedi', 'dimanche']
+PERCENTILES = (50, 75, 90, 95)
+MAX_JOURS_UTILISATION = 366
+
+SOURCES = {
+    'salle': (Salle, ReservationSalle, 'salle_id'),
+    'materiel': (Materiel, ReservationMateriel, 'materiel_id'),
+}
+
+
+def _pourcentages(reserves, disponibles):
+    """Taux en pourcentage arrondis, 0 là où rien n'est disponible"""
+    reserves = np.asarray(reserves, dtype=float)
+    disponibles = np.asarray(disponibles, dtype=float)
+    taux = np.divide(reserves * 100, disponibles, out=np.zeros_like(reserves), where=disponibles > 0)
+    return np.round(taux, 1)
+
+
+def matrice_occupation(type_ressource, ressource_ids, date_debut, nb_jours, creneau_ids):
+    """
+    Construit la matrice booléenne (ressource, jour, créneau) des cellules
+    réservées à partir des triplets lus en une seule requête. Les indices
+    sont calculés par searchsorted sur les identifiants triés.
+    """
+    _, model, champ = SOURCES[type_ressource]
+    matrice = np.zeros((len(ressource_ids), nb_jours, len(creneau_ids)), dtype=bool)
+    if not len(ressource_ids) or not nb_jours or not len(creneau_ids):
+        return matrice
+
+    # Seule la période filtre la requête (parcours de l'index (date, créneau,
+    # ressource)) ; la date est lue sous forme de texte (YYYY-MM-DD) et
+    # convertie par NumPy, sans objet date construit ligne par ligne
+    triplets = model.objects.filter(
+        date__range=(date_debut, date_debut + timedelta(days=nb_jours - 1))
+    ).order_by().annotate(jour=Cast('date', CharField())).values_list(champ, 'jour', 'creneau_id')
+    colonnes = np.array(list(triplets), dtype=[('ressource', np.int64), ('jour', 'datetime64[D]'), ('creneau', np.int64)])
+    if not len(colonnes):
+        return matrice
+
+    # Les réservations de ressources inactives (absentes de ressource_ids) sont écartées
+    ordre_ressources = np.argsort(ressource_ids)
+    ordre_creneaux = np.argsort(creneau_ids)
+    rangs_ressources = np.searchsorted(ressource_ids, colonnes['ressource'], sorter=ordre_ressources)
+    rangs_creneaux = np.searchsorted(creneau_ids, colonnes['creneau'], sorter=ordre_creneaux)
+    lignes = ordre_ressources[np.minimum(rangs_ressources, len(ressource_ids) - 1)]
+    cellules = ordre_creneaux[np.minimum(rangs_creneaux, len(creneau_ids) - 1)]
+    retenues = (ressource_ids[lignes] == colonnes['ressource']) & (creneau_ids[cellules] == colonnes['creneau'])
+    jours = (colonnes['jour'] - np.datetime64(date_debut, 'D')).astype(np.int64)
+    matrice[lignes[retenues], jours[retenues], cellules[retenues]] = True
+    return matrice
+
+
+def taux_utilisation(type_ressource, date_debut, date_fin, top=10):
+    """
+    Taux d'occupation (créneaux réservés / créneaux disponibles) des salles ou
+    des matériels actifs sur une période : par ressource, par type de
+    matériel, par jour de la semaine, par créneau, avec les percentiles des
+    taux par ressource et le classement des créneaux les plus chargés
+    (jour de la semaine x créneau). Tous les jours sont considérés ouvrables.
+    """
+    modele_ressource = SOURCES[type_ressource][0]
+    ressources = list(modele_ressource.objects.filter(active=True).order_by('pk').values(
+        'id', 'nom', *(['type_materiel_id', 'type_materiel__nom'] if type_ressource == 'materiel' else [])
+    ))
+    creneaux = list(CreneauHoraire.objects.order_by('heure_debut').values('id', 'nom'))
+    nb_jours = (date_fin - date_debut).days + 1
+
+    ressource_ids = np.array([ressource['id'] for ressource in ressources], dtype=np.int64)
+    creneau_ids = np.array([creneau['id'] for creneau in creneaux], dtype=np.int64)
+    matrice = matrice_occupation(type_ressource, ressource_ids, date_debut, nb_jours, creneau_ids)
+    nb_ressources, nb_creneaux = len(ressources), len(creneaux)
+
+    # Réductions sur les axes de la matrice (ressource, jour, créneau)
+    par_ressource = matrice.sum(axis=(1, 2))
+    par_jour_creneau = matrice.sum(axis=0)
+    par_creneau = par_jour_creneau.sum(axis=0)
+
+    # Jour de la semaine de chaque jour de la période, et nombre d'occurrences de chacun
+    jours_semaine = (date_debut.weekday() + np.arange(nb_jours)) % 7
+    occurrences = np.bincount(jours_semaine, minlength=7)
+    par_jour_semaine = np.bincount(jours_semaine, weights=par_jour_creneau.sum(axis=1), minlength=7)
+
+    # Créneaux (jour de la semaine x créneau) : cumul par groupe via un indice aplati
+    groupes = (jours_semaine[:, None] * nb_creneaux + np.arange(nb_creneaux)).ravel()
+    par_pic = np.bincount(groupes, weights=par_jour_creneau.ravel(), minlength=7 * nb_creneaux)
+    taux_pics = _pourcentages(par_pic, np.repeat(occurrences, nb_creneaux) * nb_ressources)
+    classement = np.argsort(-taux_pics, kind='stable')[:top]
+
+    taux_ressources = _pourcentages(par_ressource, np.full(nb_ressources, nb_jours * nb_creneaux))
+    resultat = {
+        'type_ressource': type_ressource,
+        'periode': {'debut': date_debut, 'fin': date_fin, 'jours': nb_jours},
+        'creneaux': creneaux,
+        'global': float(_pourcentages(par_ressource.sum(), matrice.size)),
+        'percentiles': {
+            f'p{rang}': float(valeur)
+            for rang, valeur in zip(PERCENTILES, np.round(np.percentile(taux_ressources, PERCENTILES), 1))
+        } if nb_ressources else {},
+        'ressources': sorted((
+            {
+                'id': ressource['id'], 'nom': ressource['nom'],
+                'reserves': int(reserves), 'disponibles': nb_jours * nb_creneaux, 'taux': float(taux)
+            }
+            for ressource, reserves, taux in zip(ressources, par_ressource, taux_ressources)
+        ), key=lambda ligne: -ligne['taux']),
+        'jours_semaine': [
+            {'jour': JOURS_SEMAINE[jour], 'taux': float(taux)}
+            for jour, taux in enumerate(_pourcentages(par_jour_semaine, occurrences * nb_ressources * nb_creneaux))
+        ],
+        'par_creneau': [
+            {'creneau': creneau['id'], 'nom': creneau['nom'], 'taux': float(taux)}
+            for creneau, taux in zip(creneaux, _pourcentages(par_creneau, np.full(nb_creneaux, nb_ressources * nb_jours)))
+        ],
+        'pics': [
+            {
+                'jour': JOURS_SEMAINE[indice // nb_creneaux],
+                'creneau': creneaux[indice % nb_creneaux]['id'],
+                'nom': creneaux[indice % nb_creneaux]['nom'],
+                'taux': float(taux_pics[indice])
+            }
+            for indice in classement if occurrences[indice // nb_creneaux]
+        ],
+    }
+
+    if type_ressource == 'materiel':
+        # Regroupement des matériels par type : indice de type de chaque ligne de la matrice
+        types = {ressource['type_materiel_id']: ressource['type_materiel__nom'] for ressource in ressources}
+        type_ids, indices_types = np.unique(
+            np.array([ressource['type_materiel_id'] for ressource in ressources], dtype=np.int64),
+            return_inverse=True
+        )
+        materiels_par_type = np.bincount(indices_types, minlength=len(type_ids))
+        reserves_par_type = np.bincount(indices_types, weights=par_ressource, minlength=len(type_ids))
+        resultat['types_materiel'] = sorted((
+            {'id': int(type_id), 'nom': types[type_id], 'materiels': int(nombre), 'taux': float(taux)}
+            for type_id, nombre, taux in zip(
+                type_ids, materiels_par_type,
+                _pourcentages(reserves_par_type, materiels_par_type * nb_jours * nb_creneaux)
+            )
+        ), key=lambda ligne: -ligne['taux'])
+
+    return resultat
@@ -0,0 +1,21 @@
+from datetime import datetime
+from django.db.models import Count, Q
+from rest_framework.exceptions import ValidationError
+
+
+def parse_date(valeur, defaut=None, nom='date'):
+    """Convertit un paramètre de requête au format YYYY-MM-DD (erreur 400 si invalide)"""
+    if valeur in (None, ''):
+        return defaut
+    try:
+        return datetime.strptime(valeur, '%Y-%m-%d').date()
+    except (TypeError, ValueError):
+        raise ValidationError({nom: "Format de date invalide (attendu : YYYY-MM-DD)"})
+
+
+def annoter_comptes_materiels(queryset):
+    """Annote des types de matériel avec leurs nombres de matériels actifs et inactifs"""
+    return queryset.annotate(
+        materiels_actifs=Count('materiels', filter=Q(materiels__active=True)),
+        materiels_inactifs=Count('materiels', filter=Q(materiels__active=False))
+    )